@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytz
+
+import database_manager as db
+import indicator_engine as ie
+import telegram_bot as bot
+
+# Edge-triggered Telegram alerts. Each (ticker, signal) has a row in alert_state;
+# a scan only produces messages for transitions: a ticker entering a signal (unless
+# it was announced for that signal within the cooldown, so names flapping around a
+# threshold stay quiet) and, optionally, leaving one it was announced for.
+# In digest mode nothing is sent per scan; one summary goes out per day instead.
+ALERT_SIGNALS = {
+    # signal -> (report title, default cooldown in minutes)
+    'breakout': ("Breakout Alert 🚀", 240),
+    'oversold': ("Oversold Alert (RSI < 30) 📉", 240),
+    'golden_cross': ("Golden Cross Alert ✨", 720),
+}
+ALERT_MODES = ('instant', 'digest')
+DEFAULT_DIGEST_HOUR = 16 # Jakarta time, after the close
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S' # UTC, same as SQLite's datetime('now')
+
+def signal_mask(df, signal):
+    """Boolean Series: which scan rows currently show `signal` (the original alert filters)."""
+    if signal == 'breakout':
+        return df['ath_distance_pct'] > ie.BREAKOUT_ATH_DISTANCE_PCT
+    column = {'oversold': 'is_oversold', 'golden_cross': 'is_golden_cross'}[signal]
+    if column not in df:
+        return pd.Series(False, index=df.index)
+    return df[column] == True
+
+def get_alert_settings():
+    """Reads the alert settings (Settings page), falling back to defaults."""
+    def _setting(key, default, cast):
+        try:
+            val = db.get_setting(key)
+            return cast(val) if val else default
+        except Exception:
+            return default
+
+    mode = _setting("ALERT_MODE", 'instant', str)
+    return {
+        'mode': mode if mode in ALERT_MODES else 'instant',
+        'cooldown_min': {s: _setting(f"ALERT_COOLDOWN_{s.upper()}", minutes, int)
+                         for s, (_, minutes) in ALERT_SIGNALS.items()},
+        'notify_exits': _setting("ALERT_NOTIFY_EXITS", False, lambda v: v == "1"),
+        'digest_hour': _setting("ALERT_DIGEST_HOUR", DEFAULT_DIGEST_HOUR, int),
+    }
+
+def _timestamp(value):
+    return value if isinstance(value, str) else None # NULLs come back as None or NaN
+
+def update_alert_state(df, cfg=None, now=None):
+    """
+    Compares a scan with the stored alert state and saves the changes.
+    Returns (entered, exited): {signal: [tickers]} to notify about. Entries are marked as
+    sent in instant mode; tickers missing from the scan keep their state.
+    """
+    cfg = cfg or get_alert_settings()
+    now = now or datetime.now(timezone.utc)
+    now_str = now.strftime(TIME_FORMAT)
+    state = db.get_alert_state()
+    known = {} if state.empty else {(r.ticker, r.signal): r for r in state.itertuples(index=False)}
+
+    entered, exited, rows = {}, {}, []
+    for signal in ALERT_SIGNALS:
+        active_now = set(df.loc[signal_mask(df, signal), 'ticker'])
+        cooldown_start = (now - timedelta(minutes=cfg['cooldown_min'][signal])).strftime(TIME_FORMAT)
+        for ticker in df['ticker']:
+            prev = known.get((ticker, signal))
+            was_active = prev is not None and bool(prev.active)
+            entered_at, exited_at, last_sent = (_timestamp(prev.entered_at), _timestamp(prev.exited_at),
+                                                _timestamp(prev.last_sent_at)) if prev is not None else (None, None, None)
+
+            if ticker in active_now and not was_active:
+                notify = last_sent is None or last_sent <= cooldown_start
+                if notify:
+                    entered.setdefault(signal, []).append(ticker)
+                    if cfg['mode'] == 'instant':
+                        last_sent = now_str
+                rows.append((ticker, signal, 1, now_str, exited_at, last_sent))
+            elif was_active and ticker not in active_now:
+                # Only exits of entries that were announced
+                if cfg['notify_exits'] and last_sent is not None and last_sent >= (entered_at or ""):
+                    exited.setdefault(signal, []).append(ticker)
+                rows.append((ticker, signal, 0, entered_at, now_str, last_sent))
+    db.save_alert_state(rows)
+    return entered, exited
+
+def dispatch_alerts(df):
+    """Records a finished scan's signal transitions and, in instant mode, queues their Telegram messages."""
+    if df.empty:
+        return
+    cfg = get_alert_settings()
+    entered, exited = update_alert_state(df, cfg)
+    if cfg['mode'] != 'instant':
+        return
+
+    for signal, tickers in entered.items():
+        bot.send_scan_report(ALERT_SIGNALS[signal][0], df[df['ticker'].isin(tickers)])
+    if exited:
+        lines = [f"• {ALERT_SIGNALS[s][0]}: {', '.join(tickers)}" for s, tickers in exited.items()]
+        bot.send_telegram_message("🛡️ *Stock Sentinel: Sinyal Berakhir*\n\n" + "\n".join(lines))
+
+def send_digest_if_due(now=None):
+    """
+    In digest mode, sends the daily summary once the digest hour has passed:
+    active signals, and what entered or exited since the previous digest.
+    Returns True if a digest was sent.
+    """
+    cfg = get_alert_settings()
+    if cfg['mode'] != 'digest':
+        return False
+    now = now or datetime.now(timezone.utc)
+    local = now.astimezone(pytz.timezone('Asia/Jakarta'))
+    last = db.get_setting("ALERT_LAST_DIGEST")
+    if local.hour < cfg['digest_hour']:
+        return False
+    if last and pytz.utc.localize(datetime.strptime(last, TIME_FORMAT)).astimezone(local.tzinfo).date() >= local.date():
+        return False
+
+    state = db.get_alert_state()
+    since = last or ""
+    lines = []
+    for signal, (title, _) in ALERT_SIGNALS.items():
+        rows = state[state['signal'] == signal] if not state.empty else state
+        if rows.empty:
+            continue
+        active = rows[rows['active'] == 1]
+        new = active[active['entered_at'] > since]['ticker'].tolist()
+        ended = rows[(rows['active'] == 0) & (rows['exited_at'].fillna("") > since)]['ticker'].tolist()
+        if active.empty and not ended:
+            continue
+        lines.append(f"*{title}* ({len(active)} aktif)")
+        if new:
+            lines.append(f"   🆕 Baru: {', '.join(new)}")
+        held = [t for t in active['ticker'] if t not in new]
+        if held:
+            lines.append(f"   ⏳ Masih: {', '.join(held)}")
+        if ended:
+            lines.append(f"   📤 Berakhir: {', '.join(ended)}")
+        lines.append("")
+
+    db.set_setting("ALERT_LAST_DIGEST", now.strftime(TIME_FORMAT))
+    if not lines:
+        return False
+    bot.send_telegram_message(f"🛡️ *Stock Sentinel: Ringkasan Harian {local.strftime('%d/%m/%Y')}*\n\n" + "\n".join(lines))
+    return True
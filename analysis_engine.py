@@ -1,8 +1,16 @@
 import data_engine as de
+import database_manager as db
+import scan_executor as se
+import indicator_engine as ie
+import fetch_cache as fc
+import market_data as md
+import scan_profiler as sp
+import metrics as mt
 import pandas as pd
 
-import yfinance as yf
 from datetime import datetime
+import time
+import zlib
 import pytz
 
 def get_market_phase():
@@ -40,13 +48,24 @@ def get_market_phase():
     else:
         return "Pasar Tutup (Malam)", "Bursa sudah tutup. Lakukan evaluasi (Post-Market Analysis) dan pasang Auto-Order untuk besok."
 
+# Phases in which IDX prices move (see get_market_phase)
+LIVE_PHASES = ("Pembukaan", "Sesi 1", "Sesi 2", "Golden Time", "Pre-Closing")
+
+def is_market_open():
+    """True during the trading sessions, when live quotes are worth polling."""
+    phase_name, _ = get_market_phase()
+    return any(p in phase_name for p in LIVE_PHASES)
+
+# Shared cache lifetime for the macro weather (seconds, see fetch_cache)
+MACRO_CACHE_TTL_SEC = 300
+
+@fc.cached(ttl=MACRO_CACHE_TTL_SEC, max_stale=de.RADAR_MAX_STALE_SEC, valid=lambda m: m is not None)
 def get_macro_weather():
     """
     Analyzes the Composite Index (IHSG / ^JKSE) to determine market weather.
     """
     try:
-        ihsg = yf.Ticker("^JKSE")
-        hist = ihsg.history(period="5d")
+        hist = md.get_provider().history("^JKSE", period="5d")
         if len(hist) >= 2:
             last_close = hist['Close'].iloc[-1]
             prev_close = hist['Close'].iloc[-2]
@@ -77,13 +96,15 @@ def get_macro_weather():
     
     return None
 
-def analyze_ticker(ticker):
+def analyze_ticker(ticker, hist=None, hist_wk=None):
     """
     Performs full analysis on a ticker:
     1. ATH Check
     2. Volatility Check
     3. Fundamental Check (ROE)
     
+    `hist` (daily, full history) and `hist_wk` (weekly, 2y) can be passed in when
+    they were already fetched in a batch; otherwise they are fetched here.
     Returns a dict with analysis results.
     """
     if not ticker.endswith(".JK"):
@@ -91,15 +112,13 @@ def analyze_ticker(ticker):
         
     try:
         # Fetch Fundamental Data
-        try:
-            info = yf.Ticker(ticker).info
-            roe = info.get('returnOnEquity', None)
-        except:
-            roe = None
-
-        # Fetch 5 years of data for ATH (max is too slow/heavy sometimes, 5y is decent for "modern" ATH)
-        # For true ATH we need 'max', but let's try 'max' first and see performance.
-        hist = de.get_ticker_data(ticker, period="max", interval="1d")
+        roe = get_roe(ticker)
+        news_sentiment = get_news_sentiment(ticker)
+
+        # Full history for a true ATH. Served from the local bar store, so after the
+        # first scan only the bars since the last stored one are downloaded.
+        if hist is None:
+            hist = de.get_ticker_data(ticker, period="max", interval="1d")
         
         if hist.empty:
             return None
@@ -132,47 +151,26 @@ def analyze_ticker(ticker):
             vol_spike_ratio = last_volume / avg_volume
             
         # Price Change
-        price_change_pct = ((recent_data['Close'].iloc[-1] - recent_data['Close'].iloc[-2]) / recent_data['Close'].iloc[-2]) * 100
+        prev_close = recent_data['Close'].iloc[-2]
+        price_change_pct = ((recent_data['Close'].iloc[-1] - prev_close) / prev_close) * 100
         
         is_volatile = (vol_spike_ratio > 3.0) or (abs(price_change_pct) > 5.0)
 
         # --- Trade Plan (Suggestion) ---
-        # Plan A: Conservative Swing (Risk 4%, Reward 8% -> Ratio 1:2)
-        sl_cons = int(last_price * 0.96)
-        tp_cons = int(last_price * 1.08)
-        
-        # Plan B: Aggressive Trend (Risk 5%, Reward 15% -> Ratio 1:3)
-        sl_aggr = int(last_price * 0.95)
-        tp_aggr = int(last_price * 1.15)
-        
-        # Rounding
-        sl_cons = round(sl_cons / 5) * 5
-        tp_cons = round(tp_cons / 5) * 5
-        sl_aggr = round(sl_aggr / 5) * 5
-        tp_aggr = round(tp_aggr / 5) * 5
+        sl_cons, tp_cons, sl_aggr, tp_aggr = (int(p) for p in ie.trade_plan(last_price))
 
         # --- Smart Indicators (RSI, MACD, EMA) ---
-        # RSI
-        delta = hist['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        current_rsi = rsi.iloc[-1]
+        # Definitions live in indicator_engine (shared with the vectorized panel scan)
+        current_rsi = ie.rsi(hist['Close']).iloc[-1]
 
         # MACD (12, 26, 9)
-        ema12 = hist['Close'].ewm(span=12, adjust=False).mean()
-        ema26 = hist['Close'].ewm(span=26, adjust=False).mean()
-        macd_line = ema12 - ema26
-        signal_line = macd_line.ewm(span=9, adjust=False).mean()
+        macd_line, signal_line = ie.macd(hist['Close'])
         current_macd = macd_line.iloc[-1]
         current_signal = signal_line.iloc[-1]
         
         # EMA Trend
-        ema50 = hist['Close'].ewm(span=50, adjust=False).mean()
-        ema200 = hist['Close'].ewm(span=200, adjust=False).mean()
-        current_ema50 = ema50.iloc[-1]
-        current_ema200 = ema200.iloc[-1]
+        current_ema50 = ie.ema(hist['Close'], 50).iloc[-1]
+        current_ema200 = ie.ema(hist['Close'], 200).iloc[-1]
 
         # Signals
         is_oversold = current_rsi < 30
@@ -180,42 +178,22 @@ def analyze_ticker(ticker):
         uptrend = current_ema50 > current_ema200
 
         # --- Candlestick Patterns ---
-        open_p = hist['Open'].iloc[-1]
-        close_p = hist['Close'].iloc[-1]
-        high_p = hist['High'].iloc[-1]
-        low_p = hist['Low'].iloc[-1]
-        
-        body = abs(close_p - open_p)
-        range_len = high_p - low_p
-        upper_shadow = high_p - max(open_p, close_p)
-        lower_shadow = min(open_p, close_p) - low_p
-        
-        is_doji = (body <= range_len * 0.05) and (range_len > 0)
-        # Hammer: Small body at top, long lower shadow (> 60% of total length)
-        # Upper shadow must be small (< 10% of total length)
-        is_hammer = (lower_shadow >= range_len * 0.6) and (upper_shadow <= range_len * 0.1)
+        last_bar = hist.iloc[-1]
+        is_doji, is_hammer = ie.candle_flags(last_bar['Open'], last_bar['High'], last_bar['Low'], last_bar['Close'])
 
         # --- Multi-Timeframe Analysis (Weekly Trend) ---
-        # Fetch 2y weekly data to check major trend
-        hist_wk = de.get_ticker_data(ticker, period="2y", interval="1wk")
+        # 2y of weekly bars to check major trend, resampled from the daily history
+        if hist_wk is None:
+            hist_wk = de.slice_period(de.resample_bars(hist, "1wk"), "2y")
         
-        trend_strength = "NEUTRAL"
+        is_weekly_uptrend = False
         if not hist_wk.empty and len(hist_wk) > 20:
              # Calculate Weekly EMA 20 (Standard for medium-term trend)
-             ema20_wk = hist_wk['Close'].ewm(span=20, adjust=False).mean()
-             current_ema20_wk = ema20_wk.iloc[-1]
+             current_ema20_wk = ie.ema(hist_wk['Close'], 20).iloc[-1]
              last_price_wk = hist_wk['Close'].iloc[-1]
              
              is_weekly_uptrend = last_price_wk > current_ema20_wk
-             
-             if is_weekly_uptrend and uptrend: # Both Daily & Weekly UP
-                 trend_strength = "STRONG UPTREND 🚀"
-             elif is_weekly_uptrend:
-                 trend_strength = "MILD UPTREND (Pullback) 🌤️"
-             elif uptrend:
-                 trend_strength = "WEAK UPTREND (Reversal?) ☁️"
-             else:
-                 trend_strength = "DOWNTREND 🌧️"
+             trend_strength = ie.trend_label(is_weekly_uptrend, uptrend)
         else:
              trend_strength = "UNKNOWN"
 
@@ -228,6 +206,7 @@ def analyze_ticker(ticker):
             'is_breakout': is_breakout,
             'vol_spike_ratio': vol_spike_ratio,
             'price_change_pct': price_change_pct,
+            'prev_close': prev_close,
             'is_volatile': is_volatile,
             'rsi': current_rsi,
             'macd_val': current_macd,
@@ -236,32 +215,336 @@ def analyze_ticker(ticker):
             'is_golden_cross': is_golden_cross,
             'is_uptrend': uptrend,
             'trend_strength': trend_strength,
-            'is_weekly_uptrend': is_weekly_uptrend if 'is_weekly_uptrend' in locals() else False,
+            'is_weekly_uptrend': is_weekly_uptrend,
             'is_doji': is_doji,
             'is_hammer': is_hammer,
             'plan_cons_sl': sl_cons,
             'plan_cons_tp': tp_cons,
             'plan_aggr_sl': sl_aggr,
             'plan_aggr_tp': tp_aggr,
-            'roe': roe
+            'roe': roe,
+            'news_sentiment': news_sentiment
         }
         
     except Exception as e:
         print(f"Error analyzing {ticker}: {e}")
         return None
 
-def scan_market(tickers_list):
+def get_roe(ticker):
+    """Return on Equity from the fundamentals cache (None if not cached yet)."""
+    return db.get_fundamentals([ticker.replace('.JK', '')], 'returnOnEquity').get(ticker.replace('.JK', ''))
+
+# --- Live Quotes (Between Full Scans) ---
+# Scan result fields that depend only on the last price (plus stored ATH / previous close).
+# Indicator fields (RSI, MACD, trend, candles, volume) keep their values until the next full scan.
+LIVE_PRICE_COLUMNS = ['current_price', 'ath_price', 'ath_date', 'ath_distance_pct', 'is_breakout',
+                      'price_change_pct', 'is_volatile', 'plan_cons_sl', 'plan_cons_tp',
+                      'plan_aggr_sl', 'plan_aggr_tp']
+
+def apply_live_prices(df_results, prices):
+    """
+    Recomputes the price-derived fields of scan results from live prices ({ticker: price})
+    against each row's stored ATH and previous close. Returns the updated rows only.
+    """
+    df = df_results[df_results['ticker'].isin(list(prices))].copy()
+    if df.empty:
+        return df
+
+    price = df['ticker'].map(prices).astype(float)
+    new_high = price > df['ath_price']
+    today = datetime.now(pytz.timezone('Asia/Jakarta')).strftime('%Y-%m-%d')
+    df['ath_date'] = df['ath_date'].where(~new_high, today)
+    df['ath_price'] = df['ath_price'].where(~new_high, price)
+    df['current_price'] = price
+    df['ath_distance_pct'] = ((price - df['ath_price']) / df['ath_price']) * 100
+    df['is_breakout'] = df['ath_distance_pct'] >= -2.0
+    df['price_change_pct'] = ((price - df['prev_close']) / df['prev_close']) * 100
+    df['is_volatile'] = (df['vol_spike_ratio'] > 3.0) | (df['price_change_pct'].abs() > 5.0)
+    sl_cons, tp_cons, sl_aggr, tp_aggr = ie.trade_plan(price.to_numpy())
+    df['plan_cons_sl'], df['plan_cons_tp'] = sl_cons.astype(int), tp_cons.astype(int)
+    df['plan_aggr_sl'], df['plan_aggr_tp'] = sl_aggr.astype(int), tp_aggr.astype(int)
+    return df
+
+def poll_live_prices():
+    """
+    One live-quote pass: batch-fetches last prices for every ticker in the latest scan
+    and updates its price-derived fields in place. Returns the number of rows updated.
+    """
+    df, scan_time = db.get_latest_scan_results()
+    if df.empty or 'prev_close' not in df.columns:
+        return 0 # Nothing scanned yet (or a scan from before prev_close was stored)
+
+    prices = {t: p for t, p in de.get_multiple_prices(df['ticker'].tolist()).items() if p and p > 0}
+    return db.update_scan_results(apply_live_prices(df, prices), LIVE_PRICE_COLUMNS, scan_time)
+
+def get_news_sentiment(ticker):
+    """Summed headline score of the ticker's stored news from the last 7 days (0 if none)."""
+    return db.get_news_sentiment([ticker.replace('.JK', '')]).get(ticker.replace('.JK', ''), 0)
+
+# Pre-filter (tier 1) defaults, see scan_universe
+PREFILTER_MIN_PRICE = 50 # IDR, last close
+PREFILTER_MIN_VALUE = 1e9 # IDR, average daily traded value (close x volume)
+PREFILTER_MIN_VOLUME = 1 # Shares on the last bar (0 = suspended / not traded)
+
+def get_scan_settings():
+    """
+    Reads the scanner concurrency settings (Settings page), falling back to defaults.
+    """
+    def _setting(key, default, cast):
+        try:
+            val = db.get_setting(key)
+            return cast(val) if val else default
+        except Exception:
+            return default
+
+    return {
+        'workers': _setting("SCAN_WORKERS", se.DEFAULT_MAX_WORKERS, int),
+        'rate_limit': _setting("SCAN_RATE_LIMIT", se.DEFAULT_RATE_PER_SEC, float),
+        'timeout': _setting("SCAN_TICKER_TIMEOUT", se.DEFAULT_TASK_TIMEOUT_SEC, int),
+        'prefilter': _setting("SCAN_PREFILTER", True, lambda v: v != "0"),
+        'min_price': _setting("SCAN_MIN_PRICE", PREFILTER_MIN_PRICE, float),
+        'min_value': _setting("SCAN_MIN_VALUE", PREFILTER_MIN_VALUE, float),
+        'adaptive': _setting("SCAN_ADAPTIVE", True, lambda v: v != "0"),
+    }
+
+# History chunks are much bigger units of work than a single ticker
+CHUNK_TIMEOUT_SEC = 300
+
+def _apply_rate_limit(cfg):
+    se.set_rate_limit(de.YAHOO_HOST, cfg['rate_limit'], capacity=max(cfg['rate_limit'] * 2, de.BATCH_CHUNK_SIZE))
+
+# --- Two-Tier Scan ---
+def prefilter_universe(tickers_list, progress_callback=None, cfg=None):
+    """
+    Tier 1: checks last price, last volume and average daily traded value of every
+    ticker with one small multi-ticker quote download per chunk.
+    Returns (tickers that pass, DataFrame of the quotes with a 'passed' column).
+    Tickers whose chunk could not be fetched pass, so a network error never hides them.
+    """
+    cfg = cfg or get_scan_settings()
+    _apply_rate_limit(cfg)
+    jobs = de.chunk_list(list(tickers_list))
+
+    def on_fetched(done, total, chunk):
+        if progress_callback:
+            progress_callback(done, total, f"pre-filter of {len(chunk)} stocks")
+
+    fetched = se.run_concurrent(jobs, de.fetch_quotes_chunk, max_workers=cfg['workers'],
+                                timeout=CHUNK_TIMEOUT_SEC, progress_callback=on_fetched)
+    rows = []
+    for chunk, quotes in zip(jobs, fetched):
+        for t in chunk:
+            q = (quotes or {}).get(t)
+            if quotes is None: # Chunk failed
+                rows.append({'ticker': t, 'price': None, 'volume': None, 'avg_value': None, 'passed': True})
+            elif q is None: # No recent bars (suspended / delisted)
+                rows.append({'ticker': t, 'price': None, 'volume': None, 'avg_value': None, 'passed': False})
+            else:
+                passed = (q['price'] >= cfg['min_price'] and q['volume'] >= PREFILTER_MIN_VOLUME
+                          and q['avg_value'] >= cfg['min_value'])
+                rows.append(dict(q, ticker=t, passed=passed))
+
+    quotes_df = pd.DataFrame(rows, columns=['ticker', 'price', 'volume', 'avg_value', 'passed'])
+    passed = quotes_df.loc[quotes_df['passed'].astype(bool), 'ticker'].tolist()
+    mt.TICKERS_PREFILTERED.inc(len(quotes_df) - len(passed))
+    print(f"Pre-filter: {len(passed)} of {len(quotes_df)} tickers pass.")
+    return passed, quotes_df
+
+def scan_universe(tickers_list, progress_callback=None, stage_times=None):
+    """
+    Two-tier scan of the whole watchlist: prefilter_universe over every name, then
+    the full scan_market (history + indicators) only for the names that pass.
+    With the pre-filter disabled on the Settings page, this is scan_market.
+    """
+    cfg = get_scan_settings()
+    if not cfg['prefilter']:
+        return scan_market(tickers_list, progress_callback, stage_times)
+
+    started = time.perf_counter()
+    passed, _ = prefilter_universe(tickers_list, progress_callback, cfg)
+    if stage_times is not None:
+        stage_times['prefilter'] = stage_times.get('prefilter', 0.0) + time.perf_counter() - started
+    mt.SCAN_STAGE_DURATION.observe(time.perf_counter() - started, stage='prefilter')
+    if not passed:
+        return pd.DataFrame()
+    return scan_market(passed, progress_callback, stage_times)
+
+# --- Adaptive Cadence ---
+# Every ticker gets a refresh tier from its last result: hot names are rescanned every
+# cycle, warm ones about hourly and quiet ones about daily. A cycle only scans the
+# tickers that are due and merges them into the previous results.
+CADENCE_INTERVALS = {'hot': 0, 'warm': 3600, 'cold': 86400} # Seconds between rescans
+CADENCE_SLACK_SEC = 120 # Names due within this long after the cycle starts are scanned now
+HOT_VOL_SPIKE = 2.0
+HOT_ATH_DISTANCE_PCT = -5.0
+HOT_CHANGE_PCT = 3.0
+WARM_VOL_SPIKE = 1.2
+WARM_ATH_DISTANCE_PCT = -15.0
+WARM_CHANGE_PCT = 1.0
+
+def cadence_tier(row, portfolio=()):
+    """Returns (tier, reason) for a scan result row (dict)."""
+    if row['ticker'] in portfolio:
+        return 'hot', "portfolio"
+    for signal in db.SIGNAL_COLUMNS:
+        if row.get(signal):
+            return 'hot', signal
+    vol = row.get('vol_spike_ratio') or 0
+    ath = row.get('ath_distance_pct')
+    ath = -100.0 if ath is None or pd.isna(ath) else ath
+    change = abs(row.get('price_change_pct') or 0)
+    if vol >= HOT_VOL_SPIKE:
+        return 'hot', "volume spike"
+    if ath >= HOT_ATH_DISTANCE_PCT:
+        return 'hot', "near ATH"
+    if change >= HOT_CHANGE_PCT:
+        return 'hot', "price move"
+    if vol >= WARM_VOL_SPIKE or ath >= WARM_ATH_DISTANCE_PCT or change >= WARM_CHANGE_PCT \
+            or row.get('is_hammer') or row.get('is_doji'):
+        return 'warm', "active"
+    return 'cold', "quiet"
+
+def _spread_interval(ticker, interval):
+    """Shortens an interval by up to 20% per ticker, so cold names don't all come due in the same cycle."""
+    return int(interval * (0.8 + 0.2 * (zlib.crc32(ticker.encode()) % 1000) / 1000))
+
+def scan_adaptive(tickers_list, progress_callback=None, force=False):
+    """
+    Scans the tickers that are due (plus portfolio holdings, and every ticker with
+    force=True or adaptive cadence off), reschedules them from their new results and
+    returns the full result set: the fresh rows merged with the previous results of
+    the tickers that were not due. Rows carry a 'refreshed_at' time.
+    """
+    cfg = get_scan_settings()
+    force = force or not cfg['adaptive']
+    tickers_list = list(tickers_list)
+    plain = {t: t.replace('.JK', '') for t in tickers_list}
+    portfolio = set(db.get_portfolio().get('ticker', pd.Series(dtype=object)).str.upper())
+
+    previous, previous_time = db.get_latest_scan_results()
+    known = set(previous['ticker']) if not previous.empty else set()
+    not_due = set() if force else (db.get_not_due_tickers(list(plain.values()), CADENCE_SLACK_SEC) & known) - portfolio
+    due = [t for t in tickers_list if plain[t] not in not_due]
+    mt.TICKERS_NOT_DUE.inc(len(tickers_list) - len(due))
+    print(f"Adaptive cadence: {len(due)} of {len(tickers_list)} tickers due.")
+
+    fresh = scan_universe(due, progress_callback) if due else pd.DataFrame()
+    if not fresh.empty:
+        fresh['refreshed_at'] = datetime.now(pytz.timezone('Asia/Jakarta')).strftime('%Y-%m-%d %H:%M:%S')
+
+    fresh_rows = {r['ticker']: r for r in fresh.to_dict('records')}
+    schedule = []
+    for t in due:
+        row = fresh_rows.get(plain[t])
+        tier, reason = cadence_tier(row, portfolio) if row else ('cold', "no result")
+        schedule.append((plain[t], tier, _spread_interval(plain[t], CADENCE_INTERVALS[tier]), reason))
+    try:
+        db.save_scan_schedule(schedule)
+    except Exception as e:
+        print(f"Error saving scan schedule: {e}")
+
+    kept = previous[previous['ticker'].isin(not_due)].copy() if not_due else pd.DataFrame()
+    if not kept.empty and 'refreshed_at' not in kept.columns:
+        kept['refreshed_at'] = previous_time
+    frames = [df for df in (kept, fresh) if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    # Watchlist order
+    order = {p: i for i, p in enumerate(plain.values())}
+    return pd.concat(frames, ignore_index=True).sort_values('ticker', key=lambda s: s.map(order), ignore_index=True)
+
+def scan_market(tickers_list, progress_callback=None, stage_times=None, profile=False):
     """
     Iterates through a list of tickers and returns meaningful results.
+    Daily history is prefetched in chunked multi-ticker downloads (weekly bars are
+    resampled from it) and the indicators for the whole list are computed in bulk,
+    either by advancing the stored per-ticker indicator state or on a (bars x ticker)
+    panel. Network stages run on a bounded worker pool with per-host rate limiting,
+    retries and per-task timeouts.
+    `progress_callback(done, total, label)` is called as each task completes.
+    If a `stage_times` dict is given, the wall time (seconds) of each stage is added to
+    it: fetch, weekly, indicators, persist, enrich, fallback.
+    With `profile`, the scan is sampled and a profile is written (see scan_profiler).
     """
-    results = []
-    print(f"Scanning {len(tickers_list)} tickers...")
-    
-    # In a real scenario, we might want to parallelize this or use batch requests properly.
-    # For now, sequential is fine for 50 tickers.
-    for t in tickers_list:
-        data = analyze_ticker(t)
-        if data:
-            results.append(data)
+    with sp.profile_scan(profile, label="scan_market"), mt.SCAN_DURATION.time():
+        return _scan_market(tickers_list, progress_callback, stage_times)
+
+def _scan_market(tickers_list, progress_callback, stage_times):
+    stage_start = time.perf_counter()
+
+    def end_stage(stage):
+        nonlocal stage_start
+        now = time.perf_counter()
+        if stage_times is not None:
+            stage_times[stage] = stage_times.get(stage, 0.0) + now - stage_start
+        mt.SCAN_STAGE_DURATION.observe(now - stage_start, stage=stage)
+        stage_start = now
+
+    tickers_list = list(tickers_list)
+    total = len(tickers_list)
+    print(f"Scanning {total} tickers...")
+
+    cfg = get_scan_settings()
+    _apply_rate_limit(cfg)
+
+    jobs = de.chunk_list(tickers_list)
+    steps = len(jobs) + total
+
+    def on_fetched(done, _, chunk):
+        if progress_callback:
+            progress_callback(done, steps, f"history of {len(chunk)} stocks")
+
+    fetched = se.run_concurrent(jobs, lambda chunk: de.fetch_history_chunk(chunk, period="max", interval="1d"),
+                                max_workers=cfg['workers'], timeout=CHUNK_TIMEOUT_SEC, progress_callback=on_fetched)
+    daily = {}
+    for frames in fetched:
+        daily.update(frames or {})
+    end_stage('fetch')
+    # Weekly bars come from the daily history already in hand (no second download)
+    weekly = {t: de.slice_period(de.resample_bars(df, "1wk"), "2y") for t, df in daily.items()}
+    end_stage('weekly')
+
+    # Tickers with both frames are computed in bulk: the ones with a stored indicator
+    # state only step it over the new bars, the rest go through the vectorized panel
+    # engine. Tickers missing from the batch (failed chunk) are analyzed one by one.
+    in_batch = {t for t in tickers_list if t in daily and t in weekly}
+    stored_states = db.load_indicator_states(list(in_batch)) if in_batch else {}
+    warm = {t: st for t, st in stored_states.items() if ie.state_matches(st, daily[t])}
+    df_warm, warm_states = ie.advance_states({t: daily[t] for t in warm}, weekly, warm)
+    df_cold, cold_states = ie.compute_indicators(
+        {t: daily[t] for t in tickers_list if t in in_batch and t not in warm}, weekly, return_states=True
+    )
+    end_stage('indicators')
+    try:
+        db.save_indicator_states({**warm_states, **cold_states})
+    except Exception as e:
+        print(f"Error saving indicator states: {e}")
+    end_stage('persist')
+
+    # ROE and news sentiment come from the fundamentals/news stores (refreshed in the
+    # background), never the network
+    plain_tickers = [t.replace('.JK', '') for t in tickers_list]
+    roe_map = db.get_fundamentals(plain_tickers, 'returnOnEquity')
+    news_map = db.get_news_sentiment(plain_tickers)
+    bulk_rows = {row['ticker']: dict(row, roe=roe_map.get(row['ticker']), news_sentiment=news_map.get(row['ticker'], 0))
+                 for df_part in (df_warm, df_cold) for row in df_part.to_dict('records')}
+    end_stage('enrich')
+
+    fallback = [t for t in tickers_list if t not in in_batch]
+    if progress_callback:
+        progress_callback(steps - len(fallback), steps, f"{len(in_batch)} stocks analyzed")
+
+    def on_finished(done, _, ticker):
+        if progress_callback:
+            progress_callback(steps - len(fallback) + done, steps, ticker)
+
+    fallback_rows = se.run_concurrent(fallback, analyze_ticker, max_workers=cfg['workers'],
+                                      timeout=cfg['timeout'], progress_callback=on_finished)
+    end_stage('fallback')
+    rows = {**bulk_rows, **{r['ticker']: r for r in fallback_rows if r}}
+    # Keep the input order (tickers without enough history have no row)
+    results = [rows[t.replace('.JK', '')] for t in tickers_list if t.replace('.JK', '') in rows]
+    mt.TICKERS_SCANNED.inc(len(results))
+    mt.TICKERS_FAILED.inc(total - len(results))
             
     return pd.DataFrame(results)
@@ -0,0 +1,213 @@
+"""
+Backtest of the dashboard's signals over the stored daily history of every ticker.
+
+    python backtest_engine.py                       # every watchlist ticker, 20-bar horizon
+    python backtest_engine.py --horizon 10 --workers 4
+    python backtest_engine.py --tickers BBCA BBRI --trades trades.csv
+
+Signals use the same definitions as the scanner (indicator_engine) and the chart's
+Momentum Buy marker. Each signal bar opens a long trade at that bar's close with the
+fixed Plan A / Plan B stop-loss and take-profit from indicator_engine.trade_plan:
+whichever level is hit first within `horizon` bars closes it (the stop wins when
+both are touched in one bar, gaps fill at the open), otherwise it is closed at the
+close of the last bar. Signals too close to the end of the data to finish are left out.
+Bars come from the local bar store only (run a scan first); nothing is downloaded.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import database_manager as db
+import indicator_engine as ie
+
+SIGNALS = ('golden_cross', 'oversold', 'breakout', 'hammer', 'doji', 'momentum_buy')
+PLANS = ('A', 'B') # Plan A (Safe) / Plan B (Aggressive), see indicator_engine.trade_plan
+OUTCOMES = ('target', 'stop', 'timeout')
+DEFAULT_HORIZON = 20 # Bars a trade may stay open
+CHUNK_SIZE = 25 # Tickers per worker task
+
+def signal_flags(df):
+    """Boolean frame (bars x SIGNALS): which signals fire on each bar's close."""
+    close = df['Close']
+    macd_line, signal_line = ie.macd(close)
+    current_rsi = ie.rsi(close)
+    ath = df['High'].cummax()
+    ma5 = close.rolling(window=5).mean()
+    is_doji, is_hammer = ie.candle_flags(df['Open'], df['High'], df['Low'], close)
+    return pd.DataFrame({
+        'golden_cross': (macd_line.shift(1) < signal_line.shift(1)) & (macd_line > signal_line),
+        'oversold': current_rsi < 30,
+        'breakout': (close - ath) / ath * 100 > ie.BREAKOUT_ATH_DISTANCE_PCT, # Same test as the breakout alert
+        'hammer': is_hammer,
+        'doji': is_doji,
+        # Chart marker: close crosses above MA5 on a green candle
+        'momentum_buy': (close > ma5) & (close.shift(1) <= ma5.shift(1)) & (close > df['Open']),
+    }, index=df.index)
+
+def simulate_exits(open_p, high, low, close, entries, sl, tp, horizon=DEFAULT_HORIZON):
+    """
+    Exits for long trades entered at close[entries] with levels sl/tp (arrays per trade).
+    Returns (exit_idx, exit_price, outcome_code, done); `done` is False for trades that
+    neither hit a level nor reached the horizon before the data ends.
+    """
+    n = len(close)
+    pad = np.full(horizon, np.nan)
+    # Row i holds bars i+1 .. i+horizon
+    windows = {name: sliding_window_view(np.concatenate([a[1:], pad]), horizon)[entries]
+               for name, a in (('open', open_p), ('high', high), ('low', low))}
+
+    with np.errstate(invalid='ignore'):
+        sl_hit = windows['low'] <= sl[:, None]
+        tp_hit = windows['high'] >= tp[:, None]
+    first_sl = np.where(sl_hit.any(axis=1), sl_hit.argmax(axis=1), horizon)
+    first_tp = np.where(tp_hit.any(axis=1), tp_hit.argmax(axis=1), horizon)
+
+    stopped = (first_sl < horizon) & (first_sl <= first_tp)
+    target = (first_tp < horizon) & ~stopped
+    timeout = ~stopped & ~target
+    offset = np.where(stopped, first_sl, np.where(target, first_tp, horizon - 1))
+    exit_idx = entries + 1 + offset
+    done = exit_idx < n
+
+    rows = np.arange(len(entries))
+    bar_open = windows['open'][rows, np.minimum(offset, horizon - 1)]
+    exit_price = np.where(stopped, np.fmin(sl, bar_open),
+                          np.where(target, np.fmax(tp, bar_open),
+                                   close[np.minimum(exit_idx, n - 1)]))
+    outcome = np.select([target, stopped, timeout], [0, 1, 2])
+    return exit_idx, exit_price, outcome, done
+
+def backtest_ticker(ticker, df, horizon=DEFAULT_HORIZON):
+    """All trades of one ticker's signals (DataFrame, one row per signal and plan)."""
+    df = df.dropna(subset=['Open', 'High', 'Low', 'Close'])
+    if len(df) < 30:
+        return None
+
+    flags = signal_flags(df).to_numpy()
+    open_p, high, low, close = (df[c].to_numpy(dtype=float) for c in ('Open', 'High', 'Low', 'Close'))
+    dates = df.index.values
+    bar_idx, sig_idx = np.nonzero(flags)
+    if not len(bar_idx):
+        return None
+
+    sl_a, tp_a, sl_b, tp_b = ie.trade_plan(close[bar_idx])
+    parts = []
+    for plan, sl, tp in (('A', sl_a, tp_a), ('B', sl_b, tp_b)):
+        exit_idx, exit_price, outcome, done = simulate_exits(open_p, high, low, close, bar_idx, sl, tp, horizon)
+        entry_price = close[bar_idx]
+        parts.append(pd.DataFrame({
+            'signal': np.array(SIGNALS)[sig_idx],
+            'plan': plan,
+            'entry_date': dates[bar_idx],
+            'exit_date': dates[np.minimum(exit_idx, len(dates) - 1)],
+            'outcome': np.array(OUTCOMES)[outcome],
+            'return_pct': (exit_price - entry_price) / entry_price * 100,
+            'bars_held': exit_idx - bar_idx,
+        })[done])
+
+    trades = pd.concat(parts, ignore_index=True)
+    trades.insert(0, 'ticker', ticker.replace('.JK', ''))
+    return trades
+
+def _backtest_chunk(db_name, tickers, horizon):
+    """Worker task: loads stored bars for a few tickers and backtests them."""
+    db.DB_NAME = db_name
+    frames, missing = [], []
+    for t in tickers:
+        bars = db.load_price_bars(t if t.endswith('.JK') else f"{t}.JK", "1d")
+        if bars.empty:
+            missing.append(t)
+            continue
+        trades = backtest_ticker(t, bars, horizon)
+        if trades is not None:
+            frames.append(trades)
+    trades = pd.concat(frames, ignore_index=True) if frames else None
+    if trades is not None:
+        for col in ('ticker', 'signal', 'plan', 'outcome'):
+            trades[col] = trades[col].astype('category')
+    return trades, missing
+
+def run_backtest(tickers=None, horizon=DEFAULT_HORIZON, max_workers=None, progress_callback=None):
+    """
+    Backtests `tickers` (default: the watchlist) on a process pool.
+    Returns (summary DataFrame, trades DataFrame, tickers without stored bars).
+    `progress_callback(done, total)` is called as each chunk of tickers finishes.
+    """
+    tickers = list(tickers if tickers is not None else db.get_all_tickers())
+    chunks = [tickers[i:i + CHUNK_SIZE] for i in range(0, len(tickers), CHUNK_SIZE)]
+    frames, missing = [], []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_backtest_chunk, db.DB_NAME, chunk, horizon) for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), 1):
+            trades, chunk_missing = future.result()
+            if trades is not None:
+                frames.append(trades)
+            missing.extend(chunk_missing)
+            if progress_callback:
+                progress_callback(done, len(chunks))
+
+    if frames:
+        trades = pd.concat(frames, ignore_index=True)
+    else:
+        trades = pd.DataFrame(columns=['ticker', 'signal', 'plan', 'entry_date', 'exit_date',
+                                       'outcome', 'return_pct', 'bars_held'])
+    return summarize(trades), trades, missing
+
+def summarize(trades):
+    """
+    Per signal and plan: trade count, win rate, average win/loss, expectancy (mean
+    return per trade, %) and max drawdown of the equal-stake equity curve (cumulative
+    % returns of the trades in exit order).
+    """
+    rows = []
+    for (signal, plan), g in trades.groupby(['signal', 'plan'], sort=False):
+        r = g.sort_values('exit_date')['return_pct'].to_numpy(dtype=float)
+        equity = np.cumsum(r)
+        peak = np.maximum.accumulate(np.maximum(equity, 0))
+        wins, losses = r[r > 0], r[r <= 0]
+        rows.append({
+            'signal': signal,
+            'plan': plan,
+            'trades': len(r),
+            'win_rate_pct': len(wins) / len(r) * 100,
+            'avg_win_pct': wins.mean() if len(wins) else 0.0,
+            'avg_loss_pct': losses.mean() if len(losses) else 0.0,
+            'expectancy_pct': r.mean(),
+            'max_drawdown_pct': float(np.max(peak - equity)),
+            'target_pct': (g['outcome'] == 'target').mean() * 100,
+            'stop_pct': (g['outcome'] == 'stop').mean() * 100,
+            'avg_bars_held': g['bars_held'].mean(),
+        })
+    summary = pd.DataFrame(rows, columns=['signal', 'plan', 'trades', 'win_rate_pct', 'avg_win_pct', 'avg_loss_pct',
+                                          'expectancy_pct', 'max_drawdown_pct', 'target_pct', 'stop_pct', 'avg_bars_held'])
+    order = {s: i for i, s in enumerate(SIGNALS)}
+    return summary.sort_values(['signal', 'plan'], key=lambda s: s.map(order) if s.name == 'signal' else s,
+                               ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the scanner signals on the stored daily bars.")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to test (default: the watchlist)")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="Bars a trade may stay open")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--trades", help="Also write every trade to this CSV file")
+    args = parser.parse_args()
+
+    def on_progress(done, total):
+        print(f"\rBacktesting... {done}/{total} chunks", end="", flush=True)
+
+    summary, trades, missing = run_backtest(args.tickers, args.horizon, args.workers, on_progress)
+    print()
+    if missing:
+        print(f"No stored bars for {len(missing)} tickers (run a scan first): {', '.join(missing[:10])}"
+              f"{' ...' if len(missing) > 10 else ''}")
+    print(f"{len(trades)} trades, horizon {args.horizon} bars\n")
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    if args.trades:
+        trades.to_csv(args.trades, index=False)
+        print(f"\nTrades written to {args.trades}")
+
+if __name__ == "__main__":
+    main()
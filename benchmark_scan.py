@@ -0,0 +1,189 @@
+"""
+Scan benchmark: runs scan_market (and a sample of analyze_ticker calls) against
+synthetic OHLCV universes served by an offline provider, and appends the timings
+to a JSON-lines file so runs from different versions can be compared.
+
+    python benchmark_scan.py                      # 50 and 900 tickers, 20 years
+    python benchmark_scan.py --sizes 50 900 5000 --years 20
+    python benchmark_scan.py --sizes 900 --output bench.jsonl
+
+Each universe size runs in a fresh process (so peak memory is per size) and is
+scanned twice: "cold" (empty DB, full history download + panel indicators) and
+"warm" (one new bar: store top-up + streaming indicator state).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import market_data as md
+
+DEFAULT_SIZES = [50, 900]
+DEFAULT_YEARS = 20
+DEFAULT_OUTPUT = "benchmark_results.jsonl"
+ANALYZE_SAMPLE = 20 # Tickers timed through analyze_ticker (single-ticker path)
+END_DATE = "2024-06-14" # Last bar of the synthetic history (cold run)
+
+class SyntheticProvider(md.MarketDataProvider):
+    """
+    Deterministic random-walk bars for any symbol (seeded by the symbol name), no network.
+    `extra_bars` appends that many business days after END_DATE, as if the market moved on.
+    """
+    def __init__(self, years=DEFAULT_YEARS, extra_bars=0):
+        self.n_bars = years * 252
+        self.extra_bars = extra_bars
+        # Built once: bdate_range is far slower than the rest of the bar generation
+        self.dates = pd.bdate_range(end=END_DATE, periods=self.n_bars).append(
+            pd.bdate_range(start=pd.Timestamp(END_DATE) + pd.offsets.BDay(), periods=extra_bars))
+
+    def _bars(self, symbol):
+        n = self.n_bars + self.extra_bars
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        close = 1000 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n)))
+        spread = close * rng.uniform(0.002, 0.03, n)
+        open_ = close * (1 + rng.normal(0, 0.01, n))
+        return pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': rng.lognormal(13, 1, n).round(),
+        }, index=pd.DatetimeIndex(self.dates, name='Date'))
+
+    def history(self, symbol, period=None, interval="1d", start=None):
+        return self.download([symbol], period, interval, start).get(symbol, pd.DataFrame())
+
+    def download(self, symbols, period=None, interval="1d", start=None):
+        frames = {}
+        for sym in symbols:
+            df = self._bars(sym)
+            frames[sym] = df[df.index >= pd.Timestamp(start)] if start is not None else df
+        return frames
+
+    def info(self, symbol):
+        return {'returnOnEquity': 0.15}
+
+    def last_price(self, symbol):
+        return float(self._bars(symbol)['Close'].iloc[-1])
+
+    def http_get(self, url, headers=None, timeout=5):
+        return md.HttpResponse(url, 304)
+
+def _peak_memory_mb():
+    """Peak resident memory of this process (MB), or None where it can't be read."""
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def _timed_scan(ae, db, tickers):
+    """Runs one scan (+ result persistence) and returns its timings."""
+    stages = {}
+    t0 = time.perf_counter()
+    df = ae.scan_market(tickers, stage_times=stages)
+    t1 = time.perf_counter()
+    db.save_scan_results(df)
+    stages['save_results'] = time.perf_counter() - t1
+    return {'wall_sec': time.perf_counter() - t0, 'stages': stages, 'rows': len(df)}
+
+def run_universe(size, years):
+    """Benchmarks one universe size (meant to run in its own process). Returns result records."""
+    import database_manager as db
+    import data_engine as de
+    import analysis_engine as ae
+
+    db.DB_NAME = os.path.join(tempfile.mkdtemp(prefix="sentinel-bench-"), "bench.db")
+    db.init_db()
+    tickers = [f"S{i:04d}" for i in range(size)]
+
+    md.set_provider(SyntheticProvider(years))
+    cold = _timed_scan(ae, db, tickers)
+
+    # Next scan, one trading day later
+    md.set_provider(SyntheticProvider(years, extra_bars=1))
+    de._last_sync.clear()
+    warm = _timed_scan(ae, db, tickers)
+
+    sample = tickers[:ANALYZE_SAMPLE]
+    t0 = time.perf_counter()
+    for t in sample:
+        ae.analyze_ticker(t)
+    analyze_ms = (time.perf_counter() - t0) / len(sample) * 1000
+
+    peak_mb = _peak_memory_mb()
+    db_mb = os.path.getsize(db.DB_NAME) / 1024 ** 2
+    return [dict(r, run=run, universe=size, years=years, analyze_ticker_ms=analyze_ms,
+                 peak_mem_mb=peak_mb, db_size_mb=db_mb)
+            for run, r in (("cold", cold), ("warm", warm))]
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+    }
+
+def _load_previous(path):
+    """Latest stored record per (universe, years, run)."""
+    previous = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    rec = json.loads(line)
+                    previous[(rec['universe'], rec['years'], rec['run'])] = rec
+    return previous
+
+def _report(rec, prev):
+    stages = "  ".join(f"{k}={v:.2f}s" for k, v in rec['stages'].items())
+    delta = ""
+    if prev:
+        change = (rec['wall_sec'] - prev['wall_sec']) / prev['wall_sec'] * 100
+        delta = f"  ({change:+.1f}% vs {prev.get('commit') or prev['time']})"
+    mem = f"{rec['peak_mem_mb']:.0f} MB" if rec['peak_mem_mb'] is not None else "n/a"
+    print(f"{rec['universe']:>6} tickers  {rec['run']:<4}  wall={rec['wall_sec']:.2f}s{delta}")
+    print(f"        {stages}")
+    print(f"        analyze_ticker={rec['analyze_ticker_ms']:.1f} ms/ticker  peak_mem={mem}  db={rec['db_size_mb']:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scan_market on synthetic universes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Universe sizes (tickers)")
+    parser.add_argument("--years", type=int, default=DEFAULT_YEARS, help="Years of daily bars per ticker")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON-lines file the results are appended to")
+    args = parser.parse_args()
+
+    env = _environment()
+    previous = _load_previous(args.output)
+    ctx = multiprocessing.get_context("spawn")
+
+    for size in args.sizes:
+        with ctx.Pool(1) as pool:
+            records = pool.apply(run_universe, (size, args.years))
+        with open(args.output, "a") as f:
+            for rec in records:
+                rec = {**env, **rec}
+                _report(rec, previous.get((rec['universe'], rec['years'], rec['run'])))
+                f.write(json.dumps(rec) + "\n")
+
+if __name__ == "__main__":
+    main()
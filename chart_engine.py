@@ -1,79 +1,165 @@
-import yfinance as yf
+import threading
+from datetime import datetime, timedelta
+import pytz
 import plotly.graph_objects as go
+import plotly.io as pio
 import pandas as pd
+import numpy as np
+from collections import OrderedDict
+import data_engine as de
+import database_manager as db
+import metrics as mt
 
-def get_stock_history(ticker, period="3mo"):
+# Above this many bars the chart switches from candles to a downsampled WebGL line
+CHART_MAX_POINTS = 800
+# Rendered figures kept in memory (as JSON), keyed by (ticker, period, last bar timestamp and values)
+FIGURE_CACHE_SIZE = 64
+# IDX trading starts at 09:00 Jakarta time; before that the previous weekday is the latest session
+SESSION_OPEN_HOUR = 9
+
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+def last_session_date():
+    """Date of the latest IDX trading session that has started (weekends roll back to Friday)."""
+    now = datetime.now(pytz.timezone('Asia/Jakarta'))
+    day = now.date() if now.hour >= SESSION_OPEN_HOUR else now.date() - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+def get_stock_history(ticker):
     """
-    Fetches historical data for a ticker.
+    Full daily history for a ticker from the local bar store. Tickers that were
+    never stored, or whose last bar predates the latest session (e.g. portfolio
+    names outside the scan universe), are synced through the bar store first.
     """
     if not ticker.endswith(".JK"):
         ticker = f"{ticker}.JK"
-        
+
     try:
-        df = yf.download(ticker, period=period, interval="1d", progress=False)
+        df = db.load_price_bars(ticker, "1d")
+        if df.empty or df.index[-1].date() < last_session_date():
+            df = de.get_ticker_data(ticker, period="max", interval="1d")
         return df
     except Exception as e:
         print(f"Error fetching history for {ticker}: {e}")
         return pd.DataFrame()
 
+def lttb_indices(y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling: picks `n_out` indices of `y` that keep
+    its visual shape (first and last points are always kept).
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int) # n_out - 2 buckets between the end points
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Point in this bucket forming the largest triangle with the previous pick and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
 def create_price_chart(ticker, period="3mo"):
     """
     Creates a Plotly CandleStick chart for the given ticker.
+    Built from stored bars; the serialized figure is reused until a new bar arrives
+    or the last bar is updated (intraday top-ups rewrite it in place).
     """
-    df = get_stock_history(ticker, period)
-    
+    df = get_stock_history(ticker)
+
     if df.empty:
         return None
-        
-    # Flatten MultiIndex columns if necessary (yfinance update quirk)
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.get_level_values(0)
-    
-    # Calculate Moving Averages
+
+    key = (ticker, period, df.index[-1], tuple(df.iloc[-1][db.BAR_COLUMNS]))
+    with _figure_cache_lock:
+        fig_json = _figure_cache.get(key)
+        if fig_json is not None:
+            _figure_cache.move_to_end(key)
+    mt.CACHE_REQUESTS.inc(cache="chart_figure", result="miss" if fig_json is None else "hit")
+    if fig_json is None:
+        fig_json = _build_price_chart(ticker, period, df).to_json()
+        with _figure_cache_lock:
+            _figure_cache[key] = fig_json
+            while len(_figure_cache) > FIGURE_CACHE_SIZE:
+                _figure_cache.popitem(last=False)
+
+    # A fresh figure per call, so sessions never share (and mutate) one object
+    return pio.from_json(fig_json)
+
+def _build_price_chart(ticker, period, df):
+    """Builds the chart figure from the full daily history `df`."""
+    # Calculate Moving Averages (on the full history, so the first bars of the period have values)
+    df = df.copy()
     df['MA5'] = df['Close'].rolling(window=5).mean()
     df['MA20'] = df['Close'].rolling(window=20).mean()
+    df = de.slice_period(df, period)
 
     fig = go.Figure()
-    
-    # Candlestick
-    fig.add_trace(go.Candlestick(
-        x=df.index,
-        open=df['Open'],
-        high=df['High'],
-        low=df['Low'],
-        close=df['Close'],
-        name="Price"
-    ))
-    
+
+    if len(df) <= CHART_MAX_POINTS:
+        # Candlestick
+        fig.add_trace(go.Candlestick(
+            x=df.index,
+            open=df['Open'],
+            high=df['High'],
+            low=df['Low'],
+            close=df['Close'],
+            name="Price"
+        ))
+        line_df, scatter = df, go.Scatter
+    else:
+        # Long period: close line downsampled to the point budget, drawn with WebGL
+        line_df = df.iloc[lttb_indices(df['Close'].to_numpy(), CHART_MAX_POINTS)]
+        scatter = go.Scattergl
+        fig.add_trace(scatter(
+            x=line_df.index,
+            y=line_df['Close'],
+            mode='lines',
+            line=dict(color='white', width=1.2),
+            name="Price (Close)"
+        ))
+
     # Add MA5 (BPJS/Short-term baseline)
-    fig.add_trace(go.Scatter(
-        x=df.index,
-        y=df['MA5'],
+    fig.add_trace(scatter(
+        x=line_df.index,
+        y=line_df['MA5'],
         mode='lines',
         line=dict(color='orange', width=1.5),
         name='MA5 (1 Minggu)'
     ))
-    
+
     # Add MA20 (Swing baseline)
-    fig.add_trace(go.Scatter(
-        x=df.index,
-        y=df['MA20'],
+    fig.add_trace(scatter(
+        x=line_df.index,
+        y=line_df['MA20'],
         mode='lines',
         line=dict(color='blue', width=1.5),
         name='MA20 (1 Bulan)'
     ))
-    
+
     # Add Buy Signals (Momentum BPJS: Cross above MA5 strongly)
     buy_signals = df[(df['Close'] > df['MA5']) & (df['Close'].shift(1) <= df['MA5'].shift(1)) & (df['Close'] > df['Open'])]
     if not buy_signals.empty:
-        fig.add_trace(go.Scatter(
+        fig.add_trace(scatter(
             x=buy_signals.index,
             y=buy_signals['Low'] * 0.98, # Slightly below the candle
             mode='markers',
             marker=dict(symbol='triangle-up', size=14, color='lime', line=dict(width=1, color='darkgreen')),
             name='Momentum Buy (BPJS Radar)'
         ))
-    
+
     fig.update_layout(
         title=f"Price History: {ticker} ({period})",
         yaxis_title="Price (IDR)",
@@ -83,5 +169,5 @@ def create_price_chart(ticker, period="3mo"):
         margin=dict(l=20, r=20, t=40, b=20),
         xaxis_rangeslider_visible=False
     )
-    
+
     return fig
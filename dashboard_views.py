@@ -0,0 +1,343 @@
+import pandas as pd
+
+import database_manager as db
+import analysis_engine as ae
+
+# Materialized Dashboard page. The ranked rows of every panel are built once per scan
+# (or live price update, see db.get_scan_results_version) and the playbook texts of
+# the breakout and volatility panels once per scan, market phase and macro weather.
+# Both are stored in SQLite; the page only renders what is stored.
+PANEL_SIZE = 5
+PICKS_SIZE = 3
+NO_MACRO = "none" # Macro weather unavailable
+
+# --- Panels ---
+def _fmt(value, spec):
+    return spec.format(value) if pd.notna(value) else ""
+
+def _table_rows(df, columns):
+    """Display rows of a table panel: {label: formatted value} in `columns` order."""
+    return [{label: _fmt(row[col], spec) if spec else row[col] for col, label, spec in columns}
+            for _, row in df.iterrows()]
+
+TREND = ('trend_strength', 'Trend (W+D)', None)
+TABLES = {
+    # panel -> displayed columns (column, label, format)
+    'ath': [('ticker', 'Ticker', None), ('current_price', 'Price', "{:,.0f}"),
+            ('ath_distance_pct', 'ATH Dist', "{:.2f}%"), TREND],
+    'volatile': [('ticker', 'Ticker', None), ('current_price', 'Price', "{:,.0f}"),
+                 ('vol_spike_ratio', 'Vol Ratio', "{:.1f}x"), TREND],
+    'oversold': [('ticker', 'Ticker', None), ('current_price', 'Price', "{:,.0f}"), ('rsi', 'RSI', "{:.1f}"), TREND],
+    'golden_cross': [('ticker', 'Ticker', None), ('current_price', 'Price', "{:,.0f}"),
+                     ('macd_val', 'MACD', "{:.2f}"), TREND],
+    'hammer': [('ticker', 'Ticker (Kode)', None), ('current_price', 'Price (Harga)', "{:,.0f}")],
+    'doji': [('ticker', 'Ticker (Kode)', None), ('current_price', 'Price (Harga)', "{:,.0f}")],
+}
+
+def _flag(df, column):
+    return df[column] == True if column in df else pd.Series(False, index=df.index)
+
+def select_panels(df):
+    """{panel: DataFrame} of the rows each Dashboard panel shows, in display order."""
+    if 'trend_strength' not in df.columns:
+        df = df.assign(trend_strength="N/A") # Backward compatibility for new columns
+
+    # --- BEST PICK ALGORITHM ---
+    # Criteria: Golden Cross AND Strong Uptrend (Weekly + Daily Up)
+    golden = _flag(df, 'is_golden_cross')
+    picks = df[golden & df['trend_strength'].str.contains("STRONG", na=False)]
+    # Fallback: If no strong, try just Uptrend or just Golden Cross
+    if picks.empty:
+        picks = df[golden]
+
+    return {
+        'picks': picks.head(PICKS_SIZE),
+        'ath': df[df['ath_distance_pct'] > -10].sort_values('ath_distance_pct', ascending=False).head(PANEL_SIZE),
+        'volatile': df[_flag(df, 'is_volatile')].head(PANEL_SIZE),
+        'oversold': df[_flag(df, 'is_oversold')].head(PANEL_SIZE),
+        'golden_cross': df[golden].head(PANEL_SIZE),
+        'hammer': df[_flag(df, 'is_hammer')].head(PANEL_SIZE),
+        'doji': df[_flag(df, 'is_doji')].head(PANEL_SIZE),
+    }
+
+def _pick_card(row):
+    return {
+        'ticker': row['ticker'],
+        'price': f"**Rp {row['current_price']:,.0f}**",
+        'trend': row['trend_strength'],
+        'plan': f"""
+                        **🎯 Plan A (Safe 1:2)**
+                        - Buy: **{row['current_price']:,.0f}**
+                        - TP: **{row['plan_cons_tp']:,.0f}** :green[(+8%)]
+                        - SL: **{row['plan_cons_sl']:,.0f}** :red[(-4%)]
+
+                        **🚀 Plan B (Aggressive 1:3)**
+                        - TP: **{row['plan_aggr_tp']:,.0f}** :green[(+15%)]
+                        - SL: **{row['plan_aggr_sl']:,.0f}** :red[(-5%)]
+                        """,
+        'news_sentiment': float(row['news_sentiment']) if pd.notna(row.get('news_sentiment')) else 0.0,
+    }
+
+def build_views(df):
+    """[(panel, rank, ticker, row dict)] for every panel: pick cards and formatted table rows."""
+    rows = []
+    for panel, selected in select_panels(df).items():
+        if panel == 'picks':
+            display = [_pick_card(row) for _, row in selected.iterrows()]
+        else:
+            display = _table_rows(selected, TABLES[panel])
+        rows.extend((panel, rank, t, r) for rank, (t, r) in enumerate(zip(selected['ticker'], display)))
+    return rows
+
+# --- Narratives ---
+def _roe_text(roe):
+    if roe is None or pd.isna(roe):
+        return "N/A"
+    roe_pct = roe * 100
+    if roe_pct >= 15:
+        return f"✅ {roe_pct:.2f}% (Sangat Sehat)"
+    elif roe_pct < 0:
+        return f"❌ {roe_pct:.2f}% (Rugi/Bakar Duit)"
+    return f"⚠️ {roe_pct:.2f}% (Biasa/Kurang Sehat)"
+
+def breakout_playbook(row, phase_name, macro_color):
+    """Playbook of a Near-ATH stock for the market phase and macro weather (texts for the expander)."""
+    price = row['current_price']
+    ath = row['ath_price']
+    tp_price = ath * 1.10 # Target 10%
+    cl_price = ath * 0.95 # Cutloss 5%
+
+    # --- DYNAMIC NARRATIVE ENGINE (BREAKOUT) ---
+    if "Golden Time" in phase_name or "Tutup" in phase_name or "Pre-Closing" in phase_name:
+        if price >= ath:
+            level = "success"
+            status_msg = f"🎯 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga bertahan kuat di atas Rp {ath:,.0f} menjelang penutupan. **Sinyal Beli (Buy) Sangat Valid!** Hajar Kanan sekarang atau hold jika sudah punya."
+            narrative = f"Breakout terkonfirmasi sempurna di penghujung hari! Ini adalah 'Golden Time' yang kita tunggu. Penutupan yang kuat di atas resisten kritis menandakan institusi bersedia menahan barang (akumulasi), memberikan peluang besar harga akan lanjut reli besok pagi."
+        else:
+            level = "error"
+            status_msg = f"🛑 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nSangat disayangkan, harga gagal bertahan di atas Rp {ath:,.0f} dan bursa mau tutup. **Breakout Gagal.** Lupakan saham ini atau segera Cut Loss jika terlanjur beli."
+            narrative = f"Sayang sekali, saham ini gagal mempertahankan level penembusannya hingga bursa tutup. Pola seperti ini sering disebut 'False Breakout' (Jebakan Bull Trap). Bandar memancing ritel di pagi hari lalu membantingnya ke bawah. Hindari masuk."
+    elif "Pagi" in phase_name or "Pembukaan" in phase_name:
+        if price >= ath:
+            level = "info"
+            status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga menembus Rp {ath:,.0f}, TAPI ini masih terlalu pagi. Rawan *profit taking*. Cicil beli kecil (Tes Ombak)."
+            narrative = f"Saham ini sedang berusaha menembus rekor harga tertinggi (ATH). Karena ini masih pagi, volatilitas sangat tinggi. Seringkali bandar sengaja menarik harga ke atas sesaat untuk memancing ritel sebelum dibanting. Tetap waspada, amati apakah antrean beli (bid) cukup tebal."
+        else:
+            level = "warning"
+            status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nBelum kuat menembus Rp {ath:,.0f}. Santai dulu, amati dari luar. Jangan tangkap pisau jatuh di pagi hari."
+            narrative = f"Saham ini berpotensi breakout, namun pagi ini masih terlihat ragu-ragu dan belum mampu menembus resisten kuatnya. Jangan buru-buru masuk, biarkan market membentuk arahnya terlebih dahulu hingga sesi siang."
+    else: # Sesi 1 or Sesi 2
+        if price >= ath:
+            level = "success"
+            status_msg = f"👍 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nTren terlihat positif siang ini. Harga konsisten di atas batas aman. Boleh tambah porsi beli (Average Up)."
+            narrative = f"Luar biasa! Melewati sesi pagi yang bergejolak, saham ini berhasil bertahan di atas harga ATH-nya. Ini adalah konfirmasi validasi tren positif. Bandar tampaknya serius melakukan akumulasi. Momentum sangat mendukung untuk masuk."
+        else:
+            level = "warning"
+            status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga masih tertahan di bawah Rp {ath:,.0f}. Momentum mulai hilang. Wait and see sampai Golden Time (14:30) nanti."
+            narrative = f"Upaya penembusan harga tertinggi tampaknya tertahan di sesi ini. Harga tidak mampu dipertahankan dan tertekan kembali ke bawah resisten. Jangan memaksakan diri, lebih baik tunggu konfirmasi di jam 14:40 nanti."
+
+    macro_note = ""
+    if macro_color == 'red':
+        macro_note = f"🚨 **PERINGATAN MACRO:** Walaupun saham ini punya potensi Breakout, **Cuaca IHSG sedang Badai**. Mayoritas saham *breakout* di saat market hancur berpotensi menjadi *Bull Trap* (Jebakan). Kurangi porsi beli atau *wait and see*."
+    elif macro_color == 'green':
+        macro_note = f"🔥 **DUKUNGAN MACRO:** Cuaca IHSG sedang Euforia! Probabilitas *breakout* sukses jauh lebih tinggi. Angin sedang bertiup dari belakang layar."
+
+    # --- DYNAMIC PROJECTION ENGINE (BREAKOUT) ---
+    if "Pagi" in phase_name or "Pembukaan" in phase_name:
+        proyeksi = f"- **Menjelang Siang (10:00 - 11:30):** Pantau apakah harga mampu bertahan di atas Rp {ath:,.0f}. Jika tiba-tiba melorot, lupakan dulu.\n- **Sesi Sore (14:40):** Ini waktu penentuan. Jika harga masih kuat bertengger di atas ATH, baru eksekusi beli dengan mantap."
+    elif "Sesi" in phase_name:
+        proyeksi = f"- **Sesi 2 (13:30 - 14:30):** Perhatikan apakah ada 'bantingan' (penurunan paksa) oleh bandar. Tetap santai.\n- **Jelang Tutup (14:40):** Keputusan final ada di jam ini. Jika *breakout* tetap valid, silakan tahan barangmu."
+    elif "Golden Time" in phase_name or "Tutup" in phase_name or "Pre-Closing" in phase_name:
+        proyeksi = f"- **Penutupan Hari Ini:** Evaluasi apakah saham ditutup kokoh. Jika ya, *breakout* sukses.\n- **Skenario Besok Pagi:** Rawan *profit taking* kilat. Siapkan antrean jual di target Rp {tp_price:,.0f}."
+    else:
+        proyeksi = f"- **Besok Pagi (09:00 - 09:30):** Waspada lonjakan atau bantingan di awal pembukaan.\n- **Siang (11:00):** Waktu untuk memastikan apakah tren kemarin masih berlanjut."
+
+    if "Pagi" in phase_name or "Pembukaan" in phase_name:
+        bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Kalau masuk sekarang niat main cepat, target jualmu di rentang **Rp {price * 1.02:,.0f} - Rp {price * 1.03:,.0f}** (+2-3%). JUAL sebelum bursa tutup berapapun harganya. Jangan ngarep besok mantul."
+    elif "Sesi" in phase_name:
+        bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Jika sudah mencapai batas cuan BPJS (sekitar **Rp {price * 1.02:,.0f}**), boleh langsung bungkus. Jangan terlalu serakah menunggu harga puncak."
+    else:
+        bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Sesi *Day Trading* sudah berakhir. Masuk jam segini otomatis kamu berhaluan Swing Trader (siap menahan barang menginap)."
+
+    return {
+        'title': f"⭐ {row['ticker']} (Jarak ke puncak: {row['ath_distance_pct']:.2f}%)",
+        'facts': [f"**Harga Saat Ini:** Rp {price:,.0f}",
+                  f"**Target Puncak (ATH):** Rp {ath:,.0f}",
+                  f"**Kesehatan Bisnis (ROE):** {_roe_text(row.get('roe'))}"],
+        'insight': "",
+        'level': level,
+        'status': status_msg,
+        'macro_note': macro_note,
+        'narrative': narrative,
+        'projection': proyeksi,
+        'exit_plan': [f"- **Take Profit:** Pasang **Auto Order Jual** di target **Rp {tp_price:,.0f}** (+10%).",
+                      f"- **Cut Loss:** Sabuk pengaman di **Rp {cl_price:,.0f}**. Patuhi ketat.",
+                      bpjs_advice],
+        'telegram': f"🚀 *{row['ticker']}* (Rp {price:,.0f})\n{narrative}\n\n",
+    }
+
+def volatile_playbook(row, phase_name):
+    """Playbook of a volume-spike stock for the market phase (texts for the expander)."""
+    price = row['current_price']
+    change = row['price_change_pct']
+    vol = row['vol_spike_ratio']
+    roe = row.get('roe', None)
+    roe = None if roe is None or pd.isna(roe) else roe
+    tp_low = price * 1.05
+    tp_high = price * 1.10
+    cl_price = price * 0.95
+
+    if change > 0:
+        status_harga = f"📈 **NAIK** {change:.2f}%"
+        analisa = f"Volume transaksi meledak hingga {vol:.1f}x lipat rata-rata saat harga sedang NAIK. Secara teknikal, ini adalah jejak rekam bahwa Institusi/Bandar besar sedang melakukan akumulasi (borong barang)."
+        if roe is not None and roe < 0:
+            analisa += " **Namun PERHATIAN EKSTRA:** Secara fundamental, perusahaan ini mencetak kerugian (ROE Minus). Kenaikan ini berisiko tinggi murni karena spekulasi/gorengan. Disiplin *trading* harus ekstra ketat!"
+    else:
+        status_harga = f"📉 **TURUN** {abs(change):.2f}%"
+        analisa = f"Lampu Kuning Menyala! Terdapat ledakan volume {vol:.1f}x lipat diiringi harga yang TURUN. Ini mengindikasikan Distribusi (Bandar sedang buang barang masif ke pasar ritel)."
+
+    playbook = {
+        'title': f"🔥 {row['ticker']} (Volume meledak {vol:.1f}x lipat)",
+        'facts': [f"**Harga Saat Ini:** Rp {price:,.0f}",
+                  f"**Kondisi Hari Ini:** {status_harga}",
+                  f"**Kesehatan Bisnis (ROE):** {_roe_text(roe)}"],
+        'insight': f"**Insight Analis Dasar:** {analisa}",
+        'macro_note': "",
+    }
+    if change <= 0:
+        playbook.update({
+            'level': "error",
+            'status': f"🛑 **Skenario Eksekusi:** Sangat berisiko tinggi (*High Risk*). Secara teknikal, membeli saham yang sedang didistribusi bandar sama dengan menangkap pisau jatuh. **Wait and See**.",
+            'narrative': "", 'projection': "", 'exit_plan': [],
+            'telegram': f"🚨 *{row['ticker']}* (Rp {price:,.0f})\nDistribusi Bandar. Jauhi saham ini!\n\n",
+        })
+        return playbook
+
+    # --- DYNAMIC NARRATIVE ENGINE (VOLATILE) ---
+    if "Golden Time" in phase_name or "Tutup" in phase_name or "Pre-Closing" in phase_name:
+        if price >= cl_price:
+            level = "success"
+            status_msg = f"🎯 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga ditutup aman di atas batas *cut loss* (Rp {cl_price:,.0f}). Tren akumulasi bandar **VALID**. Aman di-Hold."
+            narrative = f"Pergerakan harga sukses dipertahankan hingga menjelang penutupan. Secara probabilitas, tren kenaikan (uptrend) jangka pendek masih sangat valid. Tidak ada tanda-tanda distribusi masif dari institusi."
+        else:
+            level = "error"
+            status_msg = f"🛑 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nBencana! Harga dijebol ke bawah Rp {cl_price:,.0f} menjelang tutup. Bandar distribusi diam-diam. **EKSEKUSI CUT LOSS!**"
+            narrative = f"Lampu merah! Harga justru ditutup nyungsep menembus batas toleransi dukungan. Ini menandakan ledakan volume kemarin kemungkinan besar adalah aksi jualan terselubung bandar ke ritel. Sangat berisiko tinggi."
+    elif "Pagi" in phase_name or "Pembukaan" in phase_name:
+        if price >= cl_price * 1.05:
+            level = "warning"
+            status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga melesat sangat kencang. Awas pancingan (FOMO)!"
+            narrative = f"Volume ledakan kemarin berlanjut dengan euforia pagi ini, harga melesat kencang. Hati-hati FOMO (Fear of Missing Out). Seringkali harga ditarik kencang di awal hanya untuk jualan. Jangan kejar harga atas."
+        else:
+            level = "info"
+            status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nPagi ini rawan gocekan karena kemarin naik kencang. Jangan panik kalau tiba-tiba merah. Tahan diri dulu."
+            narrative = f"Sangat wajar jika pagi ini harga bergerak volatil atau bahkan terkoreksi sedikit (Profit Taking wajar). Bandar sedang menguji apakah ada kepanikan ritel. Amati reaksinya hingga lewat jam 10:00."
+    else: # Sesi 1 or Sesi 2
+        if price > cl_price * 1.02:
+            level = "success"
+            status_msg = f"👍 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nTren naik terkonfirmasi siang ini! Bandar melanjutkan *Markup*. Boleh ikut antre beli (Hajar Kanan)."
+            narrative = f"Konfirmasi yang solid! Setelah sempat diuji pagi tadi, harga kini stabil di area positif. Ini indikasi kuat bahwa 'Markup' (pengangkatan harga) oleh Institusi masih terus berlanjut. Momentum sangat baik."
+        else:
+            level = "warning"
+            status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga tertahan. Hati-hati bandar sedang mengukur minat ritel. Jangan tambah muatan dulu."
+            narrative = f"Harga terlihat loyo dan tertahan di sesi siang ini, padahal volume kemarin sangat besar. Ini bisa menjadi sinyal awal bandar mulai mendistribusikan (jual pelan-pelan) barangnya saat ritel sedang lengah."
+
+    # --- DYNAMIC PROJECTION ENGINE (VOLATILE) ---
+    if "Pagi" in phase_name or "Pembukaan" in phase_name:
+        if price > cl_price * 1.05:
+            proyeksi = f"- **Menjelang Siang (10:30):** Karena pagi ini melesat naik, rawan dibanting siang nanti. Jangan buru-buru antre beli.\n- **Sore Hari (14:40):** Lihat apakah kenaikan pagi tadi sungguhan atau cuma jebakan."
+        else:
+            proyeksi = f"- **Sesi Siang (11:00):** Jika pagi ini merah, pantau apakah jam 11 nanti mulai ditarik hijau. Jika ditarik hijau, itu adalah momen beli terbaik (Markup konfirmasi).\n- **Batas Waktu (14:40):** Jika sampai sore tetap tidak bisa naik, coret dari daftar."
+    elif "Sesi" in phase_name:
+        proyeksi = f"- **Sesi 2 (13:30 - 14:30):** Biasanya bandar mulai bergerak masif di jam ini. Waspadai volatilitas mendadak.\n- **Jelang Tutup (14:40):** Evaluasi akhir sebelum penutupan. Pastikan harga aman di atas batas *cut loss* (Rp {cl_price:,.0f})."
+    else:
+        proyeksi = f"- **Skenario Besok Pagi:** Jangan kaget jika pagi hari langsung merah sekejap (gocekan bandar). Jangan panik.\n- **Evaluasi Besok Siang:** Biarkan market menentukan arah aslinya setelah jam 10 pagi."
+
+    if "Pagi" in phase_name or "Pembukaan" in phase_name:
+        if price > cl_price * 1.05:
+            bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Sangat disarankan untuk volatilitas liar! Target copet kilat di **Rp {price * 1.03:,.0f}** (+3%). Langsung hajar kiri (jual). Jangan bawa menginap."
+        else:
+            bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Ladang emas pencopet. Masuk dekat *support* (**Rp {cl_price:,.0f}**), ambil cuan di **Rp {price * 1.03:,.0f}** lalu lari. Jangan terbawa perasaan jika sore dibanting."
+    elif "Sesi" in phase_name:
+        bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Jika sudah cuan lumayan sejak pagi (harga sudah menyentuh **Rp {price * 1.02:,.0f}**), amankan sekarang. Bandar sering buang barang di sesi siang/sore."
+    else:
+        bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Jam segini bukan waktu untuk copet harian. Pasang incaran eksekusi di **Rp {price * 1.02:,.0f}** untuk trading plan besok pagi saja."
+
+    playbook.update({
+        'level': level,
+        'status': status_msg,
+        'narrative': narrative,
+        'projection': proyeksi,
+        'exit_plan': [f"- **Take Profit:** Volatilitas tinggi = pergerakan cepat. Pasang antrean **Auto Order Jual** di rentang **Rp {tp_low:,.0f} - Rp {tp_high:,.0f}**.",
+                      f"- **Cut Loss:** Sabuk pengaman di **Rp {cl_price:,.0f}**. Patuhi *cut loss*.",
+                      bpjs_advice],
+        'telegram': f"🔥 *{row['ticker']}* (Rp {price:,.0f})\n{narrative}\n\n",
+    })
+    return playbook
+
+PLAYBOOK_PANELS = ('ath', 'volatile')
+
+def build_narratives(df, phase_name, macro_color, tickers=None):
+    """[(ticker, panel, playbook)] for the rows of the breakout and volatility panels."""
+    panels = select_panels(df)
+    rows = []
+    for panel in PLAYBOOK_PANELS:
+        selected = panels[panel]
+        if tickers is not None:
+            selected = selected[selected['ticker'].isin(tickers[panel])]
+        for _, row in selected.iterrows():
+            body = (breakout_playbook(row, phase_name, macro_color) if panel == 'ath'
+                    else volatile_playbook(row, phase_name))
+            rows.append((row['ticker'], panel, body))
+    return rows
+
+# --- Materialization ---
+def macro_key(macro):
+    """Macro weather state used as part of the narrative key ('green', 'red', 'gray'...)."""
+    return macro['color'] if macro else NO_MACRO
+
+def _group_views(rows):
+    """{panel: [(ticker, row dict)]} from build_views rows, the shape db.get_dashboard_views returns."""
+    views = {}
+    for panel, _, ticker, row in sorted(rows, key=lambda r: (r[0], r[1])):
+        views.setdefault(panel, []).append((ticker, row))
+    return views
+
+def get_dashboard(df, scan_version, phase_name, macro_color):
+    """
+    (views, narratives) for the Dashboard page: {panel: [(ticker, row)]} and
+    {(panel, ticker): playbook}. Whatever is missing for this scan version, market
+    phase or macro state is built from `df` and stored first. Without a scan version
+    (a legacy latest_scan that was never re-saved) there is nothing to key the store
+    on, so both are built in memory.
+    """
+    if scan_version is None:
+        views = _group_views(build_views(df))
+        narratives = {(panel, ticker): body for ticker, panel, body in build_narratives(df, phase_name, macro_color)}
+        return views, narratives
+
+    views = db.get_dashboard_views(scan_version)
+    if views is None:
+        rows = build_views(df)
+        db.save_dashboard_views(scan_version, rows)
+        views = db.get_dashboard_views(scan_version)
+        if views is None:
+            views = _group_views(rows) # Store unavailable
+
+    narratives = db.get_dashboard_narratives(scan_version, phase_name, macro_color)
+    wanted = {p: {t for t, _ in views.get(p, [])} for p in PLAYBOOK_PANELS}
+    missing = {p: {t for t in wanted[p] if (p, t) not in narratives} for p in PLAYBOOK_PANELS}
+    if any(missing.values()):
+        rows = build_narratives(df, phase_name, macro_color, missing)
+        db.save_dashboard_narratives(scan_version, phase_name, macro_color, rows)
+        narratives.update({(panel, ticker): body for ticker, panel, body in rows})
+    return views, narratives
+
+def refresh():
+    """Materializes the latest saved scan for the current market phase and macro weather."""
+    df, _ = db.get_latest_scan_results()
+    if df.empty:
+        return False
+    phase_name, _ = ae.get_market_phase()
+    get_dashboard(df, db.get_scan_results_version(), phase_name, macro_key(ae.get_macro_weather()))
+    return True
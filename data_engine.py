@@ -1,18 +1,301 @@
-import yfinance as yf
 import pandas as pd
+import numpy as np
+import re
+import threading
+import time
+import database_manager as db
+import scan_executor as se
+import fetch_cache as fc
+import market_data as md
+
+# Hosts used for per-host rate limiting (the provider throttles its own calls)
+YAHOO_HOST = md.YAHOO_HOST
+NEWS_HOST = md.NEWS_HOST
+
+# Intervals served from the local bar store (intraday bars are always fetched live)
+STORE_INTERVALS = ("1d",)
+# Longer timeframes are derived from the stored daily bars instead of a second download.
+# IDX trades Monday-Friday, so a week is a W-FRI period; each bar is labeled with the
+# last trading day it contains, and holiday-only weeks produce no bar.
+RESAMPLE_RULES = {"1wk": "W-FRI", "1mo": "M"}
+# Stored bars re-fetched on each top-up, used to detect retroactive split/dividend adjustments
+STORE_OVERLAP_BARS = 5
+# Skip the network top-up if the same ticker/interval was synced this recently (seconds)
+STORE_MIN_SYNC_SEC = 60
+
+_last_sync = {}
+
+# Shared cache lifetimes for the dashboard fetchers (seconds, see fetch_cache)
+RADAR_CACHE_TTL_SEC = 300
+# Serve at most this long past expiry before fetching synchronously again
+RADAR_MAX_STALE_SEC = 3600
 
 def get_ticker_data(ticker, period="1mo", interval="1d"):
     """
     Fetches historical data for a single ticker.
     Ensures ticker has .JK suffix for IDX stocks if not present.
+    Daily bars are served from the local bar store, which only downloads the
+    bars after the last stored timestamp; weekly/monthly bars are resampled from them.
     """
     if not ticker.endswith(".JK"):
         ticker = f"{ticker}.JK"
-    
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period=period, interval=interval)
+
+    if interval in RESAMPLE_RULES:
+        daily = get_ticker_data(ticker, period="max", interval="1d")
+        return slice_period(resample_bars(daily, interval), period)
+
+    if interval not in STORE_INTERVALS:
+        return _download_history(ticker, period=period, interval=interval)
+
+    try:
+        hist = sync_bar_store(ticker, interval)
+    except Exception as e:
+        print(f"Bar store error for {ticker}: {e}")
+        return _download_history(ticker, period=period, interval=interval)
+
+    return slice_period(hist, period)
+
+def _download_history(ticker, period=None, interval="1d", start=None):
+    """Downloads bars from the market data provider and normalizes them to plain OHLCV in Jakarta local time."""
+    return normalize_bars(md.get_provider().history(ticker, period=period, interval=interval, start=start))
+
+def normalize_bars(hist):
+    """Keeps OHLCV columns only, drops empty bars and converts the index to naive Jakarta time."""
+    if hist.empty:
+        return pd.DataFrame(columns=db.BAR_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+
+    hist = hist[db.BAR_COLUMNS].dropna(subset=['Close'])
+    if hist.index.tz is not None:
+        hist.index = hist.index.tz_convert('Asia/Jakarta').tz_localize(None)
+    hist.index.name = 'Date'
     return hist
 
+def sync_bar_store(ticker, interval="1d"):
+    """
+    Tops up the stored history for a ticker with the bars after the last stored
+    timestamp and returns the full stored history.
+    The first call for a ticker downloads period="max" once.
+    """
+    key = (ticker, interval)
+    if time.monotonic() - _last_sync.get(key, float('-inf')) < STORE_MIN_SYNC_SEC:
+        return db.load_price_bars(ticker, interval)
+
+    stored = db.load_price_bars(ticker, interval)
+    if stored.empty:
+        hist = _download_history(ticker, period="max", interval=interval)
+        db.save_price_bars(ticker, interval, hist, replace=True)
+        _last_sync[key] = time.monotonic()
+        return hist
+
+    start = stored.index[-min(STORE_OVERLAP_BARS, len(stored))]
+    fresh = _download_history(ticker, interval=interval, start=start)
+    hist = merge_bars(stored, fresh)
+    if hist is None:
+        # Provider re-adjusted past bars (split/dividend): stored history is stale
+        print(f"Adjusted history detected for {ticker} ({interval}), re-downloading.")
+        hist = _download_history(ticker, period="max", interval=interval)
+        db.save_price_bars(ticker, interval, hist, replace=True)
+    elif not fresh.empty:
+        db.save_price_bars(ticker, interval, fresh)
+
+    _last_sync[key] = time.monotonic()
+    return hist
+
+def merge_bars(stored, fresh):
+    """
+    Appends freshly downloaded bars to the stored history.
+    Returns None when the overlapping bars disagree, which means the
+    provider has retroactively adjusted the series.
+    """
+    if fresh.empty:
+        return stored
+
+    # The last stored bar may have been a live (unfinished) bar, so it is not compared
+    overlap = stored.index[:-1].intersection(fresh.index)
+    if len(overlap) and not np.allclose(stored.loc[overlap, 'Close'], fresh.loc[overlap, 'Close'], rtol=1e-3):
+        return None
+
+    return pd.concat([stored[stored.index < fresh.index[0]], fresh])
+
+def resample_bars(daily, interval="1wk"):
+    """
+    Aggregates daily OHLCV bars into weekly ("1wk") or monthly ("1mo") bars
+    (see RESAMPLE_RULES). The last bar covers the current, unfinished period.
+    """
+    if daily.empty:
+        return daily
+
+    codes = daily.index.to_period(RESAMPLE_RULES[interval]).asi8
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:] - 1, len(codes) - 1]
+
+    return pd.DataFrame({
+        'Open': daily['Open'].to_numpy()[starts],
+        'High': np.fmax.reduceat(daily['High'].to_numpy(dtype=float), starts),
+        'Low': np.fmin.reduceat(daily['Low'].to_numpy(dtype=float), starts),
+        'Close': daily['Close'].to_numpy()[ends],
+        'Volume': np.add.reduceat(np.nan_to_num(daily['Volume'].to_numpy(dtype=float)), starts),
+    }, index=daily.index[ends])
+
+def slice_period(hist, period):
+    """Cuts a stored history down to a yfinance-style period ("5d", "3mo", "2y", "ytd", "max")."""
+    if hist.empty or period in (None, "max"):
+        return hist
+
+    end = hist.index[-1]
+    if period == "ytd":
+        return hist[hist.index >= pd.Timestamp(end.year, 1, 1)]
+
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        return hist
+
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        return hist.tail(n) # Trading days, like Yahoo
+    offset = {"wk": pd.DateOffset(weeks=n), "mo": pd.DateOffset(months=n), "y": pd.DateOffset(years=n)}[unit]
+    return hist[hist.index > end - offset]
+
+# --- Batch History (Whole Universe) ---
+# Tickers per multi-ticker yf.download request
+BATCH_CHUNK_SIZE = 50
+
+def chunk_list(items, size=BATCH_CHUNK_SIZE):
+    """Splits a list into consecutive chunks of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _download_batch(symbols, period=None, interval="1d", start=None):
+    """
+    Downloads several tickers in one batch request.
+    Returns {symbol: normalized OHLCV DataFrame}; tickers with no data are omitted.
+    """
+    frames = {}
+    for sym, df in md.get_provider().download(symbols, period=period, interval=interval, start=start).items():
+        df = normalize_bars(df)
+        if not df.empty:
+            frames[sym] = df
+    return frames
+
+def get_batch_ticker_data(tickers, period="max", interval="1d", chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Fetches history for a whole list of tickers with chunked multi-ticker downloads
+    and keeps the bar store in sync.
+    Returns {ticker: DataFrame} keyed by the tickers as given. Tickers whose chunk
+    failed are left out so callers can fall back to get_ticker_data.
+    """
+    frames = {}
+    for chunk in chunk_list(list(tickers), chunk_size):
+        try:
+            frames.update(fetch_history_chunk(chunk, period=period, interval=interval))
+        except Exception as e:
+            print(f"Error batch fetching history: {e}")
+    return frames
+
+def fetch_history_chunk(tickers, period="max", interval="1d"):
+    """
+    Fetches history for one chunk of tickers (see get_batch_ticker_data).
+    Tickers with stored history only download the bars since their last stored bar;
+    new tickers download period="max" once. Raises on download errors so the
+    caller can retry the chunk.
+    """
+    if interval in RESAMPLE_RULES:
+        daily = fetch_history_chunk(tickers, period="max", interval="1d")
+        return {t: slice_period(resample_bars(df, interval), period) for t, df in daily.items()}
+
+    symbols = {t: (t if t.endswith(".JK") else f"{t}.JK") for t in tickers}
+    if interval not in STORE_INTERVALS:
+        fresh = _download_batch(list(symbols.values()), period=period, interval=interval)
+        return {t: fresh[sym] for t, sym in symbols.items() if sym in fresh}
+
+    stored = {sym: db.load_price_bars(sym, interval) for sym in symbols.values()}
+    old_syms = [sym for sym, df in stored.items() if not df.empty]
+    refresh = [sym for sym, df in stored.items() if df.empty]
+
+    # Histories topped up moments ago (e.g. by the scan pre-filter) are used as stored
+    now = time.monotonic()
+    hists = {sym: stored[sym] for sym in old_syms
+             if now - _last_sync.get((sym, interval), float('-inf')) < STORE_MIN_SYNC_SEC}
+    old_syms = [sym for sym in old_syms if sym not in hists]
+    # One download per top-up start, so a single stale ticker does not make the
+    # rest of the chunk re-download its whole gap
+    by_start = {}
+    for sym in old_syms:
+        by_start.setdefault(stored[sym].index[-min(STORE_OVERLAP_BARS, len(stored[sym]))], []).append(sym)
+    for start, syms in by_start.items():
+        fresh = _download_batch(syms, interval=interval, start=start)
+        for sym in syms:
+            new_bars = fresh.get(sym, pd.DataFrame())
+            merged = merge_bars(stored[sym], new_bars)
+            if merged is None:
+                refresh.append(sym) # Re-adjusted by the provider
+                continue
+            if not new_bars.empty:
+                db.save_price_bars(sym, interval, new_bars)
+            hists[sym] = merged
+
+    if refresh:
+        fresh = _download_batch(refresh, period="max", interval=interval)
+        for sym in refresh:
+            hist = fresh.get(sym, pd.DataFrame(columns=db.BAR_COLUMNS))
+            db.save_price_bars(sym, interval, hist, replace=True)
+            hists[sym] = hist
+
+    now = time.monotonic()
+    for sym in hists:
+        _last_sync[(sym, interval)] = now
+
+    return {t: slice_period(hists[sym], period) for t, sym in symbols.items() if sym in hists}
+
+# --- Fundamentals (Cached .info Fields) ---
+# Fields kept in the fundamentals cache and how long each stays fresh (seconds)
+FUNDAMENTAL_TTL = {
+    'returnOnEquity': 24 * 3600, # Changes quarterly, daily refresh is plenty
+}
+
+_fundamentals_lock = threading.Lock()
+
+def fetch_fundamentals(ticker):
+    """Fetches the cached fundamental fields for one ticker from Yahoo's .info."""
+    symbol = ticker if ticker.endswith(".JK") else f"{ticker}.JK"
+    info = md.get_provider().info(symbol)
+    return {field: info.get(field, None) for field in FUNDAMENTAL_TTL}
+
+def refresh_fundamentals(tickers, force=False, max_workers=4):
+    """
+    Bulk-refreshes the fundamentals cache for tickers whose fields are stale
+    (or all of them with force=True). Returns the number of tickers refreshed.
+    Meant to run off the scan path, e.g. via start_fundamentals_refresh.
+    """
+    stale = set()
+    for field, ttl in FUNDAMENTAL_TTL.items():
+        stale.update(tickers if force else db.get_stale_fundamental_tickers(tickers, field, ttl))
+    stale = [t for t in tickers if t in stale]
+    if not stale:
+        return 0
+
+    print(f"Refreshing fundamentals for {len(stale)} tickers...")
+    fetched = se.run_concurrent(stale, fetch_fundamentals, max_workers=max_workers)
+    rows = [(t, field, value) for t, values in zip(stale, fetched) if values is not None
+            for field, value in values.items()]
+    db.save_fundamentals(rows)
+    return len({r[0] for r in rows})
+
+def start_fundamentals_refresh(tickers, force=False):
+    """Runs refresh_fundamentals in a background thread unless one is already running."""
+    if not _fundamentals_lock.acquire(blocking=False):
+        return False
+
+    def job():
+        try:
+            refresh_fundamentals(tickers, force=force)
+        except Exception as e:
+            print(f"Fundamentals refresh error: {e}")
+        finally:
+            _fundamentals_lock.release()
+
+    threading.Thread(target=job, daemon=True).start()
+    return True
+
 def get_current_price(ticker):
     """
     Fetches the latest price for a single ticker.
@@ -22,51 +305,77 @@ def get_current_price(ticker):
         if not ticker.endswith(".JK"):
             ticker = f"{ticker}.JK"
         
-        stock = yf.Ticker(ticker)
-        # Fast way to get price: fast_info or history 1d
-        price = stock.fast_info.last_price
-        return price
+        return md.get_provider().last_price(ticker)
     except Exception as e:
         print(f"Error fetching price for {ticker}: {e}")
         return None
 
-def get_multiple_prices(tickers):
+def get_multiple_prices(tickers, chunk_size=BATCH_CHUNK_SIZE):
     """
     Fetches current prices for a list of tickers in batch (optimization).
+    Each chunk is one multi-ticker download of today's 1m bars; the last traded
+    minute is used per ticker, so thinly traded stocks still get a price.
     Returns a dictionary {ticker: price}.
     """
-    if not tickers:
-        return {}
-    
-    # Ensure all have .JK
-    formatted_tickers = [t if t.endswith(".JK") else f"{t}.JK" for t in tickers]
-    formatted_tickers_str = " ".join(formatted_tickers)
-    
-    try:
-        # yf.download is faster for batch
-        data = yf.download(formatted_tickers_str, period="1d", interval="1m", progress=False)['Close'].iloc[-1]
-        
-        results = {}
-        for t in tickers:
-            ft = t if t.endswith(".JK") else f"{t}.JK"
-            # Handle case where data might be a Series (multiple tickers) or scalar (single ticker)
-            if isinstance(data, pd.Series):
-                 if ft in data:
-                     results[t] = data[ft]
-            else:
-                 # If only one ticker was requested/returned, data is a float
-                 if len(tickers) == 1:
-                     results[t] = data
-        
-        return results
-    except Exception as e:
-        print(f"Error batch fetching: {e}")
-        return {}
+    results = {}
+    for chunk in chunk_list(list(tickers), chunk_size):
+        symbols = {t: (t if t.endswith(".JK") else f"{t}.JK") for t in chunk}
+        try:
+            frames = _download_batch(list(symbols.values()), period="1d", interval="1m")
+        except Exception as e:
+            print(f"Error batch fetching: {e}")
+            continue
+        for t, sym in symbols.items():
+            if sym in frames:
+                results[t] = float(frames[sym]['Close'].iloc[-1])
+    return results
+
+# --- Pre-Filter Quotes (Whole Universe) ---
+# The scan pre-filter looks at the last month of daily bars: last price, last volume
+# and the average daily traded value (liquidity) over LIQUIDITY_WINDOW bars.
+QUOTE_PERIOD = "1mo"
+LIQUIDITY_WINDOW = 20
+
+def fetch_quotes_chunk(tickers):
+    """
+    Cheap pass for one chunk of tickers: a single multi-ticker download of the last
+    month of daily bars. Returns {ticker: {'price', 'volume', 'avg_value'}}; tickers
+    without data are left out. Raises on download errors so the caller can retry.
+    The bars are also merged into the bar store where the stored history reaches
+    them, so the deep scan that follows doesn't download them again.
+    """
+    symbols = {t: (t if t.endswith(".JK") else f"{t}.JK") for t in tickers}
+    fresh = _download_batch(list(symbols.values()), period=QUOTE_PERIOD, interval="1d")
+
+    quotes = {}
+    for t, sym in symbols.items():
+        bars = fresh.get(sym)
+        if bars is None:
+            continue
+        recent = bars.tail(LIQUIDITY_WINDOW)
+        quotes[t] = {
+            'price': float(bars['Close'].iloc[-1]),
+            'volume': float(bars['Volume'].iloc[-1]),
+            'avg_value': float((recent['Close'] * recent['Volume']).mean()),
+        }
+        try:
+            _top_up_recent(sym, bars)
+        except Exception as e:
+            print(f"Bar store top-up failed for {sym}: {e}")
+    return quotes
+
+def _top_up_recent(sym, bars):
+    """Saves recent daily bars for a stored ticker whose history overlaps them (no gap, no re-adjustment)."""
+    stored = db.load_price_bars(sym, "1d", since=bars.index[0])
+    if stored.empty or merge_bars(stored, bars) is None:
+        return # Never stored, stored history ends before these bars, or adjusted: left to the deep scan
+    db.save_price_bars(sym, "1d", bars)
+    _last_sync[(sym, "1d")] = time.monotonic()
 
 def get_idx_tickers_sample():
     """
     Returns a sample list of IDX tickers for testing/MVP.
-    TODO: Implement a scraper or file reader for the full 900+ list.
+    The full 900+ listing is imported into the watchlist with tickers_loader.import_listing_file.
     """
     return [
         "BBCA", "BBRI", "BMRI", "BBNI", "TLKM", "ASII", "UNVR", "ICBP", 
@@ -74,9 +383,11 @@ def get_idx_tickers_sample():
     ]
 
 # --- Market Radar (IHSG & News) ---
-import requests
 import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 
+@fc.cached(ttl=RADAR_CACHE_TTL_SEC, max_stale=RADAR_MAX_STALE_SEC, valid=lambda r: r['market_status'] != "UNKNOWN")
 def get_market_radar():
     """
     Fetches IHSG (Composite) data and Sentiment from News.
@@ -84,9 +395,8 @@ def get_market_radar():
     # 1. Get IHSG Data
     ihsg_ticker = "^JKSE"
     try:
-        ihsg = yf.Ticker(ihsg_ticker)
         # Get 5d history to calculate changes
-        hist = ihsg.history(period="5d")
+        hist = md.get_provider().history(ihsg_ticker, period="5d")
         
         current_price = hist['Close'].iloc[-1]
         prev_close = hist['Close'].iloc[-2]
@@ -105,6 +415,7 @@ def get_market_radar():
     except Exception as e:
         print(f"IHSG Data Error: {e}")
         current_price = 0
+        prev_close = 0
         change_pct = 0
         status = "UNKNOWN"
 
@@ -115,16 +426,11 @@ def get_market_radar():
     try:
         # RSS Feed for "IHSG" topic in Indonesia
         url = "https://news.google.com/rss/search?q=IHSG+Saham+Indonesia+when:1d&hl=id&gl=ID&ceid=ID:id"
-        resp = requests.get(url, timeout=5)
+        resp = md.get_provider().http_get(url, timeout=5)
         
         if resp.status_code == 200:
             root = ET.fromstring(resp.content)
             
-            # Keywords
-            panic_words = ["anjlok", "ambles", "turun tajam", "merah membara", "crash", "panic", "tak berdaya", "terjun"]
-            bad_words = ["melemah", "koreksi", "waspada", "asing keluar", "net sell"]
-            good_words = ["menguat", "rebound", "hijau", "naik", "rekor", "tertinggi"]
-            
             score = 0
             count = 0
             
@@ -133,15 +439,7 @@ def get_market_radar():
                 link = item.find("link").text
                 pubDate = item.find("pubDate").text
                 
-                title_lower = title.lower()
-                
-                # Scoring
-                if any(w in title_lower for w in panic_words):
-                    score -= 3
-                elif any(w in title_lower for w in bad_words):
-                    score -= 1
-                elif any(w in title_lower for w in good_words):
-                    score += 1
+                score += score_headline(title)
                     
                 top_headlines.append({"title": title, "link": link, "date": pubDate})
                 count += 1
@@ -171,22 +469,112 @@ def get_market_radar():
 
 def get_ticker_news(ticker):
     """
-    Fetches latest news for a specific ticker.
+    Latest news for a specific ticker, read from the news store (see ingest_news).
     """
-    news_list = []
     try:
-        # Search query: "BBTN Saham" or similar
-        query = f"{ticker.replace('.JK', '')}+Saham"
-        url = f"https://news.google.com/rss/search?q={query}+when:7d&hl=id&gl=ID&ceid=ID:id"
-        
-        resp = requests.get(url, timeout=3)
-        if resp.status_code == 200:
-            root = ET.fromstring(resp.content)
-            for item in root.findall(".//item")[:2]: # Get top 2
-                title = item.find("title").text
-                link = item.find("link").text
-                news_list.append({"title": title, "link": link})
-    except:
-        pass
-        
-    return news_list
+        return db.get_ticker_headlines(ticker, limit=2)
+    except Exception as e:
+        print(f"Error loading news for {ticker}: {e}")
+        return []
+
+# --- News Ingestion (Whole Universe) ---
+# Headline keywords (Indonesian market news)
+PANIC_WORDS = ["anjlok", "ambles", "turun tajam", "merah membara", "crash", "panic", "tak berdaya", "terjun"]
+BAD_WORDS = ["melemah", "koreksi", "waspada", "asing keluar", "net sell"]
+GOOD_WORDS = ["menguat", "rebound", "hijau", "naik", "rekor", "tertinggi"]
+
+NEWS_ITEMS_PER_FEED = 10
+NEWS_KEEP_DAYS = 30
+NEWS_FETCH_WORKERS = 8
+
+_news_lock = threading.Lock()
+
+def score_headline(title):
+    """Sentiment score of a headline: -3 panic, -1 negative, +1 positive, 0 neutral."""
+    title_lower = title.lower()
+    if any(w in title_lower for w in PANIC_WORDS):
+        return -3
+    elif any(w in title_lower for w in BAD_WORDS):
+        return -1
+    elif any(w in title_lower for w in GOOD_WORDS):
+        return 1
+    return 0
+
+def fetch_ticker_feed(ticker, etag=None, last_modified=None):
+    """
+    Conditional GET of a ticker's Google News RSS feed.
+    Returns (items, etag, last_modified); items is None when the feed is unchanged (304).
+    """
+    query = f"{ticker.replace('.JK', '')}+Saham"
+    url = f"https://news.google.com/rss/search?q={query}+when:7d&hl=id&gl=ID&ceid=ID:id"
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    resp = md.get_provider().http_get(url, headers=headers, timeout=5)
+    if resp.status_code == 304:
+        return None, etag, last_modified
+    resp.raise_for_status()
+
+    items = []
+    root = ET.fromstring(resp.content)
+    for item in root.findall(".//item")[:NEWS_ITEMS_PER_FEED]:
+        title = item.findtext("title") or ""
+        link = item.findtext("link")
+        pub_date = item.findtext("pubDate") or ""
+        if not link:
+            continue
+        try:
+            published = parsedate_to_datetime(pub_date).astimezone(timezone.utc)
+        except (TypeError, ValueError):
+            published = datetime.now(timezone.utc)
+        items.append((link, title, pub_date, published.strftime('%Y-%m-%d %H:%M:%S'), score_headline(title)))
+    return items, resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+
+def ingest_news(tickers, max_workers=NEWS_FETCH_WORKERS, progress_callback=None):
+    """
+    Fetches the news feeds of all tickers concurrently and stores new headlines.
+    Feeds unchanged since the last fetch (ETag/Last-Modified) are skipped by the server.
+    Returns (feeds changed, feeds unchanged).
+    """
+    tickers = [t.replace('.JK', '') for t in tickers]
+    validators = db.get_news_feed_validators(tickers)
+
+    def fetch(ticker):
+        return fetch_ticker_feed(ticker, *validators.get(ticker, (None, None)))
+
+    fetched = se.run_concurrent(tickers, fetch, max_workers=max_workers, progress_callback=progress_callback)
+
+    feeds, items, unchanged = [], [], 0
+    for ticker, result in zip(tickers, fetched):
+        if result is None:
+            continue
+        feed_items, etag, last_modified = result
+        feeds.append((ticker, etag, last_modified))
+        if feed_items is None:
+            unchanged += 1
+        else:
+            items.extend((ticker,) + item for item in feed_items)
+
+    db.save_news(feeds, items)
+    db.prune_news(NEWS_KEEP_DAYS)
+    return len(feeds) - unchanged, unchanged
+
+def start_news_ingestion(tickers):
+    """Runs ingest_news in a background thread unless one is already running."""
+    if not _news_lock.acquire(blocking=False):
+        return False
+
+    def job():
+        try:
+            changed, unchanged = ingest_news(tickers)
+            print(f"News ingested: {changed} feeds updated, {unchanged} unchanged.")
+        except Exception as e:
+            print(f"News ingestion error: {e}")
+        finally:
+            _news_lock.release()
+
+    threading.Thread(target=job, daemon=True).start()
+    return True
@@ -1,19 +1,84 @@
+import json
 import sqlite3
+import threading
+import time
 import pandas as pd
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import metrics as mt
 
 DB_NAME = "stock_sentinel.db"
+BUSY_TIMEOUT_MS = 10000 # Wait this long for a writer's lock instead of failing with "database is locked"
+
+# --- Connection Management ---
+# One connection per thread (sqlite3 connections must not be shared across threads),
+# opened on first use and reused for every call made on that thread afterwards.
+_local = threading.local()
 
 def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_NAME)
+    """
+    Returns this thread's connection to the SQLite database, opening it on first use.
+    The connection runs in autocommit mode; group writes with `transaction()`.
+    Do not close it.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.db_name != DB_NAME:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(DB_NAME, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        # WAL lets the UI read while the background scanner writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        _local.conn, _local.db_name, _local.depth = conn, DB_NAME, 0
     return conn
 
+@contextmanager
+def transaction():
+    """
+    Runs a block of writes as one transaction on this thread's connection:
+    committed on success, rolled back on error. Nested blocks join the outer one.
+    BEGIN IMMEDIATE takes the write lock up front, so concurrent writers wait
+    (up to BUSY_TIMEOUT_MS) instead of failing halfway through.
+    """
+    conn = get_db_connection()
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    _local.depth = 1
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        _local.depth = 0
+        mt.SQLITE_WRITE_DURATION.observe(time.perf_counter() - started)
+
+def close_db_connection():
+    """Closes this thread's connection (e.g. before a worker thread exits)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
 def init_db():
     """Initializes the database functionality by creating necessary tables."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    with transaction() as conn:
+        _create_tables(conn.cursor())
+    print("Database initialized successfully.")
+
+def _create_tables(cursor):
+    """Creates all tables and indexes (if missing)."""
     # Master Stocks Table (For reference/caching if needed)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS master_stocks (
@@ -45,69 +110,612 @@ def init_db():
         )
     ''')
 
-    # Latest Scan Results Table (For persistence)
+    # Latest Scan Results Table: created by save_scan_results with one typed column
+    # per result field, since the result columns follow the scanner's output.
+
+    # Scan History (One snapshot per scan run, see save_scan_results)
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS latest_scan (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE TABLE IF NOT EXISTS scan_runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            n_tickers INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_results (
+            run_id INTEGER NOT NULL,
+            ticker TEXT NOT NULL,
+            run_time TIMESTAMP,
+            current_price REAL,
+            price_change_pct REAL,
+            vol_spike_ratio REAL,
+            ath_distance_pct REAL,
+            rsi REAL,
+            trend_strength TEXT,
+            is_breakout INTEGER,
+            is_volatile INTEGER,
+            is_oversold INTEGER,
+            is_golden_cross INTEGER,
+            is_uptrend INTEGER,
+            is_weekly_uptrend INTEGER,
+            PRIMARY KEY (run_id, ticker)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scan_results_ticker_time ON scan_results (ticker, run_time)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scan_runs_time ON scan_runs (run_time)")
+
+    # Price Bar Store (Local OHLCV history, topped up incrementally)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS price_bars (
+            ticker TEXT NOT NULL,
+            interval TEXT NOT NULL,
+            bar_time TEXT NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            PRIMARY KEY (ticker, interval, bar_time)
+        )
+    ''')
+
+    # Streaming Indicator State (EMA/MACD/RSI/Volume/ATH per ticker, see indicator_engine)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS indicator_state (
+            ticker TEXT PRIMARY KEY,
+            anchor_time TEXT,
+            state_json TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # News Ingestion (Per-ticker RSS feed validators + headlines, see data_engine.ingest_news)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS news_feeds (
+            ticker TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS news_items (
+            ticker TEXT NOT NULL,
+            link TEXT NOT NULL,
+            title TEXT,
+            pub_date TEXT,
+            published_at TIMESTAMP,
+            score INTEGER,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (ticker, link)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_news_items_ticker_time ON news_items (ticker, published_at)")
+
+    # Adaptive Scan Cadence (Per-ticker refresh tier and next due time, see analysis_engine.scan_adaptive)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_schedule (
+            ticker TEXT PRIMARY KEY,
+            tier TEXT,
+            interval_sec INTEGER,
+            reason TEXT,
+            last_scanned TIMESTAMP,
+            next_due TIMESTAMP
+        )
+    ''')
+
+    # Scan Worker (Single-instance lease, heartbeat and status of scan_worker.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS worker_status (
+            name TEXT PRIMARY KEY,
+            owner TEXT,
+            state TEXT,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            lease_expires TIMESTAMP,
+            last_scan_start TIMESTAMP,
+            last_scan_end TIMESTAMP,
+            last_scan_rows INTEGER,
+            last_scan_sec REAL,
+            last_error TEXT
+        )
+    ''')
+
+    # Alert State (Edge-triggered Telegram alerts: one row per ticker and signal)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS alert_state (
+            ticker TEXT NOT NULL,
+            signal TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 0,
+            entered_at TIMESTAMP,
+            exited_at TIMESTAMP,
+            last_sent_at TIMESTAMP,
+            PRIMARY KEY (ticker, signal)
+        )
+    ''')
+
+    # Dashboard Views (Ranked rows of each Dashboard panel, materialized per scan version)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dashboard_views (
+            panel TEXT NOT NULL,
+            rank INTEGER NOT NULL,
             ticker TEXT,
-            data_json TEXT,
-            scan_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            row_json TEXT,
+            PRIMARY KEY (panel, rank)
         )
     ''')
 
-    conn.commit()
-    conn.close()
-    print("Database initialized successfully.")
+    # Dashboard Narratives (Playbook texts per ticker, market phase and macro weather)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dashboard_narratives (
+            ticker TEXT NOT NULL,
+            panel TEXT NOT NULL,
+            phase TEXT NOT NULL,
+            macro TEXT NOT NULL,
+            scan_version TEXT,
+            body_json TEXT,
+            PRIMARY KEY (ticker, panel, phase, macro)
+        )
+    ''')
+
+    # Fundamentals Cache (Slow-changing .info fields, refreshed off the scan path)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fundamentals (
+            ticker TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value REAL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (ticker, field)
+        )
+    ''')
 
 # --- Scan Result Persistence ---
-import json
+def _sql_type(dtype):
+    """SQLite column type for a pandas dtype (BOOLEAN is restored to bool on load)."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    if pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype):
+        return "TEXT"
+    return "" # No affinity: mixed/object values are stored as given
 
-def save_scan_results(df_results):
-    """Saves the dataframe results to DB as JSON."""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        # Clear old results
-        cursor.execute("DELETE FROM latest_scan")
-        
-        # Insert new results
-        if not df_results.empty:
-            for _, row in df_results.iterrows():
-                data_str = json.dumps(row.to_dict())
-                cursor.execute("INSERT INTO latest_scan (ticker, data_json) VALUES (?, ?)", (row['ticker'], data_str))
-        
-        conn.commit()
-    finally:
-        conn.close()
+def save_scan_results(df_results, record_history=True):
+    """
+    Saves the dataframe results to DB, one typed column per result field.
+    The table is rebuilt and filled with a single executemany in one transaction.
+    Every row gets the same scan_time (UTC, taken once), which identifies the run
+    for update_scan_results. With `record_history`, the run is also appended to the scan history.
+    """
+    data = df_results.drop(columns=['scan_time'], errors='ignore')
+    scan_time = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    names = [f'"{c}"' for c in data.columns] + ["scan_time"]
+    column_defs = [f'{n} {_sql_type(data[c].dtype)}' for n, c in zip(names, data.columns)]
+    column_defs.append("scan_time TIMESTAMP")
+    rows = [row + [scan_time] for row in data.astype(object).where(data.notna(), None).values.tolist()]
+
+    with transaction() as conn:
+        conn.execute("DROP TABLE IF EXISTS latest_scan")
+        conn.execute(f"CREATE TABLE latest_scan ({', '.join(column_defs)})")
+        if rows:
+            conn.executemany(
+                f"INSERT INTO latest_scan ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+                rows
+            )
+        if record_history and not data.empty:
+            _record_scan_run(conn, data)
+        _touch_scan_version(conn)
+    if not data.empty:
+        mt.mark_scan_success()
+
+    if record_history:
+        compact_scan_history()
+
+def update_scan_results(df_updates, columns, scan_time):
+    """
+    Overwrites `columns` of the latest_scan rows matching df_updates' tickers in one
+    transaction. Rows are only touched if the table still holds the scan saved at
+    `scan_time` (a newer full scan is never overwritten with older values).
+    Returns the number of rows updated.
+    """
+    if df_updates.empty:
+        return 0
+    data = df_updates[columns + ['ticker']]
+    rows = [row + [scan_time] for row in data.astype(object).where(data.notna(), None).values.tolist()]
+    assignments = ", ".join(f'"{c}" = ?' for c in columns)
+
+    with transaction() as conn:
+        cursor = conn.executemany(f"UPDATE latest_scan SET {assignments} WHERE ticker = ? AND scan_time = ?", rows)
+        if cursor.rowcount:
+            _touch_scan_version(conn)
+        return cursor.rowcount
+
+def _touch_scan_version(conn):
+    """Marks latest_scan as changed so open dashboards reload it."""
+    conn.execute('''
+        INSERT INTO settings (key, value) VALUES ('SCAN_RESULTS_VERSION', ?)
+        ON CONFLICT(key) DO UPDATE SET value=excluded.value
+    ''', (datetime.now().isoformat(),))
+
+def get_scan_results_version():
+    """Changes whenever latest_scan is saved or updated (None before the first save)."""
+    return get_setting('SCAN_RESULTS_VERSION')
 
 def get_latest_scan_results():
     """Retrieves the latest scan results from DB."""
     conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT data_json, scan_time FROM latest_scan")
-        rows = cursor.fetchall()
-        
-        if not rows:
+        column_types = {r[1]: r[2] for r in conn.execute("PRAGMA table_info(latest_scan)")}
+        if not column_types:
+            return pd.DataFrame(), None
+
+        # Legacy layout (one JSON document per row)
+        if 'data_json' in column_types:
+            rows = conn.execute("SELECT data_json, scan_time FROM latest_scan").fetchall()
+            if not rows:
+                return pd.DataFrame(), None
+            return pd.DataFrame([json.loads(r[0]) for r in rows]), rows[0][1]
+
+        df = pd.read_sql_query("SELECT * FROM latest_scan", conn)
+        if df.empty:
             return pd.DataFrame(), None
-            
-        data_list = [json.loads(r[0]) for r in rows]
-        last_time = rows[0][1] # Get timestamp from first row
-        return pd.DataFrame(data_list), last_time
+
+        last_time = df['scan_time'].iloc[0]
+        df = df.drop(columns=['scan_time'])
+        for col, col_type in column_types.items():
+            if col_type == "BOOLEAN" and col in df.columns:
+                df[col] = df[col].fillna(0).astype(bool) # NULL means the flag is not set
+        return df, last_time
     except Exception as e:
         print(f"Error loading scan results: {e}")
         return pd.DataFrame(), None
-    finally:
-        conn.close()
+
+# --- Scan History ---
+# Result fields kept per run (the full result set only lives in latest_scan)
+HISTORY_COLUMNS = ['current_price', 'price_change_pct', 'vol_spike_ratio', 'ath_distance_pct', 'rsi',
+                   'trend_strength', 'is_breakout', 'is_volatile', 'is_oversold', 'is_golden_cross',
+                   'is_uptrend', 'is_weekly_uptrend']
+SIGNAL_COLUMNS = ('is_breakout', 'is_oversold', 'is_golden_cross', 'is_volatile')
+
+# Retention: every run for the last HISTORY_FULL_DAYS days, then the last run of
+# each day up to HISTORY_KEEP_DAYS days; older runs are deleted.
+HISTORY_FULL_DAYS = 7
+HISTORY_KEEP_DAYS = 180
+
+def _record_scan_run(conn, df_results):
+    """Appends a scan snapshot (run + per-ticker rows) inside the caller's transaction."""
+    cursor = conn.execute("INSERT INTO scan_runs (n_tickers) VALUES (?)", (len(df_results),))
+    run_id = cursor.lastrowid
+    run_time = conn.execute("SELECT run_time FROM scan_runs WHERE run_id = ?", (run_id,)).fetchone()[0]
+
+    data = df_results.reindex(columns=['ticker'] + HISTORY_COLUMNS)
+    rows = data.astype(object).where(data.notna(), None).values.tolist()
+    conn.executemany(
+        f"INSERT OR REPLACE INTO scan_results (run_id, run_time, ticker, {', '.join(HISTORY_COLUMNS)}) "
+        f"VALUES (?, ?, {', '.join('?' for _ in range(len(HISTORY_COLUMNS) + 1))})",
+        [[run_id, run_time] + row for row in rows]
+    )
+    return run_id
+
+def get_scan_runs(limit=20):
+    """Returns the most recent scan runs (run_id, run_time, n_tickers), newest first."""
+    return pd.read_sql_query(
+        "SELECT run_id, run_time, n_tickers FROM scan_runs ORDER BY run_id DESC LIMIT ?",
+        get_db_connection(), params=(limit,)
+    )
+
+def get_ticker_history(ticker, limit=10):
+    """Returns the ticker's rows from its last `limit` scan runs, newest first."""
+    df = pd.read_sql_query(
+        "SELECT * FROM scan_results WHERE ticker = ? ORDER BY run_time DESC, run_id DESC LIMIT ?",
+        get_db_connection(), params=(ticker.replace(".JK", ""), limit)
+    )
+    for col in SIGNAL_COLUMNS + ('is_uptrend', 'is_weekly_uptrend'):
+        df[col] = df[col].fillna(0).astype(bool)
+    return df
+
+def get_new_signals(signal, run_id=None):
+    """
+    Returns the tickers flagged with `signal` (one of SIGNAL_COLUMNS) in a run
+    (default: the latest) that were not flagged in the run before it.
+    """
+    if signal not in SIGNAL_COLUMNS:
+        raise ValueError(f"Unknown signal: {signal}")
+
+    conn = get_db_connection()
+    if run_id is None:
+        run_id = conn.execute("SELECT MAX(run_id) FROM scan_runs").fetchone()[0]
+    if run_id is None:
+        return []
+    prev = conn.execute("SELECT MAX(run_id) FROM scan_runs WHERE run_id < ?", (run_id,)).fetchone()[0]
+
+    rows = conn.execute(f'''
+        SELECT ticker FROM scan_results WHERE run_id = ? AND {signal} = 1
+        EXCEPT
+        SELECT ticker FROM scan_results WHERE run_id = ? AND {signal} = 1
+        ORDER BY ticker
+    ''', (run_id, prev if prev is not None else -1)).fetchall()
+    return [r[0] for r in rows]
+
+def compact_scan_history(full_days=HISTORY_FULL_DAYS, keep_days=HISTORY_KEEP_DAYS):
+    """Applies the scan history retention policy. Returns the number of runs deleted."""
+    with transaction() as conn:
+        expired = conn.execute('''
+            SELECT run_id FROM scan_runs
+            WHERE run_time < datetime('now', ?)
+               OR (run_time < datetime('now', ?) AND run_id NOT IN (
+                    SELECT MAX(run_id) FROM scan_runs GROUP BY date(run_time)))
+        ''', (f"-{keep_days} days", f"-{full_days} days")).fetchall()
+        conn.executemany("DELETE FROM scan_results WHERE run_id = ?", expired)
+        conn.executemany("DELETE FROM scan_runs WHERE run_id = ?", expired)
+    return len(expired)
+
+# --- Price Bar Store ---
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+def get_last_bar_time(ticker, interval):
+    """Returns the timestamp of the newest stored bar, or None if nothing is stored."""
+    cursor = get_db_connection().cursor()
+    cursor.execute("SELECT MAX(bar_time) FROM price_bars WHERE ticker=? AND interval=?", (ticker, interval))
+    row = cursor.fetchone()
+    return pd.Timestamp(row[0]) if row and row[0] else None
+
+def load_price_bars(ticker, interval, since=None):
+    """
+    Loads stored bars as an OHLCV DataFrame indexed by (Jakarta local) timestamp.
+    With `since`, only the bars at or after that timestamp.
+    """
+    since = pd.Timestamp(since).strftime('%Y-%m-%d %H:%M:%S') if since is not None else ''
+    df = pd.read_sql_query(
+        "SELECT bar_time, open, high, low, close, volume FROM price_bars "
+        "WHERE ticker=? AND interval=? AND bar_time >= ? ORDER BY bar_time",
+        get_db_connection(), params=(ticker, interval, since)
+    )
+
+    df.columns = ['Date'] + BAR_COLUMNS
+    df['Date'] = pd.to_datetime(df['Date'])
+    return df.set_index('Date')
+
+def save_price_bars(ticker, interval, df_bars, replace=False):
+    """
+    Upserts bars for a ticker/interval. Existing bars with the same timestamp are
+    overwritten (the last bar of a live session changes until the close).
+    With replace=True the stored history is dropped first (e.g. after a split adjustment).
+    """
+    rows = [
+        (ticker, interval, ts.strftime('%Y-%m-%d %H:%M:%S'),
+         float(r.Open), float(r.High), float(r.Low), float(r.Close), float(r.Volume))
+        for ts, r in zip(df_bars.index, df_bars[BAR_COLUMNS].itertuples(index=False))
+    ]
+    with transaction() as conn:
+        cursor = conn.cursor()
+        if replace:
+            cursor.execute("DELETE FROM price_bars WHERE ticker=? AND interval=?", (ticker, interval))
+        cursor.executemany('''
+            INSERT OR REPLACE INTO price_bars (ticker, interval, bar_time, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+# --- Indicator State ---
+def load_indicator_states(tickers):
+    """Returns {ticker: state dict} for the given tickers that have a stored state."""
+    try:
+        cursor = get_db_connection().cursor()
+        placeholders = ",".join("?" * len(tickers))
+        cursor.execute(f"SELECT ticker, state_json FROM indicator_state WHERE ticker IN ({placeholders})", list(tickers))
+        return {ticker: json.loads(state) for ticker, state in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error loading indicator states: {e}")
+        return {}
+
+def save_indicator_states(states):
+    """Upserts {ticker: state dict} in one transaction."""
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO indicator_state (ticker, anchor_time, state_json, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', [(t, st['anchor_time'], json.dumps(st)) for t, st in states.items()])
+
+# --- Adaptive Scan Cadence ---
+def get_not_due_tickers(tickers, slack_sec=0):
+    """Returns the tickers whose next scheduled scan is more than `slack_sec` seconds away."""
+    if not tickers:
+        return set()
+    cursor = get_db_connection().cursor()
+    placeholders = ",".join("?" * len(tickers))
+    cursor.execute(
+        f"SELECT ticker FROM scan_schedule WHERE ticker IN ({placeholders}) AND next_due > datetime('now', ?)",
+        list(tickers) + [f"+{int(slack_sec)} seconds"]
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+def save_scan_schedule(rows):
+    """Upserts (ticker, tier, interval_sec, reason) rows; the next scan is due interval_sec from now."""
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO scan_schedule (ticker, tier, interval_sec, reason, last_scanned, next_due)
+            VALUES (?, ?, ?, ?, datetime('now'), datetime('now', '+' || ? || ' seconds'))
+        ''', [(t, tier, interval, reason, int(interval)) for t, tier, interval, reason in rows])
+
+def get_scan_schedule():
+    """The whole schedule as a DataFrame (ticker, tier, interval_sec, reason, last_scanned, next_due)."""
+    try:
+        return pd.read_sql_query("SELECT * FROM scan_schedule ORDER BY next_due", get_db_connection())
+    except Exception:
+        return pd.DataFrame()
+
+# --- Alert State ---
+def get_alert_state():
+    """Every (ticker, signal) alert state as a DataFrame (active, entered_at, exited_at, last_sent_at)."""
+    try:
+        return pd.read_sql_query("SELECT * FROM alert_state ORDER BY signal, ticker", get_db_connection())
+    except Exception:
+        return pd.DataFrame()
+
+def save_alert_state(rows):
+    """Upserts (ticker, signal, active, entered_at, exited_at, last_sent_at) rows in one transaction."""
+    if not rows:
+        return
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO alert_state (ticker, signal, active, entered_at, exited_at, last_sent_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+# --- Dashboard Views ---
+def save_dashboard_views(scan_version, rows):
+    """Replaces the materialized panel rows [(panel, rank, ticker, row dict)] built from `scan_version`."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM dashboard_views")
+        conn.executemany(
+            "INSERT INTO dashboard_views (panel, rank, ticker, row_json) VALUES (?, ?, ?, ?)",
+            [(panel, rank, ticker, json.dumps(row)) for panel, rank, ticker, row in rows]
+        )
+        conn.execute('''
+            INSERT INTO settings (key, value) VALUES ('DASHBOARD_VIEWS_VERSION', ?)
+            ON CONFLICT(key) DO UPDATE SET value=excluded.value
+        ''', (scan_version,))
+
+def get_dashboard_views(scan_version):
+    """{panel: [(ticker, row dict)]} in rank order, or None unless built from `scan_version`."""
+    try:
+        if scan_version is None or get_setting('DASHBOARD_VIEWS_VERSION') != scan_version:
+            return None
+        views = {}
+        for panel, ticker, row in get_db_connection().execute(
+                "SELECT panel, ticker, row_json FROM dashboard_views ORDER BY panel, rank"):
+            views.setdefault(panel, []).append((ticker, json.loads(row)))
+        return views
+    except Exception as e:
+        print(f"Error loading dashboard views: {e}")
+        return None
+
+def save_dashboard_narratives(scan_version, phase, macro, rows):
+    """
+    Upserts the narratives [(ticker, panel, body dict)] for one market phase and macro
+    state, dropping those built from other scan versions.
+    """
+    with transaction() as conn:
+        conn.execute("DELETE FROM dashboard_narratives WHERE scan_version IS NOT ?", (scan_version,))
+        conn.executemany('''
+            INSERT OR REPLACE INTO dashboard_narratives (ticker, panel, phase, macro, scan_version, body_json)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(ticker, panel, phase, macro, scan_version, json.dumps(body)) for ticker, panel, body in rows])
+
+def get_dashboard_narratives(scan_version, phase, macro):
+    """{(panel, ticker): body dict} stored for this scan version, market phase and macro state."""
+    try:
+        cursor = get_db_connection().execute(
+            "SELECT panel, ticker, body_json FROM dashboard_narratives WHERE scan_version=? AND phase=? AND macro=?",
+            (scan_version, phase, macro)
+        )
+        return {(panel, ticker): json.loads(body) for panel, ticker, body in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error loading dashboard narratives: {e}")
+        return {}
+
+# --- Fundamentals Cache ---
+def get_fundamentals(tickers, field):
+    """Returns {ticker: value} of cached values for a field (value may be None)."""
+    if not tickers:
+        return {}
+    try:
+        cursor = get_db_connection().cursor()
+        placeholders = ",".join("?" * len(tickers))
+        cursor.execute(
+            f"SELECT ticker, value FROM fundamentals WHERE field=? AND ticker IN ({placeholders})",
+            [field] + list(tickers)
+        )
+        return dict(cursor.fetchall())
+    except Exception as e:
+        print(f"Error loading fundamentals: {e}")
+        return {}
+
+def get_stale_fundamental_tickers(tickers, field, max_age_sec):
+    """Returns the tickers whose cached field is missing or older than max_age_sec."""
+    if not tickers:
+        return []
+    cursor = get_db_connection().cursor()
+    placeholders = ",".join("?" * len(tickers))
+    cursor.execute(
+        f"SELECT ticker FROM fundamentals WHERE field=? AND ticker IN ({placeholders}) "
+        "AND updated_at >= datetime('now', ?)",
+        [field] + list(tickers) + [f"-{int(max_age_sec)} seconds"]
+    )
+    fresh = {row[0] for row in cursor.fetchall()}
+    return [t for t in tickers if t not in fresh]
+
+def save_fundamentals(rows):
+    """Upserts (ticker, field, value) rows in one transaction."""
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO fundamentals (ticker, field, value, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', rows)
+
+# --- News ---
+def get_news_feed_validators(tickers):
+    """Returns {ticker: (etag, last_modified)} stored from the previous fetch of each feed."""
+    if not tickers:
+        return {}
+    cursor = get_db_connection().cursor()
+    placeholders = ",".join("?" * len(tickers))
+    cursor.execute(f"SELECT ticker, etag, last_modified FROM news_feeds WHERE ticker IN ({placeholders})", list(tickers))
+    return {ticker: (etag, last_modified) for ticker, etag, last_modified in cursor.fetchall()}
+
+def save_news(feeds, items):
+    """
+    Stores feed validators [(ticker, etag, last_modified)] and headlines
+    [(ticker, link, title, pub_date, published_at, score)] in one transaction.
+    Headlines already stored for the ticker (same link) are skipped.
+    """
+    with transaction() as conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO news_feeds (ticker, etag, last_modified, fetched_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ''', feeds)
+        conn.executemany('''
+            INSERT OR IGNORE INTO news_items (ticker, link, title, pub_date, published_at, score)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', items)
+
+def get_ticker_headlines(ticker, limit=2):
+    """Returns the newest stored headlines for a ticker as [{'title', 'link', 'date'}]."""
+    cursor = get_db_connection().cursor()
+    cursor.execute('''
+        SELECT title, link, pub_date FROM news_items WHERE ticker=?
+        ORDER BY published_at DESC LIMIT ?
+    ''', (ticker.replace(".JK", ""), limit))
+    return [{"title": title, "link": link, "date": pub_date} for title, link, pub_date in cursor.fetchall()]
+
+def get_news_sentiment(tickers, days=7):
+    """Returns {ticker: summed headline score} over the last `days` days (tickers without news are omitted)."""
+    if not tickers:
+        return {}
+    try:
+        cursor = get_db_connection().cursor()
+        placeholders = ",".join("?" * len(tickers))
+        cursor.execute(
+            f"SELECT ticker, SUM(score) FROM news_items WHERE ticker IN ({placeholders}) "
+            "AND published_at >= datetime('now', ?) GROUP BY ticker",
+            list(tickers) + [f"-{int(days)} days"]
+        )
+        return dict(cursor.fetchall())
+    except Exception as e:
+        print(f"Error loading news sentiment: {e}")
+        return {}
+
+def prune_news(keep_days=30):
+    """Deletes headlines published more than `keep_days` days ago."""
+    get_db_connection().execute("DELETE FROM news_items WHERE published_at < datetime('now', ?)", (f"-{int(keep_days)} days",))
 
 # --- Portfolio Functions ---
 def add_portfolio_item(ticker, buy_price, target_price=None, cutloss_price=None, notes=""):
     """Adds or updates a stock in the portfolio."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute('''
+        get_db_connection().execute('''
             INSERT INTO portfolio (ticker, buy_price, target_price, cutloss_price, notes)
             VALUES (?, ?, ?, ?, ?)
             ON CONFLICT(ticker) DO UPDATE SET
@@ -116,95 +724,134 @@ def add_portfolio_item(ticker, buy_price, target_price=None, cutloss_price=None,
                 cutloss_price=excluded.cutloss_price,
                 notes=excluded.notes
         ''', (ticker.upper(), buy_price, target_price, cutloss_price, notes))
-        conn.commit()
         return True, "Success"
     except Exception as e:
         return False, str(e)
-    finally:
-        conn.close()
 
 def get_portfolio():
     """Retrieves all portfolio items as a DataFrame."""
-    conn = get_db_connection()
     try:
-        df = pd.read_sql_query("SELECT * FROM portfolio", conn)
+        df = pd.read_sql_query("SELECT * FROM portfolio", get_db_connection())
         return df
     except Exception:
         return pd.DataFrame() # Return empty if error or empty
-    finally:
-        conn.close()
 
 def delete_portfolio_item(ticker):
     """Deletes a stock from the portfolio."""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("DELETE FROM portfolio WHERE ticker = ?", (ticker.upper(),))
-        conn.commit()
-    finally:
-        conn.close()
+    get_db_connection().execute("DELETE FROM portfolio WHERE ticker = ?", (ticker.upper(),))
 
 def get_all_tickers():
     """Retrieves all tickers from the master_stocks table."""
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
+        cursor = get_db_connection().cursor()
         cursor.execute("SELECT ticker FROM master_stocks")
         rows = cursor.fetchall()
         return [row[0] for row in rows]
     except Exception as e:
         print(f"Error getting tickers: {e}")
         return []
-    finally:
-        conn.close()
 
 def set_setting(key, value):
     """Saves a setting to the database."""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO settings (key, value) VALUES (?, ?)
-            ON CONFLICT(key) DO UPDATE SET value=excluded.value
-        ''', (key, value))
-        conn.commit()
-    finally:
-        conn.close()
+    get_db_connection().execute('''
+        INSERT INTO settings (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value=excluded.value
+    ''', (key, value))
 
 def get_setting(key):
     """Retrieves a setting value."""
-    conn = get_db_connection()
+    cursor = get_db_connection().cursor()
+    cursor.execute("SELECT value FROM settings WHERE key=?", (key,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def take_setting(key):
+    """Reads and deletes a setting in one transaction (one-shot commands/requests)."""
+    with transaction() as conn:
+        row = conn.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
+        if row:
+            conn.execute("DELETE FROM settings WHERE key=?", (key,))
+    return row[0] if row else None
+
+# --- Scan Worker ---
+WORKER_STATUS_FIELDS = ('state', 'last_scan_start', 'last_scan_end', 'last_scan_rows', 'last_scan_sec', 'last_error')
+
+def acquire_worker_lease(name, owner, lease_sec):
+    """
+    Takes or renews the lease of worker `name` for `lease_sec` seconds (and records a
+    heartbeat). Fails while another owner holds an unexpired lease. Returns True if held.
+    """
+    with transaction() as conn:
+        conn.execute("INSERT OR IGNORE INTO worker_status (name) VALUES (?)", (name,))
+        cursor = conn.execute('''
+            UPDATE worker_status
+            SET started_at = CASE WHEN owner IS ? THEN started_at ELSE datetime('now') END,
+                owner = ?, heartbeat_at = datetime('now'), lease_expires = datetime('now', ?)
+            WHERE name = ? AND (owner IS ? OR lease_expires IS NULL OR lease_expires < datetime('now'))
+        ''', (owner, owner, f"+{int(lease_sec)} seconds", name, owner))
+        return cursor.rowcount == 1
+
+def release_worker_lease(name, owner):
+    """Gives up the lease (clean shutdown), so a new worker can start right away."""
+    get_db_connection().execute(
+        "UPDATE worker_status SET state='stopped', lease_expires=datetime('now', '-1 seconds') WHERE name=? AND owner=?",
+        (name, owner)
+    )
+
+def update_worker_status(name, owner, **fields):
+    """Updates status fields (see WORKER_STATUS_FIELDS) of the worker holding the lease."""
+    unknown = set(fields) - set(WORKER_STATUS_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown worker status fields: {', '.join(sorted(unknown))}")
+    if fields:
+        assignments = ", ".join(f"{k}=?" for k in fields)
+        get_db_connection().execute(
+            f"UPDATE worker_status SET {assignments} WHERE name=? AND owner=?",
+            list(fields.values()) + [name, owner]
+        )
+
+def get_worker_status(name):
+    """Status dict of a worker (plus 'heartbeat_age_sec'), or None if it never ran."""
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT value FROM settings WHERE key=?", (key,))
+        cursor = get_db_connection().execute(
+            "SELECT *, (julianday('now') - julianday(heartbeat_at)) * 86400 AS heartbeat_age_sec "
+            "FROM worker_status WHERE name=?", (name,)
+        )
         row = cursor.fetchone()
-        return row[0] if row else None
-    finally:
-        conn.close()
+        return dict(zip([d[0] for d in cursor.description], row)) if row else None
+    except Exception as e:
+        print(f"Error reading worker status: {e}")
+        return None
 
 def add_master_stock(ticker, name="Custom"):
     """Adds a new ticker to the master_stocks table."""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO master_stocks (ticker, company_name)
-            VALUES (?, ?)
-        ''', (ticker.upper(), name))
-        return cursor.rowcount > 0
-    finally:
-        conn.commit()
-        conn.close()
+    cursor = get_db_connection().cursor()
+    cursor.execute('''
+        INSERT OR IGNORE INTO master_stocks (ticker, company_name)
+        VALUES (?, ?)
+    ''', (ticker.upper(), name))
+    return cursor.rowcount > 0
+
+def upsert_master_stocks(stocks, replace=False):
+    """
+    Bulk-imports [(ticker, company_name)] into master_stocks in one transaction.
+    Known tickers get the new name; with replace=True, tickers missing from `stocks`
+    (delisted) are removed. Returns (added, removed).
+    """
+    tickers = {t for t, _ in stocks}
+    with transaction() as conn:
+        before = {row[0] for row in conn.execute("SELECT ticker FROM master_stocks")}
+        conn.executemany('''
+            INSERT INTO master_stocks (ticker, company_name) VALUES (?, ?)
+            ON CONFLICT(ticker) DO UPDATE SET company_name = excluded.company_name, last_updated = CURRENT_TIMESTAMP
+        ''', stocks)
+        gone = before - tickers if replace else set()
+        conn.executemany("DELETE FROM master_stocks WHERE ticker = ?", [(t,) for t in gone])
+    return len(tickers - before), len(gone)
 
 def delete_master_stock(ticker):
     """Removes a ticker from the master_stocks table."""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM master_stocks WHERE ticker = ?", (ticker.upper(),))
-    finally:
-        conn.commit()
-        conn.close()
+    get_db_connection().execute("DELETE FROM master_stocks WHERE ticker = ?", (ticker.upper(),))
 
 if __name__ == "__main__":
     init_db()
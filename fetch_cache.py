@@ -0,0 +1,110 @@
+import functools
+import threading
+import time
+import metrics as mt
+
+# Process-wide cache for read-only network fetchers (radar, macro, news, charts).
+# Shared by every Streamlit session and rerun in this process.
+#
+# - Fresh (younger than ttl): served from the cache.
+# - Stale: the old value is served immediately and one background refresh is started.
+# - Cold (never fetched, or older than max_stale): fetched synchronously; concurrent
+#   callers for the same key wait for that single fetch instead of all hitting the network.
+#
+# A result rejected by `valid` (e.g. None after a fetch error) never replaces a good
+# cached value; it is retried after `error_ttl` seconds.
+DEFAULT_ERROR_TTL_SEC = 60
+
+class _Entry:
+    def __init__(self):
+        self.value = None
+        self.has_value = False
+        self.expires = 0.0
+        self.fetched_at = 0.0
+        self.refreshing = False
+        self.lock = threading.Lock() # Serializes fetches for this key
+
+_entries = {}
+_entries_lock = threading.Lock()
+
+def _get_entry(key):
+    with _entries_lock:
+        entry = _entries.get(key)
+        if entry is None:
+            entry = _entries[key] = _Entry()
+        return entry
+
+def _store(entry, value, ok, ttl, error_ttl):
+    """Records a fetch result (called with entry.lock held)."""
+    now = time.monotonic()
+    if ok or not entry.has_value:
+        entry.value, entry.has_value, entry.fetched_at = value, True, now
+    entry.expires = now + (ttl if ok else error_ttl)
+
+def cached(ttl, error_ttl=DEFAULT_ERROR_TTL_SEC, max_stale=None, valid=None):
+    """
+    Decorator: caches fn(*args) per argument tuple for `ttl` seconds, then serves
+    the stale value while refreshing it in the background (see module notes).
+    `max_stale` (seconds past expiry) bounds how old a served value can get;
+    `valid(result)` decides whether a result is good enough to cache for `ttl`.
+    The wrapper gets `.invalidate()` to drop every cached value of fn.
+    """
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        def fetch(entry, args, kwargs):
+            try:
+                value = fn(*args, **kwargs)
+                ok = valid(value) if valid else True
+            except Exception as e:
+                print(f"Cache refresh failed for {name}: {e}")
+                if not entry.has_value:
+                    raise
+                value, ok = None, False
+            _store(entry, value, ok, ttl, error_ttl)
+            return entry.value
+
+        def refresh(entry, args, kwargs):
+            try:
+                with entry.lock:
+                    fetch(entry, args, kwargs)
+            except Exception:
+                pass
+            finally:
+                entry.refreshing = False
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            entry = _get_entry((name, args, tuple(sorted(kwargs.items()))))
+            now = time.monotonic()
+
+            if entry.has_value:
+                if now < entry.expires:
+                    mt.CACHE_REQUESTS.inc(cache=name, result="hit")
+                    return entry.value
+                if max_stale is None or now < entry.expires + max_stale:
+                    mt.CACHE_REQUESTS.inc(cache=name, result="stale")
+                    with _entries_lock:
+                        start = not entry.refreshing
+                        entry.refreshing = True
+                    if start:
+                        threading.Thread(target=refresh, args=(entry, args, kwargs),
+                                         name=f"refresh-{fn.__name__}", daemon=True).start()
+                    return entry.value
+
+            with entry.lock:
+                # Another caller may have filled it while we waited
+                if entry.has_value and time.monotonic() < entry.expires:
+                    mt.CACHE_REQUESTS.inc(cache=name, result="hit")
+                    return entry.value
+                mt.CACHE_REQUESTS.inc(cache=name, result="miss")
+                return fetch(entry, args, kwargs)
+
+        def invalidate():
+            with _entries_lock:
+                for key in [k for k in _entries if k[0] == name]:
+                    del _entries[key]
+
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
@@ -0,0 +1,316 @@
+import json
+import numpy as np
+import pandas as pd
+
+# --- Indicator Definitions ---
+# Shared by analysis_engine.analyze_ticker (a Series per ticker) and
+# compute_indicators (a wide date x ticker panel), so both paths give the same numbers.
+
+# Breakout alert (alert_engine) and its backtest: close strictly above this distance from the ATH (%)
+BREAKOUT_ATH_DISTANCE_PCT = -2.0
+
+def rsi(close, window=14):
+    """
+    RSI (14) with simple rolling averages of gains/losses.
+    Works on a Series or column-wise on a wide DataFrame.
+    """
+    delta = close.diff()
+    # .where(close.notna()) keeps panel padding as NaN instead of zero gains
+    gain = (delta.where(delta > 0, 0)).where(close.notna()).rolling(window=window).mean()
+    loss = (-delta.where(delta < 0, 0)).where(close.notna()).rolling(window=window).mean()
+    rs = gain / loss
+    return 100 - (100 / (1 + rs))
+
+def ema(close, span):
+    """Exponential moving average (adjust=False, i.e. seeded with the first close)."""
+    return close.ewm(span=span, adjust=False).mean()
+
+def macd(close, fast=12, slow=26, signal=9):
+    """Returns (macd_line, signal_line)."""
+    macd_line = ema(close, fast) - ema(close, slow)
+    signal_line = macd_line.ewm(span=signal, adjust=False).mean()
+    return macd_line, signal_line
+
+def candle_flags(open_p, high_p, low_p, close_p):
+    """
+    Doji / Hammer checks for a candle. Works on scalars or arrays.
+    Returns (is_doji, is_hammer).
+    """
+    body = np.abs(close_p - open_p)
+    range_len = high_p - low_p
+    upper_shadow = high_p - np.maximum(open_p, close_p)
+    lower_shadow = np.minimum(open_p, close_p) - low_p
+
+    is_doji = (body <= range_len * 0.05) & (range_len > 0)
+    # Hammer: Small body at top, long lower shadow (> 60% of total length)
+    # Upper shadow must be small (< 10% of total length)
+    is_hammer = (lower_shadow >= range_len * 0.6) & (upper_shadow <= range_len * 0.1)
+    return is_doji, is_hammer
+
+def trade_plan(last_price):
+    """
+    Plan A: Conservative Swing (Risk 4%, Reward 8% -> Ratio 1:2)
+    Plan B: Aggressive Trend (Risk 5%, Reward 15% -> Ratio 1:3)
+    Prices are rounded to the nearest 5. Returns (sl_cons, tp_cons, sl_aggr, tp_aggr).
+    """
+    return tuple(np.round(np.trunc(last_price * f) / 5) * 5 for f in (0.96, 1.08, 0.95, 1.15))
+
+def trend_label(is_weekly_uptrend, is_daily_uptrend):
+    """Combines the weekly and daily trend into the trend_strength label."""
+    if is_weekly_uptrend and is_daily_uptrend: # Both Daily & Weekly UP
+        return "STRONG UPTREND 🚀"
+    elif is_weekly_uptrend:
+        return "MILD UPTREND (Pullback) 🌤️"
+    elif is_daily_uptrend:
+        return "WEAK UPTREND (Reversal?) ☁️"
+    return "DOWNTREND 🌧️"
+
+# --- Panel (Whole Universe) ---
+# Tickers per block; bounds memory for long histories of large universes
+PANEL_BLOCK_SIZE = 250
+
+def align_to_last_bar(frames, column, tickers):
+    """
+    Stacks one column of many per-ticker frames into a (bars x tickers) array aligned
+    on each ticker's own last bar: row -1 is every ticker's latest bar and shorter
+    histories are NaN-padded at the top. Unlike a calendar-aligned panel this keeps
+    ewm/rolling results identical to running them on each ticker separately.
+    """
+    length = max(len(frames[t]) for t in tickers)
+    if column == 'Date':
+        out = np.full((length, len(tickers)), np.datetime64('NaT'), dtype='datetime64[ns]')
+    else:
+        out = np.full((length, len(tickers)), np.nan)
+    for j, t in enumerate(tickers):
+        values = frames[t].index.values if column == 'Date' else frames[t][column].to_numpy(dtype=float)
+        out[length - len(values):, j] = values
+    return out
+
+def compute_indicators(daily_frames, weekly_frames=None, block_size=PANEL_BLOCK_SIZE, return_states=False):
+    """
+    Computes every scanner indicator for many tickers at once.
+    `daily_frames` / `weekly_frames` are {ticker: OHLCV DataFrame} (full daily history
+    and ~2y of weekly bars). Returns a DataFrame with the same columns as
+    analyze_ticker (except 'roe'), one row per ticker with at least 2 daily bars.
+    With return_states=True, also returns {ticker: streaming state} (see advance_states).
+    """
+    weekly_frames = weekly_frames or {}
+    tickers = [t for t, df in daily_frames.items() if len(df) >= 2 and df['High'].notna().any()]
+    blocks, states = [], {}
+    for i in range(0, len(tickers), block_size):
+        df_block, block_states = _compute_block(daily_frames, weekly_frames, tickers[i:i + block_size])
+        blocks.append(df_block)
+        states.update(block_states)
+
+    df = pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame()
+    return (df, states) if return_states else df
+
+def _compute_block(daily_frames, weekly_frames, tickers):
+    """Indicator rows and streaming states for one block of tickers (see compute_indicators)."""
+    cols = np.arange(len(tickers))
+    n_bars = np.array([len(daily_frames[t]) for t in tickers])
+    open_a, high_a, low_a, close_a, vol_a = (
+        align_to_last_bar(daily_frames, c, tickers) for c in ('Open', 'High', 'Low', 'Close', 'Volume')
+    )
+    dates = align_to_last_bar(daily_frames, 'Date', tickers)
+    close = pd.DataFrame(close_a)
+
+    ath_price = np.nanmax(high_a, axis=0)
+    ath_date = pd.DatetimeIndex(dates[np.nanargmax(high_a, axis=0), cols]).strftime('%Y-%m-%d')
+    with np.errstate(invalid='ignore'):
+        avg_volume = np.nanmean(vol_a[-21:-1], axis=0)
+
+    ema_a = {span: ema(close, span).to_numpy() for span in EMA_SPANS}
+    macd_a = ema_a[12] - ema_a[26]
+    signal_a = pd.DataFrame(macd_a).ewm(span=9, adjust=False).mean().to_numpy()
+
+    df = _result_frame(
+        tickers, open_a[-1], high_a[-1], low_a[-1], close_a[-1], close_a[-2],
+        ath_price, ath_date, vol_a[-1], avg_volume, rsi(close).iloc[-1].to_numpy(),
+        macd_a[-1], signal_a[-1], macd_a[-2], signal_a[-2], ema_a[50][-1], ema_a[200][-1],
+        weekly_frames
+    )
+
+    # Streaming states anchored on the second-to-last bar (the last bar may still be live)
+    delta = close.diff()
+    gain_a = delta.where(delta > 0, 0).where(close.notna()).to_numpy()
+    loss_a = (-delta.where(delta < 0, 0)).where(close.notna()).to_numpy()
+    with np.errstate(invalid='ignore'):
+        prev_ath = np.nanmax(np.where(np.isnan(high_a[:-1]), -np.inf, high_a[:-1]), axis=0)
+    prev_ath[np.isinf(prev_ath)] = np.nan
+    prev_ath_pos = np.nanargmax(np.where(np.isnan(high_a[:-1]), -np.inf, high_a[:-1]), axis=0)
+    states = {}
+    for j, t in enumerate(tickers):
+        n = n_bars[j] - 1 # Bars up to and including the anchor
+        states[t] = {
+            'anchor_time': pd.Timestamp(dates[-2, j]).strftime('%Y-%m-%d %H:%M:%S'),
+            'close': float(close_a[-2, j]),
+            'n_bars': int(n),
+            'ema': {str(span): float(ema_a[span][-2, j]) for span in EMA_SPANS},
+            'macd': float(macd_a[-2, j]),
+            'signal': float(signal_a[-2, j]),
+            'gains': gain_a[-1 - min(RSI_WINDOW, n):-1, j].tolist(),
+            'losses': loss_a[-1 - min(RSI_WINDOW, n):-1, j].tolist(),
+            'volumes': vol_a[-1 - min(VOLUME_WINDOW, n):-1, j].tolist(),
+            'ath_price': float(prev_ath[j]) if not np.isnan(prev_ath[j]) else float('-inf'),
+            'ath_date': pd.Timestamp(dates[prev_ath_pos[j], j]).strftime('%Y-%m-%d') if not np.isnan(prev_ath[j]) else '',
+        }
+    return df, states
+
+def weekly_trend(weekly_frames, tickers, daily_uptrend):
+    """
+    Weekly EMA20 trend for many tickers (needs > 20 weekly bars).
+    Returns (is_weekly_uptrend, trend_strength) lists.
+    """
+    has_weekly = np.array([t in weekly_frames and len(weekly_frames[t]) > 20 for t in tickers], dtype=bool)
+    is_weekly_uptrend = np.zeros(len(tickers), dtype=bool)
+    if has_weekly.any():
+        wk_tickers = [t for t, ok in zip(tickers, has_weekly) if ok]
+        wk_close = pd.DataFrame(align_to_last_bar(weekly_frames, 'Close', wk_tickers))
+        is_weekly_uptrend[has_weekly] = wk_close.iloc[-1].to_numpy() > ema(wk_close, 20).iloc[-1].to_numpy()
+    trend_strength = [trend_label(w, u) if ok else "UNKNOWN"
+                      for w, u, ok in zip(is_weekly_uptrend, daily_uptrend, has_weekly)]
+    return is_weekly_uptrend, trend_strength
+
+def _result_frame(tickers, open_l, high_l, low_l, last_price, prev_close, ath_price, ath_date,
+                  last_volume, avg_volume, current_rsi, macd_l, signal_l, macd_p, signal_p,
+                  ema50, ema200, weekly_frames):
+    """Builds the scan result rows from per-ticker arrays of last-bar values."""
+    distance_pct = ((last_price - ath_price) / ath_price) * 100
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vol_spike_ratio = np.where(avg_volume == 0, 1.0, last_volume / avg_volume)
+    price_change_pct = ((last_price - prev_close) / prev_close) * 100
+    uptrend = ema50 > ema200
+    is_doji, is_hammer = candle_flags(open_l, high_l, low_l, last_price)
+    sl_cons, tp_cons, sl_aggr, tp_aggr = trade_plan(last_price)
+    is_weekly_uptrend, trend_strength = weekly_trend(weekly_frames, tickers, uptrend)
+
+    return pd.DataFrame({
+        'ticker': [t.replace('.JK', '') for t in tickers],
+        'current_price': last_price,
+        'ath_price': ath_price,
+        'ath_date': ath_date,
+        'ath_distance_pct': distance_pct,
+        'is_breakout': distance_pct >= -2.0,
+        'vol_spike_ratio': vol_spike_ratio,
+        'price_change_pct': price_change_pct,
+        'prev_close': prev_close,
+        'is_volatile': (vol_spike_ratio > 3.0) | (np.abs(price_change_pct) > 5.0),
+        'rsi': current_rsi,
+        'macd_val': macd_l,
+        'signal_val': signal_l,
+        'is_oversold': current_rsi < 30,
+        'is_golden_cross': (macd_p < signal_p) & (macd_l > signal_l),
+        'is_uptrend': uptrend,
+        'trend_strength': trend_strength,
+        'is_weekly_uptrend': is_weekly_uptrend,
+        'is_doji': is_doji,
+        'is_hammer': is_hammer,
+        'plan_cons_sl': sl_cons.astype(int),
+        'plan_cons_tp': tp_cons.astype(int),
+        'plan_aggr_sl': sl_aggr.astype(int),
+        'plan_aggr_tp': tp_aggr.astype(int),
+    })
+
+# --- Streaming State ---
+# Per-ticker indicator state, persisted between scans so a rescan only steps the
+# EMAs, MACD signal, RSI window, volume window and running ATH over the new bars.
+# The state is anchored on the second-to-last bar because the last bar may still
+# be live; it is re-applied on every scan without being committed.
+EMA_SPANS = (12, 26, 50, 200)
+RSI_WINDOW = 14
+VOLUME_WINDOW = 20
+
+def state_matches(state, hist):
+    """True if the state's anchor bar is still in `hist` (unchanged) with at least one bar after it."""
+    if not state or hist.empty:
+        return False
+    anchor = pd.Timestamp(state['anchor_time'])
+    pos = hist.index.searchsorted(anchor)
+    if pos >= len(hist) - 1 or hist.index[pos] != anchor:
+        return False
+    return bool(np.isclose(hist['Close'].iloc[pos], state['close'], rtol=1e-6))
+
+def _ewm_step(prev, value, span):
+    """One adjust=False ewm step, written the way pandas computes it."""
+    alpha = 2.0 / (span + 1.0)
+    if prev == value:
+        return prev
+    return ((1.0 - alpha) * prev + alpha * value) / ((1.0 - alpha) + alpha)
+
+def _step(state, high, close, volume, ts):
+    """Advances a state by one bar (in place)."""
+    delta = close - state['close']
+    state['gains'] = (state['gains'] + [delta if delta > 0 else 0.0])[-RSI_WINDOW:]
+    state['losses'] = (state['losses'] + [-delta if delta < 0 else 0.0])[-RSI_WINDOW:]
+    state['volumes'] = (state['volumes'] + [volume])[-VOLUME_WINDOW:]
+    for span in EMA_SPANS:
+        state['ema'][str(span)] = _ewm_step(state['ema'][str(span)], close, span)
+    state['macd'] = state['ema']['12'] - state['ema']['26']
+    state['signal'] = _ewm_step(state['signal'], state['macd'], 9)
+    if high > state['ath_price']:
+        state['ath_price'] = high
+        state['ath_date'] = ts.strftime('%Y-%m-%d')
+    state['close'] = close
+    state['n_bars'] += 1
+    state['anchor_time'] = ts.strftime('%Y-%m-%d %H:%M:%S')
+
+def advance_states(daily_frames, weekly_frames, states):
+    """
+    Computes the scan rows for tickers with a matching state (see state_matches)
+    by stepping their state over the bars after its anchor, so the cost is O(new bars)
+    instead of O(history). Returns (DataFrame, {ticker: new state}) like
+    compute_indicators(..., return_states=True).
+    """
+    tickers = list(states)
+    if not tickers:
+        return pd.DataFrame(), {}
+
+    cols = {k: [] for k in ('open', 'high', 'low', 'close', 'prev_close', 'ath', 'ath_date', 'volume',
+                            'avg_volume', 'rsi', 'macd', 'signal', 'macd_p', 'signal_p', 'ema50', 'ema200')}
+    new_states = {}
+    for t in tickers:
+        hist = daily_frames[t]
+        state = json.loads(json.dumps(states[t])) # Work on a copy
+        pos = hist.index.searchsorted(pd.Timestamp(state['anchor_time'])) + 1
+        bars = hist.iloc[pos:]
+        ts, highs, closes, volumes = bars.index, bars['High'].to_numpy(), bars['Close'].to_numpy(), bars['Volume'].to_numpy()
+
+        # Commit every new bar except the last (possibly live) one
+        for i in range(len(bars) - 1):
+            _step(state, highs[i], closes[i], volumes[i], ts[i])
+        new_states[t] = json.loads(json.dumps(state))
+
+        cols['prev_close'].append(state['close'])
+        cols['macd_p'].append(state['macd'])
+        cols['signal_p'].append(state['signal'])
+        with np.errstate(invalid='ignore'):
+            cols['avg_volume'].append(np.nanmean(state['volumes']) if state['volumes'] else np.nan)
+
+        _step(state, highs[-1], closes[-1], volumes[-1], ts[-1])
+        last = bars.iloc[-1]
+        cols['open'].append(last['Open'])
+        cols['high'].append(last['High'])
+        cols['low'].append(last['Low'])
+        cols['close'].append(state['close'])
+        cols['volume'].append(volumes[-1])
+        cols['ath'].append(state['ath_price'])
+        cols['ath_date'].append(state['ath_date'])
+        cols['macd'].append(state['macd'])
+        cols['signal'].append(state['signal'])
+        cols['ema50'].append(state['ema']['50'])
+        cols['ema200'].append(state['ema']['200'])
+        if len(state['gains']) == RSI_WINDOW:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rs = np.float64(sum(state['gains']) / RSI_WINDOW) / np.float64(sum(state['losses']) / RSI_WINDOW)
+            cols['rsi'].append(100 - (100 / (1 + rs)))
+        else:
+            cols['rsi'].append(np.nan)
+
+    a = {k: np.array(v) for k, v in cols.items()}
+    df = _result_frame(
+        tickers, a['open'], a['high'], a['low'], a['close'], a['prev_close'], a['ath'], a['ath_date'],
+        a['volume'], a['avg_volume'], a['rsi'], a['macd'], a['signal'], a['macd_p'], a['signal_p'],
+        a['ema50'], a['ema200'], weekly_frames
+    )
+    return df, new_states
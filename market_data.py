@@ -0,0 +1,226 @@
+import hashlib
+import os
+import pickle
+import threading
+from urllib.parse import urlparse
+import pandas as pd
+import requests
+import yfinance as yf
+import scan_executor as se
+
+# Market data provider used by data_engine / analysis_engine / chart_engine.
+# Every network call goes through get_provider(), so a whole scan can be recorded
+# once and replayed offline (deterministic checks and benchmarks):
+#
+#   STOCK_SENTINEL_PROVIDER=record:recordings/2024-06-14   (live + save responses)
+#   STOCK_SENTINEL_PROVIDER=replay:recordings/2024-06-14   (offline, no network)
+#
+# or in code: set_provider(ReplayProvider("recordings/2024-06-14")).
+PROVIDER_ENV_VAR = "STOCK_SENTINEL_PROVIDER"
+
+# Hosts used for per-host rate limiting
+YAHOO_HOST = "finance.yahoo.com"
+NEWS_HOST = "news.google.com"
+
+class HttpResponse:
+    """Minimal (picklable) HTTP response returned by MarketDataProvider.http_get."""
+    def __init__(self, url, status_code, content=b"", headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = dict(headers or {})
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+class MarketDataProvider:
+    """
+    Interface for market data sources. Symbols are Yahoo symbols (e.g. "BBCA.JK", "^JKSE").
+    Bar frames are returned raw (as the source gives them); data_engine normalizes them.
+    """
+    def history(self, symbol, period=None, interval="1d", start=None):
+        """Bars for one symbol, for a period ("1y", "max", ...) or since `start` (datetime)."""
+        raise NotImplementedError
+
+    def download(self, symbols, period=None, interval="1d", start=None):
+        """Bars for several symbols in one batch. Returns {symbol: DataFrame} (missing symbols omitted)."""
+        raise NotImplementedError
+
+    def info(self, symbol):
+        """Fundamentals/profile dict for a symbol (Yahoo's .info)."""
+        raise NotImplementedError
+
+    def last_price(self, symbol):
+        """Latest traded price of a symbol."""
+        raise NotImplementedError
+
+    def http_get(self, url, headers=None, timeout=5):
+        """Plain HTTP GET (news feeds). Returns an HttpResponse."""
+        raise NotImplementedError
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance (yfinance) and the web, rate limited per host."""
+    def history(self, symbol, period=None, interval="1d", start=None):
+        se.throttle(YAHOO_HOST)
+        stock = yf.Ticker(symbol)
+        if start is not None:
+            return stock.history(start=start.strftime('%Y-%m-%d'), interval=interval)
+        return stock.history(period=period, interval=interval)
+
+    def download(self, symbols, period=None, interval="1d", start=None):
+        kwargs = dict(interval=interval, group_by='ticker', auto_adjust=True, progress=False, threads=True)
+        if start is not None:
+            kwargs['start'] = start.strftime('%Y-%m-%d')
+        else:
+            kwargs['period'] = period
+        # yf.download makes one request per symbol
+        se.throttle(YAHOO_HOST, cost=len(symbols))
+        data = yf.download(" ".join(symbols), **kwargs)
+
+        frames = {}
+        if data.empty:
+            return frames
+        for sym in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if sym not in data.columns.get_level_values(0):
+                    continue
+                df = data[sym]
+            elif len(symbols) == 1:
+                df = data
+            else:
+                continue
+            df = df.dropna(how='all')
+            if not df.empty:
+                frames[sym] = df
+        return frames
+
+    def info(self, symbol):
+        se.throttle(YAHOO_HOST)
+        return yf.Ticker(symbol).info
+
+    def last_price(self, symbol):
+        se.throttle(YAHOO_HOST)
+        # Fast way to get price: fast_info or history 1d
+        return yf.Ticker(symbol).fast_info.last_price
+
+    def http_get(self, url, headers=None, timeout=5):
+        se.throttle(urlparse(url).netloc)
+        resp = requests.get(url, headers=headers or {}, timeout=timeout)
+        return HttpResponse(url, resp.status_code, resp.content, resp.headers)
+
+# --- Record / Replay ---
+def _call_key(method, args):
+    """Stable file name for a provider call."""
+    return hashlib.sha1(repr((method,) + tuple(args)).encode()).hexdigest()
+
+class RecordingProvider(MarketDataProvider):
+    """
+    Forwards every call to `source` (live by default) and saves the response under
+    `directory`, one pickle per distinct call. Failed calls are recorded too (as their
+    message), so a replay fails the same calls.
+    """
+    def __init__(self, directory, source=None):
+        self.directory = directory
+        self.source = source or YFinanceProvider()
+        os.makedirs(directory, exist_ok=True)
+
+    def _record(self, method, args, call):
+        try:
+            result, error = call(), None
+        except Exception as e:
+            result, error = None, e
+
+        path = os.path.join(self.directory, _call_key(method, args) + ".pkl")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({'call': (method,) + args, 'result': result,
+                         'error': None if error is None else f"{type(error).__name__}: {error}"}, f)
+        os.replace(tmp, path)
+
+        if error is not None:
+            raise error
+        return result
+
+    def history(self, symbol, period=None, interval="1d", start=None):
+        return self._record('history', (symbol, period, interval, start),
+                            lambda: self.source.history(symbol, period, interval, start))
+
+    def download(self, symbols, period=None, interval="1d", start=None):
+        return self._record('download', (tuple(symbols), period, interval, start),
+                            lambda: self.source.download(symbols, period, interval, start))
+
+    def info(self, symbol):
+        return self._record('info', (symbol,), lambda: self.source.info(symbol))
+
+    def last_price(self, symbol):
+        return self._record('last_price', (symbol,), lambda: self.source.last_price(symbol))
+
+    def http_get(self, url, headers=None, timeout=5):
+        return self._record('http_get', (url, tuple(sorted((headers or {}).items()))),
+                            lambda: self.source.http_get(url, headers, timeout))
+
+class ReplayMissError(LookupError):
+    """Raised by ReplayProvider for a call that was never recorded."""
+
+class ReplayProvider(MarketDataProvider):
+    """Serves responses saved by RecordingProvider from `directory`; never touches the network."""
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _replay(self, method, args):
+        path = os.path.join(self.directory, _call_key(method, args) + ".pkl")
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            raise ReplayMissError(f"No recording for {method}{args}") from None
+        if entry['error'] is not None:
+            raise RuntimeError(entry['error'])
+        return entry['result']
+
+    def history(self, symbol, period=None, interval="1d", start=None):
+        return self._replay('history', (symbol, period, interval, start))
+
+    def download(self, symbols, period=None, interval="1d", start=None):
+        return self._replay('download', (tuple(symbols), period, interval, start))
+
+    def info(self, symbol):
+        return self._replay('info', (symbol,))
+
+    def last_price(self, symbol):
+        return self._replay('last_price', (symbol,))
+
+    def http_get(self, url, headers=None, timeout=5):
+        return self._replay('http_get', (url, tuple(sorted((headers or {}).items()))))
+
+# --- Active Provider ---
+_provider = None
+_provider_lock = threading.Lock()
+
+def provider_from_spec(spec):
+    """Builds a provider from "yfinance", "record:<dir>" or "replay:<dir>"."""
+    kind, _, directory = (spec or "yfinance").partition(":")
+    if kind == "yfinance":
+        return YFinanceProvider()
+    if kind == "record" and directory:
+        return RecordingProvider(directory)
+    if kind == "replay" and directory:
+        return ReplayProvider(directory)
+    raise ValueError(f"Unknown market data provider: {spec}")
+
+def get_provider():
+    """Returns the active provider (from STOCK_SENTINEL_PROVIDER on first use, live by default)."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = provider_from_spec(os.environ.get(PROVIDER_ENV_VAR))
+    return _provider
+
+def set_provider(provider):
+    """Replaces the active provider (e.g. a ReplayProvider for offline runs). Returns the previous one."""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+    return previous
@@ -0,0 +1,213 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# In-process operational metrics, served in Prometheus text format on
+# http://127.0.0.1:<port>/metrics (port from the METRICS_PORT setting, 0 disables).
+# Modules record into the metrics defined at the bottom of this file; the scrape
+# renders whatever has been recorded so far in this process.
+DEFAULT_PORT = 9108
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SCAN_BUCKETS = (5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {} # label values tuple -> value
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_label_text(self.label_names, key)} {_format_value(value)}"]
+
+class Counter(_Metric):
+    """Monotonic count (e.g. requests, failures)."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """Value that goes up and down. `fn` (no labels) computes it at scrape time instead."""
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), fn=None):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def render(self):
+        if self.fn is not None:
+            value = self.fn()
+            with self.lock:
+                self.values = {} if value is None else {(): value}
+        return super().render()
+
+class Histogram(_Metric):
+    """Distribution of observed values (durations) in cumulative buckets."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0, 0.0] # bucket counts, count, sum
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def time(self, **labels):
+        """Context manager observing the wall time of the enclosed block."""
+        return _Timer(self, labels)
+
+    def _render_sample(self, key, state):
+        counts, count, total = state
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_label_text(self.label_names, key, [('le', _format_value(float(bound)))])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_label_text(self.label_names, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_label_text(self.label_names, key)} {_format_value(float(total))}")
+        lines.append(f"{self.name}_count{_label_text(self.label_names, key)} {count}")
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            print(f"Error rendering metric {metric.name}: {e}")
+    return "\n".join(lines) + "\n"
+
+# --- HTTP Endpoint ---
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes every few seconds would flood the console
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_server(port=DEFAULT_PORT, host="127.0.0.1"):
+    """Serves /metrics on a daemon thread (once per process). Returns True if it is running."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return True
+        try:
+            _server = ThreadingHTTPServer((host, port), _Handler)
+        except OSError as e:
+            print(f"Metrics endpoint not started on port {port}: {e}")
+            return False
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        print(f"Metrics endpoint on http://{host}:{port}/metrics")
+        return True
+
+# --- Scanner Metrics ---
+_last_scan_success = None
+
+def mark_scan_success():
+    """Records that a scan finished and its results were saved."""
+    global _last_scan_success
+    _last_scan_success = time.time()
+    LAST_SCAN_SUCCESS.set(_last_scan_success)
+
+SCAN_DURATION = Histogram("sentinel_scan_duration_seconds", "Wall time of scan_market.", buckets=SCAN_BUCKETS)
+SCAN_STAGE_DURATION = Histogram("sentinel_scan_stage_duration_seconds", "Wall time of each scan stage.",
+                                labels=("stage",), buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800))
+TICKERS_SCANNED = Counter("sentinel_tickers_scanned_total", "Tickers that produced a scan result.")
+TICKERS_PREFILTERED = Counter("sentinel_tickers_prefiltered_total",
+                              "Tickers skipped by the scan pre-filter (price, volume, liquidity).")
+TICKERS_NOT_DUE = Counter("sentinel_tickers_not_due_total",
+                          "Tickers skipped by the adaptive cadence because their next scan was not due.")
+TICKERS_FAILED = Counter("sentinel_tickers_failed_total", "Tickers requested by a scan that produced no result.")
+LAST_SCAN_SUCCESS = Gauge("sentinel_last_scan_success_timestamp_seconds",
+                          "Unix time of the last scan whose results were saved.")
+SECONDS_SINCE_LAST_SCAN = Gauge("sentinel_seconds_since_last_scan_success",
+                                "Seconds since the last scan whose results were saved.",
+                                fn=lambda: None if _last_scan_success is None else time.time() - _last_scan_success)
+HTTP_REQUESTS = Counter("sentinel_http_requests_total", "Outgoing requests per host (after rate limiting).",
+                        labels=("host",))
+CACHE_REQUESTS = Counter("sentinel_cache_requests_total", "Cache lookups by result (hit, stale, miss).",
+                         labels=("cache", "result"))
+TELEGRAM_SEND_DURATION = Histogram("sentinel_telegram_send_seconds", "Telegram sendMessage latency.")
+TELEGRAM_FAILURES = Counter("sentinel_telegram_failures_total", "Telegram messages that could not be sent.")
+TELEGRAM_RETRIES = Counter("sentinel_telegram_retries_total", "Telegram sends retried (rate_limited, transient).",
+                           labels=("reason",))
+TELEGRAM_QUEUE_DEPTH = Gauge("sentinel_telegram_queue_depth", "Telegram messages waiting to be sent.")
+SQLITE_WRITE_DURATION = Histogram("sentinel_sqlite_write_seconds", "Duration of SQLite write transactions.")
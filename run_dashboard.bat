@@ -1,2 +1,3 @@
+start "Scan Worker" python scan_worker.py
 python -m streamlit run stock_sentinel.py
 pause
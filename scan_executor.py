@@ -0,0 +1,125 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import metrics as mt
+
+# Defaults (overridable from the Settings page, see analysis_engine.get_scan_settings)
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RATE_PER_SEC = 5.0 # Requests per second per host
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_SEC = 1.0
+DEFAULT_TASK_TIMEOUT_SEC = 60
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Allows `rate` requests per second on average,
+    with bursts of up to `capacity` requests.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate * 2)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        """Blocks until `cost` tokens are available (capped at the bucket capacity)."""
+        if not self.rate:
+            return
+        cost = min(cost, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                wait_sec = (cost - self.tokens) / self.rate
+            time.sleep(wait_sec)
+
+# --- Per-Host Rate Limiting ---
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def set_rate_limit(host, rate, capacity=None):
+    """Sets the request rate (per second) for a host. A rate of 0/None disables limiting."""
+    with _limiters_lock:
+        current = _limiters.get(host)
+        if current and current.rate == rate and (capacity is None or current.capacity == capacity):
+            return
+        _limiters[host] = TokenBucket(rate, capacity)
+
+def throttle(host, cost=1):
+    """Waits for the host's rate limiter before making `cost` requests to it."""
+    with _limiters_lock:
+        bucket = _limiters.get(host)
+        if bucket is None:
+            bucket = _limiters[host] = TokenBucket(DEFAULT_RATE_PER_SEC)
+    bucket.acquire(cost)
+    mt.HTTP_REQUESTS.inc(cost, host=host)
+
+# --- Execution ---
+def call_with_retry(fn, *args, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF_SEC, **kwargs):
+    """Calls fn, retrying on exception with exponential backoff (plus a little jitter)."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.25))
+
+def run_concurrent(items, fn, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TASK_TIMEOUT_SEC,
+                   retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF_SEC, progress_callback=None):
+    """
+    Runs fn(item) for every item on a bounded thread pool.
+    Each item is retried with backoff on exception and abandoned once it has been
+    running longer than `timeout` seconds. Returns results in the order of `items`;
+    failed or timed-out items give None.
+    `progress_callback(done, total, item)` is called from the calling thread as each
+    item finishes, so it can safely update Streamlit elements.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    if not items:
+        return results
+
+    started = {}
+
+    def task(i):
+        started[i] = time.monotonic()
+        return call_with_retry(fn, items[i], retries=retries, backoff=backoff)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="scan")
+    futures = {pool.submit(task, i): i for i in range(len(items))}
+    pending = set(futures)
+    done_count = 0
+    try:
+        while pending:
+            finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+
+            expired = set()
+            if timeout:
+                now = time.monotonic()
+                expired = {f for f in pending if futures[f] in started and now - started[futures[f]] > timeout}
+                pending -= expired
+
+            for f in finished | expired:
+                i = futures[f]
+                if f in expired:
+                    print(f"Timed out after {timeout}s: {items[i]}")
+                else:
+                    try:
+                        results[i] = f.result()
+                    except Exception as e:
+                        print(f"Failed after {retries + 1} attempts: {items[i]}: {e}")
+                done_count += 1
+                if progress_callback:
+                    progress_callback(done_count, len(items), items[i])
+    finally:
+        # Don't wait for abandoned (timed-out) threads
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    return results
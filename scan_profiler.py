@@ -0,0 +1,171 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# On-demand scan profiling. A sampler thread walks the Python stacks of the scanning
+# thread and of every thread started during the scan (the fetch pool workers) at a
+# fixed interval, so time spent waiting on Yahoo counts as well as pandas work.
+# Each profile is written to PROFILE_DIR as:
+#   <name>.speedscope.json  (open in https://www.speedscope.app)
+#   <name>.collapsed.txt    (folded stacks, for flamegraph.pl / inferno)
+#   <name>.txt              (top-N hotspot summary)
+PROFILE_DIR = "profiles"
+SAMPLE_INTERVAL_SEC = 0.005
+TOP_N = 25
+MAX_PROFILES = 20 # Older profiles are deleted
+# Leaf frames of threads parked on a lock/queue (finished pool workers, the caller
+# waiting on futures). Counted as idle instead of as time spent in them.
+IDLE_LEAVES = {
+    ("wait", "threading.py"),
+    ("_worker", os.path.join("concurrent", "futures", "thread.py")),
+}
+
+class SamplingProfiler:
+    """Wall-clock stack sampler for the calling thread and the threads it starts."""
+    def __init__(self, interval=SAMPLE_INTERVAL_SEC):
+        self.interval = interval
+        self.stacks = Counter() # (frame, ...) root first -> samples
+        self.samples = 0
+        self.idle = 0 # Thread-samples parked in IDLE_LEAVES
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Threads that were already running (UI, other pollers) are not part of the scan
+        self._ignored = {t.ident for t in threading.enumerate()} - {threading.get_ident()}
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="scan-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident in self._ignored:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if _is_idle(stack[0]):
+                    self.idle += 1
+                else:
+                    self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    # --- Output ---
+    def hotspots(self, top_n=TOP_N):
+        """[(frame, self samples, total samples)] sorted by self samples."""
+        own, total = Counter(), Counter()
+        for stack, n in self.stacks.items():
+            own[stack[-1]] += n
+            for frame in set(stack):
+                total[frame] += n
+        return [(frame, n, total[frame]) for frame, n in own.most_common(top_n)]
+
+    def write(self, directory, name, title):
+        """Writes the speedscope, collapsed-stack and summary files. Returns the summary path."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, n in self.stacks.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(n * self.interval)
+        with open(base + ".speedscope.json", "w") as f:
+            json.dump({
+                '$schema': "https://www.speedscope.app/file-format-schema.json",
+                'name': title,
+                'shared': {'frames': frames},
+                'profiles': [{
+                    'type': "sampled", 'name': title, 'unit': "seconds",
+                    'startValue': 0, 'endValue': sum(weights),
+                    'samples': samples, 'weights': weights,
+                }],
+            }, f)
+
+        with open(base + ".collapsed.txt", "w") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(";".join(_frame_label(frame) for frame in stack) + f" {n}\n")
+
+        total = sum(self.stacks.values()) or 1
+        lines = [title,
+                 f"Duration {self.duration:.2f}s, {self.samples} samples every {self.interval * 1000:.0f} ms "
+                 f"(thread-samples add up across the scan's threads, {self.idle} idle thread-samples left out)",
+                 "",
+                 f"{'self %':>7} {'total %':>8}  function"]
+        for frame, own, cumulative in self.hotspots():
+            lines.append(f"{own / total * 100:7.1f} {cumulative / total * 100:8.1f}  {_frame_label(frame)}")
+        summary = base + ".txt"
+        with open(summary, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return summary
+
+def _is_idle(frame):
+    name, filename, _ = frame
+    return any(name == idle_name and filename.endswith(idle_file) for idle_name, idle_file in IDLE_LEAVES)
+
+def _frame_label(frame):
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+@contextmanager
+def profile_scan(enabled=True, label="scan", directory=None):
+    """
+    Profiles the enclosed block when `enabled` (and does nothing otherwise).
+    Yields the profiler (or None); the files are written when the block exits.
+    """
+    if not enabled:
+        yield None
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        directory = directory or PROFILE_DIR
+        name = f"{label}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        try:
+            path = profiler.write(directory, name, f"{label} {datetime.now().isoformat(timespec='seconds')}")
+            print(f"Scan profile written to {path}")
+            _prune(directory)
+        except Exception as e:
+            print(f"Error writing scan profile: {e}")
+
+def list_profiles(directory=None):
+    """Summary files of the saved profiles, newest first."""
+    directory = directory or PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    summaries = [os.path.join(directory, f) for f in os.listdir(directory)
+                 if f.endswith(".txt") and not f.endswith(".collapsed.txt")]
+    return sorted(summaries, key=os.path.getmtime, reverse=True)
+
+def _prune(directory):
+    for summary in list_profiles(directory)[MAX_PROFILES:]:
+        base = summary[:-len(".txt")]
+        for path in (summary, base + ".speedscope.json", base + ".collapsed.txt"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,187 @@
+"""
+Headless scan worker: runs the auto-pilot (scans, persistence, Telegram alerts and
+the daily alert digest) and the live quote poller in its own process, independent
+of the Streamlit server.
+
+    python scan_worker.py            # run until stopped (Ctrl+C / SIGTERM)
+    python scan_worker.py --once     # one scan cycle, then exit
+
+Only one worker runs per database: it holds a lease in the worker_status table,
+renewed with every heartbeat; a second worker exits while the lease is held.
+The dashboard reads the worker's status from the same table and controls it
+through settings:
+    AUTO_PILOT = "1"/"0"             scheduled scans on/off
+    SCAN_INTERVAL / SCAN_START_HOUR  minutes between scans / first hour of the day
+    LIVE_QUOTES = "1"/"0"            live quote polling on/off
+    WORKER_COMMAND = "scan_now"      one-shot: scan immediately
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytz
+
+import database_manager as db
+import data_engine as de
+import analysis_engine as ae
+import telegram_bot as bot
+import alert_engine as alerts
+import dashboard_views as dv
+import scan_profiler as sp
+import metrics as mt
+
+WORKER_NAME = "scanner"
+LEASE_SEC = 60 # A worker that misses heartbeats this long is considered dead
+HEARTBEAT_SEC = 10
+LOOP_SEC = 2 # How often commands and settings are checked
+QUOTE_POLL_SEC = 60
+DEFAULT_SCAN_INTERVAL_MIN = 30
+DEFAULT_START_HOUR = 9
+COMMAND_SCAN_NOW = "scan_now"
+
+def _utc_now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def is_worker_alive(status):
+    """True if a worker_status dict belongs to a worker with a live heartbeat."""
+    return bool(status) and status.get('state') != 'stopped' and status.get('heartbeat_age_sec') is not None \
+        and status['heartbeat_age_sec'] < LEASE_SEC
+
+def read_config():
+    """Worker settings as written by the dashboard."""
+    def _int(key, default):
+        try:
+            return int(db.get_setting(key) or default)
+        except ValueError:
+            return default
+
+    return {
+        'auto_pilot': db.get_setting("AUTO_PILOT") == "1",
+        'interval_sec': _int("SCAN_INTERVAL", DEFAULT_SCAN_INTERVAL_MIN) * 60,
+        'start_hour': _int("SCAN_START_HOUR", DEFAULT_START_HOUR),
+        'live_quotes': db.get_setting("LIVE_QUOTES") != "0",
+    }
+
+def run_scan_cycle(owner, force=False, wait=False):
+    """
+    One auto-pilot cycle: scan (adaptive cadence), save, fundamentals/news refresh and alerts.
+    The refreshes run in background threads unless `wait` (the process is about to exit).
+    """
+    tickers = db.get_all_tickers()
+    if not tickers:
+        print("No tickers in the watchlist.")
+        return
+
+    print("Running background scan...")
+    started = time.perf_counter()
+    db.update_worker_status(WORKER_NAME, owner, state='scanning', last_scan_start=_utc_now())
+    with sp.profile_scan(db.take_setting("SCAN_PROFILE") == "1", label="background_scan"):
+        df = ae.scan_adaptive(tickers, force=force)
+        if not df.empty:
+            db.save_scan_results(df)
+            materialize_dashboard()
+    if wait:
+        de.refresh_fundamentals(tickers)
+        de.ingest_news(tickers)
+    else:
+        de.start_fundamentals_refresh(tickers)
+        de.start_news_ingestion(tickers)
+    db.update_worker_status(WORKER_NAME, owner, last_scan_end=_utc_now(), last_scan_rows=len(df),
+                            last_scan_sec=round(time.perf_counter() - started, 2), last_error=None)
+    alerts.dispatch_alerts(df)
+
+def materialize_dashboard():
+    """Pre-builds the Dashboard page for the latest scan and the current market phase."""
+    try:
+        dv.refresh()
+    except Exception as e:
+        print(f"Dashboard materialization error: {e}")
+
+def _heartbeat(owner, stop, lost):
+    """Renews the lease until `stop` is set; sets `lost` (and `stop`) if another worker took it over."""
+    while not stop.wait(HEARTBEAT_SEC):
+        try:
+            if not db.acquire_worker_lease(WORKER_NAME, owner, LEASE_SEC):
+                print("Scan worker lease lost to another worker, stopping.")
+                lost.set()
+                stop.set()
+        except Exception as e:
+            print(f"Heartbeat error: {e}")
+
+def _after_start_hour(start_hour):
+    return datetime.now(pytz.timezone('Asia/Jakarta')).hour >= start_hour
+
+def run(once=False):
+    """Worker main loop. Returns a process exit code."""
+    db.init_db()
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    if not db.acquire_worker_lease(WORKER_NAME, owner, LEASE_SEC):
+        status = db.get_worker_status(WORKER_NAME) or {}
+        print(f"Another scan worker is running ({status.get('owner')}), exiting.")
+        return 1
+    print(f"Scan worker started ({owner}).")
+
+    port = int(db.get_setting("METRICS_PORT") or mt.DEFAULT_PORT)
+    if port:
+        mt.start_server(port)
+
+    stop, lost = threading.Event(), threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    threading.Thread(target=_heartbeat, args=(owner, stop, lost), name="worker-heartbeat", daemon=True).start()
+
+    next_scan = next_quotes = 0.0
+    phase = None
+    try:
+        while not stop.is_set():
+            cfg = read_config()
+            current_phase, _ = ae.get_market_phase()
+            if current_phase != phase:
+                # Playbook texts depend on the phase: build them before the dashboard asks
+                phase = current_phase
+                materialize_dashboard()
+            command = db.take_setting("WORKER_COMMAND")
+            now = time.monotonic()
+            try:
+                if once or command == COMMAND_SCAN_NOW or \
+                        (cfg['auto_pilot'] and now >= next_scan and _after_start_hour(cfg['start_hour'])):
+                    run_scan_cycle(owner, force=once or command == COMMAND_SCAN_NOW, wait=once)
+                    next_scan = time.monotonic() + cfg['interval_sec']
+                    if once:
+                        break
+                elif alerts.send_digest_if_due():
+                    print("Daily alert digest sent.")
+                elif cfg['live_quotes'] and now >= next_quotes and ae.is_market_open():
+                    updated = ae.poll_live_prices()
+                    print(f"Live quotes: {updated} rows updated.")
+                    if updated:
+                        materialize_dashboard()
+                    next_quotes = time.monotonic() + QUOTE_POLL_SEC
+            except Exception as e:
+                print(f"Background scan error: {e}")
+                db.update_worker_status(WORKER_NAME, owner, last_error=f"{_utc_now()} {e}")
+
+            db.update_worker_status(WORKER_NAME, owner, state='running' if cfg['auto_pilot'] else 'paused')
+            stop.wait(LOOP_SEC)
+    finally:
+        stop.set()
+        if not lost.is_set():
+            db.release_worker_lease(WORKER_NAME, owner)
+        # Alerts are sent from a background queue; give them a moment before exiting
+        if not bot.flush(timeout=30):
+            print("Exiting with unsent Telegram messages.")
+        print("Scan worker stopped.")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock Sentinel scan worker (auto-pilot without the dashboard).")
+    parser.add_argument("--once", action="store_true", help="Run one full scan cycle and exit")
+    args = parser.parse_args()
+    raise SystemExit(run(once=args.once))
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 import pandas as pd
 from streamlit_autorefresh import st_autorefresh
@@ -6,6 +7,11 @@ import data_engine as de
 import analysis_engine as ae
 import chart_engine as ce
 import telegram_bot as bot
+import scan_profiler as sp
+import metrics as mt
+import scan_worker as sw
+import alert_engine as al
+import dashboard_views as dv
 
 # --- Page Config ---
 st.set_page_config(page_title="Stock Sentinel Dashboard", page_icon="📈", layout="wide")
@@ -19,14 +25,29 @@ if 'db_init' not in st.session_state:
     db.init_db()
     st.session_state['db_init'] = True
 
-if 'scan_results' not in st.session_state:
+# Reload when the background scanner or live quote poller has changed the saved results
+scan_version = db.get_scan_results_version()
+if 'scan_results' not in st.session_state or st.session_state.get('scan_results_version') != scan_version:
     # Try to load latest from DB
+    first_load = 'scan_results' not in st.session_state
     last_df, last_time = db.get_latest_scan_results()
     if not last_df.empty:
         st.session_state['scan_results'] = last_df
-        st.toast(f"Loaded previous scan from {last_time}")
-    else:
+        if first_load:
+            st.toast(f"Loaded previous scan from {last_time}")
+    elif first_load:
         st.session_state['scan_results'] = pd.DataFrame()
+    st.session_state['scan_results_version'] = scan_version
+
+# --- Metrics Endpoint ---
+# Prometheus text on http://127.0.0.1:<METRICS_PORT + 1>/metrics (0 disables), once per process.
+# METRICS_PORT itself belongs to the scan worker, which records the scan metrics.
+@st.cache_resource
+def start_metrics_endpoint():
+    port = int(db.get_setting("METRICS_PORT") or mt.DEFAULT_PORT)
+    return port + 1 if port and mt.start_server(port + 1) else None
+
+metrics_port = start_metrics_endpoint()
 
 # --- Functions ---
 def run_scanner():
@@ -35,35 +56,44 @@ def run_scanner():
     if not all_tickers:
         return pd.DataFrame()
     
-    results = []
     progress_bar = st.progress(0)
     status_text = st.empty()
+    status_text.text(f"Downloading history for {len(all_tickers)} stocks...")
     
-    total = len(all_tickers)
-    for i, ticker in enumerate(all_tickers):
-        status_text.text(f"Scanning {ticker} ({i+1}/{total})...")
-        res = ae.analyze_ticker(ticker)
-        if res:
-            results.append(res)
-        progress_bar.progress((i + 1) / total)
+    def on_progress(done, total, label):
+        status_text.text(f"Scanning {label} ({done}/{total})...")
+        progress_bar.progress(done / total)
+    
+    with sp.profile_scan(db.take_setting("SCAN_PROFILE") == "1", label="run_scanner"):
+        df = ae.scan_adaptive(all_tickers, progress_callback=on_progress, force=True)
+        # Save to DB for persistence (an empty scan must not wipe the last good results)
+        if not df.empty:
+            db.save_scan_results(df)
         
     status_text.empty()
     progress_bar.empty()
     
-    df = pd.DataFrame(results)
     st.session_state['scan_results'] = df
-    # Save to DB for persistence
-    db.save_scan_results(df)
     st.session_state['new_scan_done'] = True
+    # Top up stale ROE values and news in the background for the next scan
+    de.start_fundamentals_refresh(all_tickers)
+    de.start_news_ingestion(all_tickers)
     return df
 
 # --- Sidebar ---
 st.sidebar.title("🛡️ Stock Sentinel")
 st.sidebar.markdown("---")
 # Quick Actions
+worker_status = db.get_worker_status(sw.WORKER_NAME)
+worker_alive = sw.is_worker_alive(worker_status)
 if st.sidebar.button("🔄 Refresh Market Feed"):
-    run_scanner()
-    st.rerun()
+    if worker_alive:
+        # The worker picks the command up within a few seconds; results arrive via the scan version
+        db.set_setting("WORKER_COMMAND", sw.COMMAND_SCAN_NOW)
+        st.toast("Scan requested from the background worker.")
+    else:
+        run_scanner()
+        st.rerun()
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("### ⚙️ Settings")
@@ -73,77 +103,18 @@ if not curr_token:
 else:
     st.sidebar.success("✅ Bot Connected")
 
-# --- Background Scheduler ---
-import threading
-import time
-from datetime import datetime, time as time_obj
-
-@st.cache_resource
-def get_scheduler_state():
-    return {"running": False, "thread": None, "start_hour": 9, "start_minute": 0}
-
-scheduler = get_scheduler_state()
-
-def background_scan_job(interval_sec=1800, start_h=9, start_m=0):
-    """Runs in background thread. Scans and sends Telegram alerts."""
-    while scheduler["running"]:
-        now = datetime.now()
-        current_time = now.time()
-        start_time = time_obj(start_h, start_m)
-        
-        # Only run if current time >= start_time (simple logic for daily start)
-        # For simplicity, we just run loop and check constraint
-        
-        try:
-            print("Running background scan...")
-            tickers = db.get_all_tickers()
-            if tickers:
-                results = []
-                for t in tickers:
-                    res = ae.analyze_ticker(t)
-                    if res:
-                        results.append(res)
-                
-                df = pd.DataFrame(results)
-                if not df.empty:
-                    # Save to DB for UI sync
-                    db.save_scan_results(df)
-                    
-                    # Filter for alerts
-                    # 1. Breakouts
-                    df_ath = df[df['ath_distance_pct'] > -2.0]
-                    if not df_ath.empty:
-                        bot.send_scan_report("Breakout Alert 🚀", df_ath)
-                    
-                    # 2. RSI Oversold
-                    df_rsi = df[df.get('is_oversold', False) == True]
-                    if not df_rsi.empty:
-                        bot.send_scan_report("Oversold Alert (RSI < 30) 📉", df_rsi)
-
-                    # 3. Golden Cross
-                    df_gc = df[df.get('is_golden_cross', False) == True]
-                    if not df_gc.empty:
-                         bot.send_scan_report("Golden Cross Alert ✨", df_gc)
-
-        except Exception as e:
-            print(f"Background scan error: {e}")
-            
-        # Smart Sleep (Check every second to allow immediate stop)
-        for _ in range(int(interval_sec)):
-            if not scheduler["running"]:
-                print("Stopping background scan...")
-                break
-            time.sleep(1)
-
+# --- Auto-Pilot ---
+# Scheduled scans, alerts and live quotes run in the headless worker (scan_worker.py);
+# the sidebar only writes its settings and shows its status.
 st.sidebar.markdown("### ⏲️ Auto-Pilot")
 col_int, col_start = st.sidebar.columns(2)
 
 # Load saved settings
 saved_int = db.get_setting("SCAN_INTERVAL")
-def_int = int(saved_int) if saved_int else 30
+def_int = int(saved_int) if saved_int else sw.DEFAULT_SCAN_INTERVAL_MIN
 
 saved_start = db.get_setting("SCAN_START_HOUR")
-def_start = int(saved_start) if saved_start else 9
+def_start = int(saved_start) if saved_start else sw.DEFAULT_START_HOUR
 
 # Render widgets
 scan_interval = col_int.slider("Interval (Min)", 5, 60, def_int, step=5)
@@ -156,18 +127,26 @@ if scan_interval != def_int:
 if start_hour != def_start:
     db.set_setting("SCAN_START_HOUR", str(start_hour))
 
-run_auto = st.sidebar.toggle(f"Enable Background", value=scheduler["running"])
-
-if run_auto and not scheduler["running"]:
-    scheduler["running"] = True
-    # Pass arguments
-    t = threading.Thread(target=background_scan_job, args=(scan_interval * 60, start_hour, 0), daemon=True)
-    t.start()
-    scheduler["thread"] = t
-    st.sidebar.info(f"Scanner started. Interval: {scan_interval}m, Start: {start_hour}:00")
-elif not run_auto and scheduler["running"]:
-    scheduler["running"] = False
-    st.sidebar.warning("Stopped background scanner.")
+saved_auto = db.get_setting("AUTO_PILOT") == "1"
+run_auto = st.sidebar.toggle("Enable Background", value=saved_auto)
+if run_auto != saved_auto:
+    db.set_setting("AUTO_PILOT", "1" if run_auto else "0")
+
+saved_live = db.get_setting("LIVE_QUOTES")
+run_live = st.sidebar.toggle("Live Prices (1 min)", value=saved_live != "0",
+                             help="Updates price, ATH distance and breakout status between scans during market hours.")
+if (saved_live != "0") != run_live:
+    db.set_setting("LIVE_QUOTES", "1" if run_live else "0")
+
+if worker_alive:
+    st.sidebar.success(f"Worker {worker_status['state']} (heartbeat {worker_status['heartbeat_age_sec']:.0f}s ago)")
+    if worker_status.get('last_scan_end'):
+        st.sidebar.caption(f"Last scan {worker_status['last_scan_end']} UTC: {worker_status['last_scan_rows']} rows "
+                           f"in {worker_status['last_scan_sec']:.0f}s")
+    if worker_status.get('last_error'):
+        st.sidebar.warning(f"Last error: {worker_status['last_error']}")
+elif run_auto or run_live:
+    st.sidebar.warning("Scan worker not running. Start it with `python scan_worker.py`.")
 
 # --- RISKS CALCULATOR (NEW) ---
 with st.sidebar.expander("🧮 Calculator (Risk Manager)"):
@@ -238,11 +217,21 @@ if page == "Dashboard (Live)":
     
     st.markdown("---")
     
-    # Auto-run scanner if empty (First load)
+    # Auto-run scanner if empty (First load): ask the worker if one is running,
+    # otherwise scan in-process once per session (an empty result must not loop)
     if st.session_state['scan_results'].empty:
-        st.info("🔄 Menjalankan Auto-Scan pertama kali... Mohon tunggu sebentar.")
-        run_scanner()
-        st.rerun()
+        if worker_alive:
+            if not st.session_state.get('auto_scan_requested'):
+                db.set_setting("WORKER_COMMAND", sw.COMMAND_SCAN_NOW)
+                st.session_state['auto_scan_requested'] = True
+            st.info("🔄 Auto-Scan sedang dijalankan oleh background worker... Hasil muncul setelah halaman dimuat ulang.")
+        elif not st.session_state.get('auto_scan_done'):
+            st.session_state['auto_scan_done'] = True
+            st.info("🔄 Menjalankan Auto-Scan pertama kali... Mohon tunggu sebentar.")
+            run_scanner()
+            st.rerun()
+        else:
+            st.warning("Auto-Scan tidak menemukan data. Coba lagi dengan tombol 🔄 Refresh Market Feed.")
     else:
         df_res = st.session_state['scan_results']
         send_tele = st.session_state.get('new_scan_done', False)
@@ -251,56 +240,60 @@ if page == "Dashboard (Live)":
             phase_name, _ = ae.get_market_phase()
             tele_msg += f"🛡️ **Stock Sentinel Live Update ({phase_name})**\n\n"
         
-        # Backward compatibility for new columns
-        if 'trend_strength' not in df_res.columns:
-            df_res['trend_strength'] = "N/A"
-            
-        # --- BEST PICK ALGORITHM ---
-        # Criteria: Golden Cross AND Strong Uptrend (Weekly + Daily Up)
-        df_picks = df_res[
-            (df_res['is_golden_cross'] == True) & 
-            (df_res['trend_strength'].str.contains("STRONG", na=False))
-        ]
-        
-        # Fallback: If no strong, try just Uptrend or just Golden Cross
-        if df_picks.empty:
-             df_picks = df_res[df_res['is_golden_cross'] == True]
-        
-        # Limit to top 3
-        df_picks = df_picks.head(3)
-        
-        if not df_picks.empty:
+        # Panels and playbooks are materialized per scan, market phase and macro state (dashboard_views)
+        phase_name, _ = ae.get_market_phase()
+        views, playbooks = dv.get_dashboard(df_res, scan_version, phase_name, dv.macro_key(macro))
+
+        def render_table(panel, height=200):
+            rows = [r for _, r in views.get(panel, [])]
+            if rows:
+                st.dataframe(pd.DataFrame(rows), use_container_width=True, height=height, hide_index=True)
+            return bool(rows)
+
+        def render_playbook(p):
+            with st.expander(p['title']):
+                for fact in p['facts']:
+                    st.markdown(fact)
+                st.markdown("---")
+                st.markdown("💡 **Trading Playbook (AI Professional Advice):**")
+                if p['insight']:
+                    st.markdown(p['insight'])
+                    st.markdown("---")
+                getattr(st, p['level'])(p['status'])
+                if p['macro_note']:
+                    st.markdown(p['macro_note'])
+                if p['narrative']:
+                    st.markdown(f"**Analisa Eksekusi AI:**\n{p['narrative']}")
+                    st.markdown(f"**Langkah Selanjutnya (Proyeksi Waktu):**\n{p['projection']}")
+                    st.markdown("---")
+                    st.markdown("💸 **Exit Plan (Strategi Jual):**")
+                    for line in p['exit_plan']:
+                        st.markdown(line)
+
+        picks = views.get('picks', [])
+        if picks:
             st.markdown("#### 🏆 AI Top Picks (Recommendation)")
             
             # Use 3 cols for compact view
             cols = st.columns(3)
-            for i, (idx, row) in enumerate(df_picks.iterrows()):
+            for i, (ticker, card) in enumerate(picks):
                 # Distribute cards across columns
                 with cols[i % 3]: 
                     with st.container(border=True):
                         # Header
                         c1, c2 = st.columns([2, 1])
-                        c1.subheader(f"{row['ticker']}")
-                        c2.markdown(f"**Rp {row['current_price']:,.0f}**")
-                        st.caption(f"{row['trend_strength']}")
+                        c1.subheader(ticker)
+                        c2.markdown(card['price'])
+                        st.caption(card['trend'])
                         
                         # Plan (Compact)
-                        st.markdown(f"""
-                        **🎯 Plan A (Safe 1:2)**
-                        - Buy: **{row['current_price']:,.0f}**
-                        - TP: **{row['plan_cons_tp']:,.0f}** :green[(+8%)]
-                        - SL: **{row['plan_cons_sl']:,.0f}** :red[(-4%)]
-                        
-                        **🚀 Plan B (Aggressive 1:3)**
-                        - TP: **{row['plan_aggr_tp']:,.0f}** :green[(+15%)]
-                        - SL: **{row['plan_aggr_sl']:,.0f}** :red[(-5%)]
-                        """)
+                        st.markdown(card['plan'])
                         
                         # News
-                        stock_news = de.get_ticker_news(row['ticker'])
+                        stock_news = de.get_ticker_news(ticker)
                         if stock_news:
                             st.markdown("---")
-                            st.caption("🗞️ Related News:")
+                            st.caption(f"🗞️ Related News (Sentimen 7 hari: {card['news_sentiment']:+.0f}):")
                             for n in stock_news:
                                 st.markdown(f"- [{n['title'][:50]}...]({n['link']})")
 
@@ -310,162 +303,44 @@ if page == "Dashboard (Live)":
         with col_bo:
             st.markdown("#### 🚀 Potential Breakout (Near ATH)")
             st.caption("Saham yang harganya mendekati Rekor Tertinggi (ATH). Menandakan tren naik sangat kuat.")
-            df_ath = df_res[df_res['ath_distance_pct'] > -10].sort_values('ath_distance_pct', ascending=False).head(5)
-            if not df_ath.empty:
-                st.dataframe(
-                    df_ath[['ticker', 'current_price', 'ath_distance_pct', 'trend_strength']]
-                    .rename(columns={'ticker': 'Ticker', 'current_price': 'Price', 'ath_distance_pct': 'ATH Dist', 'trend_strength': 'Trend (W+D)'})
-                    .style.format({"Price": "{:,.0f}", "ATH Dist": "{:.2f}%"}),
-                    use_container_width=True,
-                    height=200
-                )
+            render_table('ath')
             st.markdown("#### 🚀 Calon To The Moon (Breakout ATH)")
             st.caption("Saham yang harganya sudah sangat dekat dengan rekor harga tertinggi sepanjang masa (All-Time High).")
-            df_ath = df_res[df_res['ath_distance_pct'] > -10].sort_values('ath_distance_pct', ascending=False).head(5)
-            if not df_ath.empty:
-                for _, row in df_ath.iterrows():
-                    price = row['current_price']
-                    ath = row['ath_price']
-                    roe = row.get('roe', None)
-                    tp_price = ath * 1.10 # Target 10%
-                    cl_price = ath * 0.95 # Cutloss 5%
-
-                    roe_text = "N/A"
-                    if roe is not None:
-                        roe_pct = roe * 100
-                        if roe_pct >= 15:
-                            roe_text = f"✅ {roe_pct:.2f}% (Sangat Sehat)"
-                        elif roe_pct < 0:
-                            roe_text = f"❌ {roe_pct:.2f}% (Rugi/Bakar Duit)"
-                        else:
-                            roe_text = f"⚠️ {roe_pct:.2f}% (Biasa/Kurang Sehat)"
-
-                    with st.expander(f"⭐ {row['ticker']} (Jarak ke puncak: {row['ath_distance_pct']:.2f}%)"):
-                        st.markdown(f"**Harga Saat Ini:** Rp {price:,.0f}")
-                        st.markdown(f"**Target Puncak (ATH):** Rp {ath:,.0f}")
-                        st.markdown(f"**Kesehatan Bisnis (ROE):** {roe_text}")
-                        st.markdown("---")
-                        st.markdown("💡 **Trading Playbook (AI Professional Advice):**")
-                        
-                        phase_name, phase_desc = ae.get_market_phase()
-                        
-                        # --- DYNAMIC NARRATIVE ENGINE (BREAKOUT) ---
-                        narrative = ""
-                        if "Golden Time" in phase_name or "Tutup" in phase_name or "Pre-Closing" in phase_name:
-                            if price >= ath:
-                                status_alert = st.success
-                                status_msg = f"🎯 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga bertahan kuat di atas Rp {ath:,.0f} menjelang penutupan. **Sinyal Beli (Buy) Sangat Valid!** Hajar Kanan sekarang atau hold jika sudah punya."
-                                narrative = f"Breakout terkonfirmasi sempurna di penghujung hari! Ini adalah 'Golden Time' yang kita tunggu. Penutupan yang kuat di atas resisten kritis menandakan institusi bersedia menahan barang (akumulasi), memberikan peluang besar harga akan lanjut reli besok pagi."
-                            else:
-                                status_alert = st.error
-                                status_msg = f"🛑 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nSangat disayangkan, harga gagal bertahan di atas Rp {ath:,.0f} dan bursa mau tutup. **Breakout Gagal.** Lupakan saham ini atau segera Cut Loss jika terlanjur beli."
-                                narrative = f"Sayang sekali, saham ini gagal mempertahankan level penembusannya hingga bursa tutup. Pola seperti ini sering disebut 'False Breakout' (Jebakan Bull Trap). Bandar memancing ritel di pagi hari lalu membantingnya ke bawah. Hindari masuk."
-                        elif "Pagi" in phase_name or "Pembukaan" in phase_name:
-                            if price >= ath:
-                                status_alert = st.info
-                                status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga menembus Rp {ath:,.0f}, TAPI ini masih terlalu pagi. Rawan *profit taking*. Cicil beli kecil (Tes Ombak)."
-                                narrative = f"Saham ini sedang berusaha menembus rekor harga tertinggi (ATH). Karena ini masih pagi, volatilitas sangat tinggi. Seringkali bandar sengaja menarik harga ke atas sesaat untuk memancing ritel sebelum dibanting. Tetap waspada, amati apakah antrean beli (bid) cukup tebal."
-                            else:
-                                status_alert = st.warning
-                                status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nBelum kuat menembus Rp {ath:,.0f}. Santai dulu, amati dari luar. Jangan tangkap pisau jatuh di pagi hari."
-                                narrative = f"Saham ini berpotensi breakout, namun pagi ini masih terlihat ragu-ragu dan belum mampu menembus resisten kuatnya. Jangan buru-buru masuk, biarkan market membentuk arahnya terlebih dahulu hingga sesi siang."
-                        else: # Sesi 1 or Sesi 2
-                            if price >= ath:
-                                status_alert = st.success
-                                status_msg = f"👍 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nTren terlihat positif siang ini. Harga konsisten di atas batas aman. Boleh tambah porsi beli (Average Up)."
-                                narrative = f"Luar biasa! Melewati sesi pagi yang bergejolak, saham ini berhasil bertahan di atas harga ATH-nya. Ini adalah konfirmasi validasi tren positif. Bandar tampaknya serius melakukan akumulasi. Momentum sangat mendukung untuk masuk."
-                            else:
-                                status_alert = st.warning
-                                status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga masih tertahan di bawah Rp {ath:,.0f}. Momentum mulai hilang. Wait and see sampai Golden Time (14:30) nanti."
-                                narrative = f"Upaya penembusan harga tertinggi tampaknya tertahan di sesi ini. Harga tidak mampu dipertahankan dan tertekan kembali ke bawah resisten. Jangan memaksakan diri, lebih baik tunggu konfirmasi di jam 14:40 nanti."
-                        
-                        status_alert(status_msg)
-                        
-                        if macro and macro['color'] == 'red':
-                            st.markdown(f"🚨 **PERINGATAN MACRO:** Walaupun saham ini punya potensi Breakout, **Cuaca IHSG sedang Badai**. Mayoritas saham *breakout* di saat market hancur berpotensi menjadi *Bull Trap* (Jebakan). Kurangi porsi beli atau *wait and see*.")
-                        elif macro and macro['color'] == 'green':
-                            st.markdown(f"🔥 **DUKUNGAN MACRO:** Cuaca IHSG sedang Euforia! Probabilitas *breakout* sukses jauh lebih tinggi. Angin sedang bertiup dari belakang layar.")
-                            
-                        # --- DYNAMIC PROJECTION ENGINE (BREAKOUT) ---
-                        proyeksi = ""
-                        if "Pagi" in phase_name or "Pembukaan" in phase_name:
-                            proyeksi = f"- **Menjelang Siang (10:00 - 11:30):** Pantau apakah harga mampu bertahan di atas Rp {ath:,.0f}. Jika tiba-tiba melorot, lupakan dulu.\n- **Sesi Sore (14:40):** Ini waktu penentuan. Jika harga masih kuat bertengger di atas ATH, baru eksekusi beli dengan mantap."
-                        elif "Sesi" in phase_name:
-                            proyeksi = f"- **Sesi 2 (13:30 - 14:30):** Perhatikan apakah ada 'bantingan' (penurunan paksa) oleh bandar. Tetap santai.\n- **Jelang Tutup (14:40):** Keputusan final ada di jam ini. Jika *breakout* tetap valid, silakan tahan barangmu."
-                        elif "Golden Time" in phase_name or "Tutup" in phase_name or "Pre-Closing" in phase_name:
-                            proyeksi = f"- **Penutupan Hari Ini:** Evaluasi apakah saham ditutup kokoh. Jika ya, *breakout* sukses.\n- **Skenario Besok Pagi:** Rawan *profit taking* kilat. Siapkan antrean jual di target Rp {tp_price:,.0f}."
-                        else:
-                            proyeksi = f"- **Besok Pagi (09:00 - 09:30):** Waspada lonjakan atau bantingan di awal pembukaan.\n- **Siang (11:00):** Waktu untuk memastikan apakah tren kemarin masih berlanjut."
-
-                        st.markdown(f"**Analisa Eksekusi AI:**\n{narrative}")
-                        st.markdown(f"**Langkah Selanjutnya (Proyeksi Waktu):**\n{proyeksi}")
-                        
-                        bpjs_advice = ""
-                        if "Pagi" in phase_name or "Pembukaan" in phase_name:
-                            bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Kalau masuk sekarang niat main cepat, target jualmu di rentang **Rp {price * 1.02:,.0f} - Rp {price * 1.03:,.0f}** (+2-3%). JUAL sebelum bursa tutup berapapun harganya. Jangan ngarep besok mantul."
-                        elif "Sesi" in phase_name:
-                            bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Jika sudah mencapai batas cuan BPJS (sekitar **Rp {price * 1.02:,.0f}**), boleh langsung bungkus. Jangan terlalu serakah menunggu harga puncak."
-                        else:
-                            bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Sesi *Day Trading* sudah berakhir. Masuk jam segini otomatis kamu berhaluan Swing Trader (siap menahan barang menginap)."
-
-                        st.markdown("---")
-                        st.markdown("💸 **Exit Plan (Strategi Jual):**")
-                        st.markdown(f"- **Take Profit:** Pasang **Auto Order Jual** di target **Rp {tp_price:,.0f}** (+10%).")
-                        st.markdown(f"- **Cut Loss:** Sabuk pengaman di **Rp {cl_price:,.0f}**. Patuhi ketat.")
-                        st.markdown(bpjs_advice)
-                        
+            if views.get('ath'):
+                for ticker, _ in views['ath']:
+                    p = playbooks.get(('ath', ticker))
+                    if p:
+                        render_playbook(p)
                         if send_tele:
-                            tele_msg += f"🚀 *{row['ticker']}* (Rp {price:,.0f})\n{narrative}\n\n"
+                            tele_msg += p['telegram']
             else:
                 st.info("Belum ada saham yang mau Breakout hari ini.")
 
         with col_vol:
             st.markdown("#### ⚡ Volatility Alert")
             st.caption("Saham yang volume atau harganya bergerak drastis. Hati-hati, High Risk High Reward.")
-            df_vol = df_res[df_res['is_volatile'] == True].head(5)
-            if not df_vol.empty:
-                st.dataframe(
-                    df_vol[['ticker', 'current_price', 'vol_spike_ratio', 'trend_strength']]
-                    .rename(columns={'ticker': 'Ticker', 'current_price': 'Price', 'vol_spike_ratio': 'Vol Ratio', 'trend_strength': 'Trend (W+D)'})
-                    .style.format({"Price": "{:,.0f}", "Vol Ratio": "{:.1f}x"}),
-                    use_container_width=True,
-                    height=200
-                )
-            else:
+            if not render_table('volatile'):
                 st.caption("Market is calm.")
 
         # --- SMART ALERTS (NEW) ---
         st.markdown("#### 🧠 Smart Signals (Assist)")
+        new_signals = {label: db.get_new_signals(signal) for label, signal in
+                       [("Breakout", 'is_breakout'), ("Oversold", 'is_oversold'), ("Golden Cross", 'is_golden_cross')]}
+        if any(new_signals.values()):
+            st.caption("🆕 Baru sejak scan sebelumnya: " + " | ".join(
+                f"**{label}:** {', '.join(tickers)}" for label, tickers in new_signals.items() if tickers))
         col_rsi, col_macd = st.columns(2)
         
         with col_rsi:
             st.info("📉 Discount Alert (RSI < 30)")
             st.caption("Saham 'Oversold' (Jenuh Jual). Harganya sudah dianggap murah, potensi mantul naik.")
-            df_oversold = df_res[df_res['is_oversold'] == True].head(5)
-            if not df_oversold.empty:
-                 st.dataframe(
-                    df_oversold[['ticker', 'current_price', 'rsi', 'trend_strength']]
-                    .rename(columns={'ticker': 'Ticker', 'current_price': 'Price', 'rsi': 'RSI', 'trend_strength': 'Trend (W+D)'})
-                    .style.format({"Price": "{:,.0f}", "RSI": "{:.1f}"}),
-                    use_container_width=True,
-                    height=200
-                 )
-            else:
+            if not render_table('oversold'):
                 st.caption("No oversold stocks found.")
 
         with col_macd:
             st.success("✨ Trend Reversal (Golden Cross)")
             st.caption("Garis MACD memotong ke atas. Sinyal awal perubahan tren menjadi naik (Uptrend).")
-            df_gc = df_res[df_res['is_golden_cross'] == True].head(5)
-            if not df_gc.empty:
-                st.dataframe(
-                    df_gc[['ticker', 'current_price', 'macd_val', 'trend_strength']]
-                    .rename(columns={'ticker': 'Ticker', 'current_price': 'Price', 'macd_val': 'MACD', 'trend_strength': 'Trend (W+D)'})
-                    .style.format({"Price": "{:,.0f}", "MACD": "{:.2f}"}),
-                    use_container_width=True,
-                    height=200
-                )
-            else:
+            if not render_table('golden_cross'):
                  st.caption("No reversals detected.")
 
         # --- CANDLESTICK PATTERNS ---
@@ -475,147 +350,23 @@ if page == "Dashboard (Live)":
         with col_hammer:
             st.warning("🔨 Hammer (Potential Bottom)")
             st.caption("Pola 'Palu'. Sempat turun dalam tapi dilawan naik. Sinyal kuat harga akan berbalik naik.")
-            df_hammer = df_res[df_res.get('is_hammer', False) == True].head(5)
-            if not df_hammer.empty:
-                 st.dataframe(
-                    df_hammer[['ticker', 'current_price']]
-                    .rename(columns={'ticker': 'Ticker (Kode)', 'current_price': 'Price (Harga)'})
-                    .style.format({"Price (Harga)": "{:,.0f}"}),
-                    use_container_width=True,
-                    height=150
-                 )
-            else:
+            if not render_table('hammer', height=150):
                  st.caption("No hammer patterns.")
 
         with col_doji:
             st.info("➕ Doji (Indecision)")
             st.caption("Pola 'Indecision'. Penjual dan pembeli sama kuat. Pasar sedang galau menunggu arah.")
-            df_doji = df_res[df_res.get('is_doji', False) == True].head(5)
-            if not df_doji.empty:
-                st.dataframe(
-                    df_doji[['ticker', 'current_price']]
-                    .rename(columns={'ticker': 'Ticker (Kode)', 'current_price': 'Price (Harga)'})
-                    .style.format({"Price (Harga)": "{:,.0f}"}),
-                    use_container_width=True,
-                    height=150
-                )
-            else:
+            if not render_table('doji', height=150):
                 st.caption("No doji patterns.")
             st.markdown("#### ⚡ Ada Pergerakan Bandar (Volatilitas Tinggi)")
             st.caption("Saham yang tiba-tiba ramai dibeli/dijual dengan volume tidak wajar hari ini.")
-            df_vol = df_res[df_res['is_volatile'] == True].head(5)
-            if not df_vol.empty:
-                for _, row in df_vol.iterrows():
-                    price = row['current_price']
-                    change = row['price_change_pct']
-                    vol = row['vol_spike_ratio']
-                    roe = row.get('roe', None)
-                    
-                    roe_text = "N/A"
-                    if roe is not None:
-                        roe_pct = roe * 100
-                        if roe_pct >= 15:
-                            roe_text = f"✅ {roe_pct:.2f}% (Sangat Sehat)"
-                        elif roe_pct < 0:
-                            roe_text = f"❌ {roe_pct:.2f}% (Rugi/Bakar Duit)"
-                        else:
-                            roe_text = f"⚠️ {roe_pct:.2f}% (Biasa/Kurang Sehat)"
-                    
-                    if change > 0:
-                        tp_low = price * 1.05
-                        tp_high = price * 1.10
-                        cl_price = price * 0.95
-
-                        status_harga = f"📈 **NAIK** {change:.2f}%"
-                        analisa = f"Volume transaksi meledak hingga {vol:.1f}x lipat rata-rata saat harga sedang NAIK. Secara teknikal, ini adalah jejak rekam bahwa Institusi/Bandar besar sedang melakukan akumulasi (borong barang)."
-                        if roe is not None and roe < 0:
-                            analisa += " **Namun PERHATIAN EKSTRA:** Secara fundamental, perusahaan ini mencetak kerugian (ROE Minus). Kenaikan ini berisiko tinggi murni karena spekulasi/gorengan. Disiplin *trading* harus ekstra ketat!"
-                    else:
-                        status_harga = f"📉 **TURUN** {abs(change):.2f}%"
-                        analisa = f"Lampu Kuning Menyala! Terdapat ledakan volume {vol:.1f}x lipat diiringi harga yang TURUN. Ini mengindikasikan Distribusi (Bandar sedang buang barang masif ke pasar ritel)."
-
-                    with st.expander(f"🔥 {row['ticker']} (Volume meledak {vol:.1f}x lipat)"):
-                        st.markdown(f"**Harga Saat Ini:** Rp {price:,.0f}")
-                        st.markdown(f"**Kondisi Hari Ini:** {status_harga}")
-                        st.markdown(f"**Kesehatan Bisnis (ROE):** {roe_text}")
-                        st.markdown("---")
-                        st.markdown("💡 **Trading Playbook (AI Professional Advice):**")
-                        st.markdown(f"**Insight Analis Dasar:** {analisa}")
-                        st.markdown("---")
-                        
-                        phase_name, phase_desc = ae.get_market_phase()
-                        
-                        # --- DYNAMIC NARRATIVE ENGINE (VOLATILE) ---
-                        if change > 0:
-                            narrative = ""
-                            if "Golden Time" in phase_name or "Tutup" in phase_name or "Pre-Closing" in phase_name:
-                                if price >= cl_price:
-                                    status_alert = st.success
-                                    status_msg = f"🎯 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga ditutup aman di atas batas *cut loss* (Rp {cl_price:,.0f}). Tren akumulasi bandar **VALID**. Aman di-Hold."
-                                    narrative = f"Pergerakan harga sukses dipertahankan hingga menjelang penutupan. Secara probabilitas, tren kenaikan (uptrend) jangka pendek masih sangat valid. Tidak ada tanda-tanda distribusi masif dari institusi."
-                                else:
-                                    status_alert = st.error
-                                    status_msg = f"🛑 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nBencana! Harga dijebol ke bawah Rp {cl_price:,.0f} menjelang tutup. Bandar distribusi diam-diam. **EKSEKUSI CUT LOSS!**"
-                                    narrative = f"Lampu merah! Harga justru ditutup nyungsep menembus batas toleransi dukungan. Ini menandakan ledakan volume kemarin kemungkinan besar adalah aksi jualan terselubung bandar ke ritel. Sangat berisiko tinggi."
-                            elif "Pagi" in phase_name or "Pembukaan" in phase_name:
-                                if price >= cl_price * 1.05:
-                                    status_alert = st.warning
-                                    status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga melesat sangat kencang. Awas pancingan (FOMO)!"
-                                    narrative = f"Volume ledakan kemarin berlanjut dengan euforia pagi ini, harga melesat kencang. Hati-hati FOMO (Fear of Missing Out). Seringkali harga ditarik kencang di awal hanya untuk jualan. Jangan kejar harga atas."
-                                else:
-                                    status_alert = st.info
-                                    status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nPagi ini rawan gocekan karena kemarin naik kencang. Jangan panik kalau tiba-tiba merah. Tahan diri dulu."
-                                    narrative = f"Sangat wajar jika pagi ini harga bergerak volatil atau bahkan terkoreksi sedikit (Profit Taking wajar). Bandar sedang menguji apakah ada kepanikan ritel. Amati reaksinya hingga lewat jam 10:00."
-                            else: # Sesi 1 or Sesi 2
-                                if price > cl_price * 1.02:
-                                    status_alert = st.success
-                                    status_msg = f"👍 **KEPUTUSAN SAAT INI ({phase_name}):**\n\nTren naik terkonfirmasi siang ini! Bandar melanjutkan *Markup*. Boleh ikut antre beli (Hajar Kanan)."
-                                    narrative = f"Konfirmasi yang solid! Setelah sempat diuji pagi tadi, harga kini stabil di area positif. Ini indikasi kuat bahwa 'Markup' (pengangkatan harga) oleh Institusi masih terus berlanjut. Momentum sangat baik."
-                                else:
-                                    status_alert = st.warning
-                                    status_msg = f"⏳ **KEPUTUSAN SAAT INI ({phase_name}):**\n\nHarga tertahan. Hati-hati bandar sedang mengukur minat ritel. Jangan tambah muatan dulu."
-                                    narrative = f"Harga terlihat loyo dan tertahan di sesi siang ini, padahal volume kemarin sangat besar. Ini bisa menjadi sinyal awal bandar mulai mendistribusikan (jual pelan-pelan) barangnya saat ritel sedang lengah."
-                            
-                            status_alert(status_msg)
-                            
-                            # --- DYNAMIC PROJECTION ENGINE (VOLATILE) ---
-                            proyeksi = ""
-                            if "Pagi" in phase_name or "Pembukaan" in phase_name:
-                                if price > cl_price * 1.05:
-                                    proyeksi = f"- **Menjelang Siang (10:30):** Karena pagi ini melesat naik, rawan dibanting siang nanti. Jangan buru-buru antre beli.\n- **Sore Hari (14:40):** Lihat apakah kenaikan pagi tadi sungguhan atau cuma jebakan."
-                                else:
-                                    proyeksi = f"- **Sesi Siang (11:00):** Jika pagi ini merah, pantau apakah jam 11 nanti mulai ditarik hijau. Jika ditarik hijau, itu adalah momen beli terbaik (Markup konfirmasi).\n- **Batas Waktu (14:40):** Jika sampai sore tetap tidak bisa naik, coret dari daftar."
-                            elif "Sesi" in phase_name:
-                                proyeksi = f"- **Sesi 2 (13:30 - 14:30):** Biasanya bandar mulai bergerak masif di jam ini. Waspadai volatilitas mendadak.\n- **Jelang Tutup (14:40):** Evaluasi akhir sebelum penutupan. Pastikan harga aman di atas batas *cut loss* (Rp {cl_price:,.0f})."
-                            else:
-                                proyeksi = f"- **Skenario Besok Pagi:** Jangan kaget jika pagi hari langsung merah sekejap (gocekan bandar). Jangan panik.\n- **Evaluasi Besok Siang:** Biarkan market menentukan arah aslinya setelah jam 10 pagi."
-
-                            st.markdown(f"**Analisa Eksekusi AI:**\n{narrative}")
-                            st.markdown(f"**Langkah Selanjutnya (Proyeksi Waktu):**\n{proyeksi}")
-                            
-                            bpjs_advice = ""
-                            if "Pagi" in phase_name or "Pembukaan" in phase_name:
-                                if price > cl_price * 1.05:
-                                    bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Sangat disarankan untuk volatilitas liar! Target copet kilat di **Rp {price * 1.03:,.0f}** (+3%). Langsung hajar kiri (jual). Jangan bawa menginap."
-                                else:
-                                    bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Ladang emas pencopet. Masuk dekat *support* (**Rp {cl_price:,.0f}**), ambil cuan di **Rp {price * 1.03:,.0f}** lalu lari. Jangan terbawa perasaan jika sore dibanting."
-                            elif "Sesi" in phase_name:
-                                bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Jika sudah cuan lumayan sejak pagi (harga sudah menyentuh **Rp {price * 1.02:,.0f}**), amankan sekarang. Bandar sering buang barang di sesi siang/sore."
-                            else:
-                                bpjs_advice = f"- **Strategi BPJS (Beli Pagi Jual Sore):** Jam segini bukan waktu untuk copet harian. Pasang incaran eksekusi di **Rp {price * 1.02:,.0f}** untuk trading plan besok pagi saja."
-
-                            st.markdown("---")
-                            st.markdown("💸 **Exit Plan (Strategi Jual):**")
-                            st.markdown(f"- **Take Profit:** Volatilitas tinggi = pergerakan cepat. Pasang antrean **Auto Order Jual** di rentang **Rp {tp_low:,.0f} - Rp {tp_high:,.0f}**.")
-                            st.markdown(f"- **Cut Loss:** Sabuk pengaman di **Rp {cl_price:,.0f}**. Patuhi *cut loss*.")
-                            st.markdown(bpjs_advice)
-                            
-                            if send_tele:
-                                tele_msg += f"🔥 *{row['ticker']}* (Rp {price:,.0f})\n{narrative}\n\n"
-                        else:
-                            st.error(f"🛑 **Skenario Eksekusi:** Sangat berisiko tinggi (*High Risk*). Secara teknikal, membeli saham yang sedang didistribusi bandar sama dengan menangkap pisau jatuh. **Wait and See**.")
-                            if send_tele:
-                                tele_msg += f"🚨 *{row['ticker']}* (Rp {price:,.0f})\nDistribusi Bandar. Jauhi saham ini!\n\n"
+            if views.get('volatile'):
+                for ticker, _ in views['volatile']:
+                    p = playbooks.get(('volatile', ticker))
+                    if p:
+                        render_playbook(p)
+                        if send_tele:
+                            tele_msg += p['telegram']
             else:
                 st.info("Pasar sedang sepi, tidak ada pergerakan mencolok.")
 
@@ -660,8 +411,9 @@ if page == "Dashboard (Live)":
     with col_chart:
         st.markdown("### 📈 Technical Chart")
         if selected_ticker:
-            st.caption(f"Showing 3-month history for {selected_ticker}")
-            fig = ce.create_price_chart(selected_ticker)
+            chart_period = st.radio("Period", ["3mo", "6mo", "1y", "5y", "max"], horizontal=True, label_visibility="collapsed")
+            st.caption(f"Showing {chart_period} history for {selected_ticker}")
+            fig = ce.create_price_chart(selected_ticker, period=chart_period)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
             else:
@@ -712,7 +464,100 @@ elif page == "Settings":
                 st.success("Saved.")
             
     if st.button("Test Alert"):
-        bot.send_telegram_message("🔔 Test from Unified Dashboard.")
+        ok, info = bot.send_telegram_message("🔔 Test from Unified Dashboard.", wait=20)
+        if ok:
+            st.success(info)
+        else:
+            st.error(info)
+
+    with st.expander("🔔 Alert Rules"):
+        st.caption("Background scans only alert when a stock enters a signal, not on every cycle it stays there.")
+        alert_cfg = al.get_alert_settings()
+        with st.form("alert_settings"):
+            mode_in = st.radio("Delivery", al.ALERT_MODES, index=al.ALERT_MODES.index(alert_cfg['mode']),
+                               format_func=lambda m: {"instant": "Instant (per scan)", "digest": "Daily Digest"}[m],
+                               horizontal=True)
+            cd_in = {s: st.number_input(f"Cooldown: {title} (min)", 0, 10080, alert_cfg['cooldown_min'][s], step=30)
+                     for s, (title, _) in al.ALERT_SIGNALS.items()}
+            ex_in = st.checkbox("Notify when a signal ends", alert_cfg['notify_exits'])
+            dh_in = st.number_input("Digest Hour (WIB)", 0, 23, alert_cfg['digest_hour'])
+            if st.form_submit_button("Save"):
+                db.set_setting("ALERT_MODE", mode_in)
+                for s, minutes in cd_in.items():
+                    db.set_setting(f"ALERT_COOLDOWN_{s.upper()}", str(minutes))
+                db.set_setting("ALERT_NOTIFY_EXITS", "1" if ex_in else "0")
+                db.set_setting("ALERT_DIGEST_HOUR", str(dh_in))
+                st.success("Saved. Applies from the next scan.")
+
+        alert_state = db.get_alert_state()
+        if not alert_state.empty:
+            active = alert_state[alert_state['active'] == 1]['signal'].value_counts()
+            st.caption("Active: " + " · ".join(f"{title} {active.get(s, 0)}" for s, (title, _) in al.ALERT_SIGNALS.items()))
+
+    with st.expander("🏎️ Scanner Performance"):
+        scan_cfg = ae.get_scan_settings()
+        with st.form("scanner_settings"):
+            w_in = st.number_input("Parallel Workers", 1, 32, scan_cfg['workers'])
+            r_in = st.number_input("Rate Limit (Requests/sec to Yahoo)", 0.5, 50.0, float(scan_cfg['rate_limit']), step=0.5)
+            to_in = st.number_input("Timeout per Stock (sec)", 5, 600, scan_cfg['timeout'])
+            st.caption("Pre-filter: a cheap quote pass over the whole watchlist; only liquid names get the full analysis.")
+            pf_in = st.checkbox("Enable Pre-Filter", scan_cfg['prefilter'])
+            mp_in = st.number_input("Min Price (Rp)", 0.0, 100000.0, float(scan_cfg['min_price']), step=10.0)
+            mv_in = st.number_input("Min Avg Daily Value (Rp Miliar)", 0.0, 1000.0, scan_cfg['min_value'] / 1e9, step=0.5)
+            ad_in = st.checkbox("Adaptive Cadence (background scans refresh active names every cycle, quiet ones hourly/daily)", scan_cfg['adaptive'])
+            if st.form_submit_button("Save"):
+                db.set_setting("SCAN_WORKERS", str(w_in))
+                db.set_setting("SCAN_RATE_LIMIT", str(r_in))
+                db.set_setting("SCAN_TICKER_TIMEOUT", str(to_in))
+                db.set_setting("SCAN_PREFILTER", "1" if pf_in else "0")
+                db.set_setting("SCAN_MIN_PRICE", str(mp_in))
+                db.set_setting("SCAN_MIN_VALUE", str(mv_in * 1e9))
+                db.set_setting("SCAN_ADAPTIVE", "1" if ad_in else "0")
+                st.success("Saved. Applies from the next scan.")
+
+        schedule = db.get_scan_schedule()
+        if not schedule.empty:
+            tiers = schedule['tier'].value_counts()
+            st.caption(f"Cadence: 🔥 {tiers.get('hot', 0)} hot (every cycle) · 🌤️ {tiers.get('warm', 0)} warm (~hourly) · "
+                       f"💤 {tiers.get('cold', 0)} cold (~daily)")
+
+    with st.expander("📡 Metrics Endpoint"):
+        worker_port = int(db.get_setting("METRICS_PORT") or mt.DEFAULT_PORT)
+        if worker_port:
+            st.caption(f"Scan worker: http://127.0.0.1:{worker_port}/metrics")
+        if metrics_port:
+            st.caption(f"Dashboard: http://127.0.0.1:{metrics_port}/metrics")
+        else:
+            st.caption("The dashboard metrics endpoint is not running.")
+        with st.form("metrics_settings"):
+            port_in = st.number_input("Port (0 = off)", 0, 65535, int(db.get_setting("METRICS_PORT") or mt.DEFAULT_PORT))
+            if st.form_submit_button("Save"):
+                db.set_setting("METRICS_PORT", str(port_in))
+                st.success("Saved. Applies after restarting the dashboard and the scan worker.")
+
+    with st.expander("🔬 Scan Profiling"):
+        st.caption("Samples one scan (manual or background) and saves a flamegraph plus the slowest functions. No overhead otherwise.")
+        if db.get_setting("SCAN_PROFILE") == "1":
+            st.info("The next scan will be profiled.")
+        elif st.button("Profile Next Scan"):
+            db.set_setting("SCAN_PROFILE", "1")
+            st.rerun()
+
+        profiles = sp.list_profiles()
+        if profiles:
+            chosen = st.selectbox("Saved Profiles", profiles, format_func=lambda p: os.path.basename(p)[:-len(".txt")])
+            with open(chosen) as f:
+                st.code(f.read(), language=None)
+            base = chosen[:-len(".txt")]
+            col_ss, col_fg = st.columns(2)
+            if os.path.exists(base + ".speedscope.json"):
+                with open(base + ".speedscope.json", "rb") as f:
+                    col_ss.download_button("⬇️ Speedscope (speedscope.app)", f.read(), file_name=os.path.basename(base) + ".speedscope.json")
+            if os.path.exists(base + ".collapsed.txt"):
+                with open(base + ".collapsed.txt", "rb") as f:
+                    col_fg.download_button("⬇️ Collapsed Stacks (flamegraph.pl)", f.read(), file_name=os.path.basename(base) + ".collapsed.txt")
+        else:
+            st.write("No profiles yet.")
 
     st.markdown("---")
     st.subheader("📋 Manage Watchlist (Monitored Stocks)")
@@ -732,11 +577,28 @@ elif page == "Settings":
         
         st.markdown("---")
         st.write("⚡ Quick Actions")
+        if st.button("🏦 Refresh Fundamentals (ROE)"):
+            if de.start_fundamentals_refresh(db.get_all_tickers(), force=True):
+                st.success("Refreshing ROE in the background. New values show up from the next scan.")
+            else:
+                st.info("A fundamentals refresh is already running.")
         if st.button("📥 Import Top 100 Stocks"):
             import tickers_loader
             count = tickers_loader.update_master_stocks()
             st.success(f"Successfully imported {count} stocks (Kompas100 + Popular)!")
             st.rerun()
+
+        st.markdown("---")
+        st.write("📂 Import Full IDX Listing")
+        listing = st.file_uploader("Daftar Saham (CSV / XLSX from idx.co.id)", type=["csv", "xlsx", "xls"])
+        replace_in = st.checkbox("Remove stocks not in the file (delisted)")
+        if listing is not None and st.button("Import Listing"):
+            import tickers_loader
+            try:
+                total, added, removed = tickers_loader.import_listing_file(listing, listing.name, replace=replace_in)
+                st.success(f"Imported {total} stocks: {added} new, {removed} removed.")
+            except Exception as e:
+                st.error(f"Import failed: {e}")
     
     # List & Delete
     with col_list:
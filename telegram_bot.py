@@ -1,32 +1,209 @@
+import queue
+import random
+import threading
+import time
+
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+
 import database_manager as db
+import metrics as mt
+import scan_executor as se
+
+# Outgoing messages go through a queue drained by one sender thread, so scans and
+# page renders never wait on Telegram. The sender reuses one pooled HTTP session,
+# paces messages per chat (and per bot, via scan_executor's host limiter), honours
+# 429 retry_after and retries transient failures with backoff.
+TELEGRAM_HOST = "api.telegram.org"
+MAX_MESSAGE_LEN = 4096 # Telegram's limit, in UTF-16 code units
+REQUEST_TIMEOUT = (5, 15) # Connect, read (seconds)
+MAX_RETRIES = 3
+BACKOFF_SEC = 1.0
+MAX_QUEUED = 200
+CREDENTIALS_TTL_SEC = 60
+BOT_RATE_PER_SEC = 30 # Across all chats
+CHAT_RATE_PER_SEC = 1.0 # Private chats
+GROUP_RATE_PER_SEC = 20 / 60 # Groups and channels (negative chat ids)
+
+se.set_rate_limit(TELEGRAM_HOST, BOT_RATE_PER_SEC)
+
+_queue = queue.Queue(maxsize=MAX_QUEUED)
+_sender_thread = None
+_sender_lock = threading.Lock()
+_chat_limiters = {}
+_credentials = {'token': None, 'chat_id': None, 'loaded': 0.0}
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
+def _get_credentials():
+    """Bot token and chat id from the DB, re-read at most every CREDENTIALS_TTL_SEC."""
+    if time.monotonic() - _credentials['loaded'] > CREDENTIALS_TTL_SEC:
+        _credentials['token'] = db.get_setting("TELEGRAM_BOT_TOKEN")
+        _credentials['chat_id'] = db.get_setting("TELEGRAM_CHAT_ID")
+        _credentials['loaded'] = time.monotonic()
+    return _credentials['token'], _credentials['chat_id']
+
+def _chat_limiter(chat_id):
+    bucket = _chat_limiters.get(chat_id)
+    if bucket is None:
+        rate = GROUP_RATE_PER_SEC if str(chat_id).startswith("-") else CHAT_RATE_PER_SEC
+        bucket = _chat_limiters[chat_id] = se.TokenBucket(rate, capacity=1)
+    return bucket
+
+# --- Message Splitting ---
+def _tg_len(text):
+    return len(text.encode("utf-16-le")) // 2
+
+def _pieces(text, limit, seps=("\n\n", "\n")):
+    """Cuts text into pieces of at most `limit`, preferring paragraph, then line breaks."""
+    if _tg_len(text) <= limit:
+        return [text]
+    if not seps:
+        pieces, start, size = [], 0, 0
+        for i, ch in enumerate(text):
+            units = 2 if ord(ch) > 0xFFFF else 1
+            if size + units > limit:
+                pieces.append(text[start:i])
+                start, size = i, 0
+            size += units
+        pieces.append(text[start:])
+        return pieces
+
+    parts = text.split(seps[0])
+    pieces = []
+    for i, part in enumerate(parts):
+        if i < len(parts) - 1:
+            part += seps[0]
+        pieces.extend(_pieces(part, limit, seps[1:]))
+    return pieces
+
+def split_message(text, limit=MAX_MESSAGE_LEN):
+    """Splits text into messages Telegram accepts, breaking between paragraphs where possible."""
+    chunks, current = [], ""
+    for piece in _pieces(text, limit):
+        if current and _tg_len(current + piece) > limit:
+            chunks.append(current)
+            current = ""
+        current += piece
+    chunks.append(current)
+    chunks = [c.strip() for c in chunks]
+    return [c for c in chunks if c] or [""]
+
+# --- Sender ---
+def _post(token, payload):
+    """One sendMessage call. Returns (ok, status code or None, response JSON or error text)."""
+    _chat_limiter(payload['chat_id']).acquire()
+    se.throttle(TELEGRAM_HOST)
+    started = time.perf_counter()
+    try:
+        response = _session.post(f"https://{TELEGRAM_HOST}/bot{token}/sendMessage", json=payload,
+                                 timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        return False, None, str(e)
+    finally:
+        mt.TELEGRAM_SEND_DURATION.observe(time.perf_counter() - started)
+    try:
+        body = response.json()
+    except ValueError:
+        body = {'description': response.text}
+    return response.status_code == 200, response.status_code, body
+
+def _deliver(item):
+    """Sends one queued message, retrying rate limits and transient failures. Returns (ok, info)."""
+    payload = {"chat_id": item['chat_id'], "text": item['text'], "parse_mode": "Markdown"}
+    attempt = 0
+    while True:
+        ok, status, body = _post(item['token'], payload)
+        if ok:
+            return True, "Message sent"
+
+        error = body.get('description', body) if isinstance(body, dict) else body
+        if status == 400 and 'parse_mode' in payload and "parse entities" in str(error):
+            # Broken Markdown (e.g. an underscore in a ticker): send it as plain text instead
+            del payload['parse_mode']
+            continue
+        if (status is not None and status != 429 and status < 500) or attempt >= MAX_RETRIES:
+            mt.TELEGRAM_FAILURES.inc()
+            print(f"Telegram send failed: {error}")
+            return False, f"Error: {error}"
+
+        if status == 429:
+            delay = (body.get('parameters') or {}).get('retry_after', BACKOFF_SEC)
+            mt.TELEGRAM_RETRIES.inc(reason="rate_limited")
+        else:
+            delay = BACKOFF_SEC * (2 ** attempt) * (1 + random.random() * 0.25)
+            mt.TELEGRAM_RETRIES.inc(reason="transient")
+        time.sleep(delay)
+        attempt += 1
 
-def send_telegram_message(message):
+def _sender():
+    while True:
+        item = _queue.get()
+        try:
+            item['result'] = _deliver(item)
+        except Exception as e:
+            mt.TELEGRAM_FAILURES.inc()
+            print(f"Telegram sender error: {e}")
+            item['result'] = (False, str(e))
+        finally:
+            mt.TELEGRAM_QUEUE_DEPTH.set(_queue.qsize())
+            item['done'].set()
+            _queue.task_done()
+
+def _ensure_sender():
+    global _sender_thread
+    with _sender_lock:
+        if _sender_thread is None or not _sender_thread.is_alive():
+            _sender_thread = threading.Thread(target=_sender, name="telegram-sender", daemon=True)
+            _sender_thread.start()
+
+def flush(timeout=30):
+    """Waits until queued messages have been sent (or `timeout` passes). Returns True if the queue is empty."""
+    deadline = time.monotonic() + timeout
+    with _queue.all_tasks_done:
+        while _queue.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            _queue.all_tasks_done.wait(remaining)
+    return True
+
+def send_telegram_message(message, wait=None):
     """
-    Sends a message via Telegram Bot using credentials stored in DB.
+    Queues a message (split into several if it is too long) for the bot's chat,
+    using credentials stored in DB. Returns immediately with (True, "Queued") unless
+    `wait` is a number of seconds to wait for delivery, then returns the send result.
     """
-    token = db.get_setting("TELEGRAM_BOT_TOKEN")
-    chat_id = db.get_setting("TELEGRAM_CHAT_ID")
-    
+    token, chat_id = _get_credentials()
+
     if not token or not chat_id:
         print("Telegram credentials not found in DB.")
         return False, "Credentials missing"
-        
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
-    payload = {
-        "chat_id": chat_id,
-        "text": message,
-        "parse_mode": "Markdown"
-    }
-    
-    try:
-        response = requests.post(url, json=payload)
-        if response.status_code == 200:
-            return True, "Message sent"
-        else:
-            return False, f"Error: {response.text}"
-    except Exception as e:
-        return False, str(e)
+
+    _ensure_sender()
+    items = []
+    for text in split_message(message):
+        item = {'token': token, 'chat_id': chat_id, 'text': text, 'done': threading.Event(), 'result': None}
+        try:
+            _queue.put_nowait(item)
+        except queue.Full:
+            mt.TELEGRAM_FAILURES.inc()
+            print("Telegram queue full, message dropped.")
+            return False, "Queue full"
+        items.append(item)
+    mt.TELEGRAM_QUEUE_DEPTH.set(_queue.qsize())
+
+    if wait is None:
+        return True, "Queued"
+    deadline = time.monotonic() + wait
+    for item in items:
+        if not item['done'].wait(max(0, deadline - time.monotonic())):
+            return False, "Timed out waiting for Telegram"
+        if not item['result'][0]:
+            return item['result']
+    return True, "Message sent"
 
 def setup_credentials(token, chat_id):
     """
@@ -34,6 +211,7 @@ def setup_credentials(token, chat_id):
     """
     db.set_setting("TELEGRAM_BOT_TOKEN", token)
     db.set_setting("TELEGRAM_CHAT_ID", chat_id)
+    _credentials['loaded'] = 0.0
     print("Telegram credentials saved.")
 
 def format_currency(value):
@@ -41,22 +219,18 @@ def format_currency(value):
 
 def send_scan_report(title, df_results):
     """
-    Formats a dataframe of scan results and sends it to Telegram.
+    Formats a dataframe of scan results and queues it for Telegram, split into
+    as many messages as needed.
     """
     if df_results.empty:
         return False, "No data to send"
-        
-    message = f"🛡️ **Stock Sentinel: {title}**\n\n"
-    
-    count = 0
+
+    blocks = []
     for index, row in df_results.iterrows():
-        if count >= 10: # Limit to top 10 to avoid spamming/limit
-            message += f"\n... and {len(df_results) - 10} more."
-            break
-            
         ticker = row['ticker']
         price = format_currency(row['current_price'])
-        
+        message = ""
+
         if 'ath_distance_pct' in row:
             # ATH Report
             dist = row['ath_distance_pct']
@@ -64,8 +238,8 @@ def send_scan_report(title, df_results):
             ath_target = format_currency(row.get('ath_price', 0))
             message += f"{icon} **{ticker}** @ {price}\n"
             message += f"   🎯 Target Puncak: {ath_target} (Jarak: {dist:.2f}%)\n"
-            message += f"   💡 Saran: Pantau besok jam 09:00-09:30. Jika harga stabil menembus {ath_target}, siap Hajar Kanan (Beli)!\n\n"
-            
+            message += f"   💡 Saran: Pantau besok jam 09:00-09:30. Jika harga stabil menembus {ath_target}, siap Hajar Kanan (Beli)!\n"
+
         elif 'vol_spike_ratio' in row:
             # Volatility Report
             vol = row['vol_spike_ratio']
@@ -73,7 +247,7 @@ def send_scan_report(title, df_results):
             icon = "🔥"
             message += f"{icon} **{ticker}** @ {price}\n"
             message += f"   Vol: {vol:.1f}x | Price: {change:+.2f}%\n"
-        
+
         elif 'rsi' in row:
             # RSI Report
             rsi_val = row['rsi']
@@ -84,19 +258,29 @@ def send_scan_report(title, df_results):
              # MACD Report
              message += f"✨ **{ticker}** @ {price}\n"
              message += f"   Golden Cross Detected! (Bullish)\n"
-        
+
         # --- Trade Suggestions ---
         if 'plan_cons_sl' in row:
             sl_c = format_currency(row['plan_cons_sl'])
             tp_c = format_currency(row['plan_cons_tp'])
             sl_a = format_currency(row['plan_aggr_sl'])
             tp_a = format_currency(row['plan_aggr_tp'])
-            
+
             message += f"   🎯 **Plan A (Safe):** SL {sl_c} | TP {tp_c}\n"
             message += f"   🚀 **Plan B (Aggressive):** SL {sl_a} | TP {tp_a}\n"
-            message += f"   📈 Volume meledak: {vol:.1f}x | Perubahan: {change:+.2f}%\n"
-            message += f"   💡 Saran: Bandar sedang gerak. Pantau 30 mnt pertama bursa buka. Jika tetep kuat di zona hijau, cicil beli.\n\n"
-            
-        count += 1
-        
-    return send_telegram_message(message)
+            vol, change = row.get('vol_spike_ratio'), row.get('price_change_pct')
+            if pd.notna(vol) and pd.notna(change):
+                message += f"   📈 Volume meledak: {vol:.1f}x | Perubahan: {change:+.2f}%\n"
+                message += f"   💡 Saran: Bandar sedang gerak. Pantau 30 mnt pertama bursa buka. Jika tetep kuat di zona hijau, cicil beli.\n"
+
+        blocks.append(message)
+
+    header = f"🛡️ **Stock Sentinel: {title}**"
+    parts = split_message("\n".join(blocks), MAX_MESSAGE_LEN - _tg_len(header) - 12)
+    result = (True, "Queued")
+    for i, part in enumerate(parts, 1):
+        suffix = f" ({i}/{len(parts)})" if len(parts) > 1 else ""
+        result = send_telegram_message(f"{header}{suffix}\n\n{part}")
+        if not result[0]:
+            break
+    return result
@@ -1,3 +1,5 @@
+import os
+import re
 import requests
 import database_manager as db
 import pandas as pd
@@ -156,40 +158,77 @@ STATIC_TICKERS = [
     {'ticker': 'TMAS', 'name': 'Temas Tbk'}
 ]
 
+# Full listing: the "Daftar Saham" export from idx.co.id (Excel) or any CSV with a
+# ticker column and, optionally, a company name column.
+IDX_LISTING_FILE = "idx_listing.csv"
+TICKER_COLUMNS = ("ticker", "kode", "kode saham", "code", "symbol")
+NAME_COLUMNS = ("company_name", "name", "nama", "nama perusahaan", "company")
+IDX_CODE_PATTERN = re.compile(r"^[A-Z]{4}$")
+
+def dedupe_stocks(stocks):
+    """Keeps the first entry per ticker (upper-cased, without .JK) and drops invalid codes."""
+    seen = {}
+    for s in stocks:
+        ticker = str(s['ticker']).strip().upper().replace(".JK", "")
+        if IDX_CODE_PATTERN.match(ticker) and ticker not in seen:
+            seen[ticker] = str(s.get('name') or "").strip()
+    return [{'ticker': t, 'name': n} for t, n in seen.items()]
+
 def fetch_tickers_from_web():
     """
-    Simulation of fetching from web. Returns the static list for now.
+    Simulation of fetching from web. Returns the static list for now (deduplicated).
     """
     print("Using Verified Static List (LQ45 + Popular)")
-    return STATIC_TICKERS
+    return dedupe_stocks(STATIC_TICKERS)
+
+def read_listing_file(source, filename=None):
+    """
+    Reads a stock listing (CSV or Excel; a path or an uploaded file object).
+    Returns [{'ticker', 'name'}], deduplicated.
+    """
+    filename = filename or str(source)
+    if filename.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(source, dtype=str) # needs openpyxl
+    else:
+        df = pd.read_csv(source, dtype=str, sep=None, engine="python") # , or ; separated
+
+    columns = {c.strip().lower(): c for c in df.columns}
+    ticker_col = next((columns[c] for c in TICKER_COLUMNS if c in columns), None)
+    if ticker_col is None:
+        raise ValueError(f"No ticker column found (expected one of: {', '.join(TICKER_COLUMNS)})")
+    name_col = next((columns[c] for c in NAME_COLUMNS if c in columns), None)
+
+    names = df[name_col] if name_col else pd.Series("", index=df.index)
+    return dedupe_stocks({'ticker': t, 'name': n} for t, n in zip(df[ticker_col].fillna(""), names.fillna("")))
+
+def import_listing_file(source, filename=None, replace=False):
+    """
+    Bulk-imports a full listing file into master_stocks in one transaction.
+    With replace=True, watchlist tickers that are not in the file are removed.
+    Returns (total in file, added, removed).
+    """
+    stocks = read_listing_file(source, filename)
+    added, removed = db.upsert_master_stocks([(s['ticker'], s['name']) for s in stocks], replace=replace)
+    print(f"Listing imported: {len(stocks)} stocks, {added} new, {removed} removed.")
+    return len(stocks), added, removed
 
 def update_master_stocks():
     """
     Updates the master_stocks table in SQLite with the latest list.
     """
     tickers = fetch_tickers_from_web()
-    
-    conn = db.get_db_connection()
-    cursor = conn.cursor()
-    
-    count_new = 0
-    for t in tickers:
-        try:
-            cursor.execute('''
-                INSERT OR IGNORE INTO master_stocks (ticker, company_name)
-                VALUES (?, ?)
-            ''', (t['ticker'], t['name']))
-            if cursor.rowcount > 0:
-                count_new += 1
-        except Exception as e:
-            print(f"Error inserting {t['ticker']}: {e}")
-            
-    conn.commit()
-    conn.close()
+    count_new, _ = db.upsert_master_stocks([(t['ticker'], t['name']) for t in tickers])
     
     print(f"Database updated. Added {count_new} new tickers. Total managed: {len(tickers)}")
     return len(tickers)
 
 if __name__ == "__main__":
+    import sys
     db.init_db()
-    update_master_stocks()
+    # python tickers_loader.py [Daftar_Saham.xlsx] [--replace]
+    files = [a for a in sys.argv[1:] if not a.startswith("--")]
+    listing = files[0] if files else (IDX_LISTING_FILE if os.path.exists(IDX_LISTING_FILE) else None)
+    if listing:
+        import_listing_file(listing, replace="--replace" in sys.argv[1:])
+    else:
+        update_master_stocks()
@@ -1,6 +1,10 @@
 import analysis_engine as ae
+import database_manager as db
+import market_data as md
 import pandas as pd
 import numpy as np
+import os
+import tempfile
 
 def create_mock_data():
     # Create valid synthetic data for testing
@@ -28,12 +32,18 @@ def create_mock_data():
     
     return df
 
+class MockProvider(md.MarketDataProvider):
+    """Serves the synthetic bars for any symbol, so no yfinance call is made."""
+    def history(self, symbol, period=None, interval="1d", start=None):
+        return create_mock_data()
+
 def test_indicators():
     print("Testing Smart Indicators...")
     
-    # Mock de.get_ticker_data to avoid yfinance call
-    original_fetch = ae.de.get_ticker_data
-    ae.de.get_ticker_data = lambda ticker, period=None, interval=None: create_mock_data()
+    # Synthetic bars through the provider interface, stored in a throwaway DB
+    db.DB_NAME = os.path.join(tempfile.mkdtemp(), "verify_smart.db")
+    db.init_db()
+    original_provider = md.set_provider(MockProvider())
     
     try:
         res = ae.analyze_ticker("TEST")
@@ -58,7 +68,7 @@ def test_indicators():
     except Exception as e:
         print(f"FAIL: Error during test: {e}")
     finally:
-        ae.de.get_ticker_data = original_fetch
+        md.set_provider(original_provider)
 
 if __name__ == "__main__":
     test_indicators()